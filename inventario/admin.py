@@ -114,6 +114,8 @@ class TransaccionesAdmin(admin.ModelAdmin):
         "usuario",
         "created_at",
     ]
+    list_select_related = ["cuenta", "venta", "usuario"]
+    show_full_result_count = False
 
     def cuenta_adapt(self, obj):
         return obj.cuenta.nombre
@@ -0,0 +1,48 @@
+"""Invalidación de las respuestas en caché por grupos de datos.
+
+Cada grupo ("ventas", "inventario", ...) tiene una versión en la tabla
+VersionCache que forma parte de la clave de las respuestas que dependen de
+él. La suben triggers en la base de datos al confirmarse cualquier escritura
+en las tablas del grupo (migración 0137), también las que hace el frontend
+directamente: las respuestas viejas dejan de encontrarse y caducan solas.
+"""
+
+from django.core.cache import cache
+
+from .models import VersionCache
+
+PREFIJO = "respuestas"
+
+
+def versiones(grupos):
+    """Las filas de VersionCache de los grupos, en el orden pedido."""
+    filas = VersionCache.objects.in_bulk(grupos)
+    return [filas[grupo] for grupo in grupos]
+
+
+def clave_metrica(nombre, acierto):
+    return f"{PREFIJO}:metricas:{nombre}:{'aciertos' if acierto else 'fallos'}"
+
+
+def registrar_metrica(nombre, acierto):
+    clave = clave_metrica(nombre, acierto)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        if not cache.add(clave, 1, timeout=None):
+            cache.incr(clave)
+
+
+def metricas(nombres):
+    claves = {
+        nombre: (clave_metrica(nombre, True), clave_metrica(nombre, False))
+        for nombre in nombres
+    }
+    valores = cache.get_many([clave for par in claves.values() for clave in par])
+    return {
+        nombre: {
+            "aciertos": valores.get(aciertos, 0),
+            "fallos": valores.get(fallos, 0),
+        }
+        for nombre, (aciertos, fallos) in claves.items()
+    }
@@ -0,0 +1,245 @@
+"""Procesamiento de las imágenes de productos fuera de la transacción de la
+petición.
+
+El endpoint solo valida la imagen y guarda los bytes originales en
+ImagenPendiente. Al confirmarse la transacción, un hilo en segundo plano genera
+las variantes, las sube y enlaza la Image al producto. Donde la plataforma
+congela los hilos al responder (Vercel), la cola la vacía una tarea programada
+(`GET /v2/tareas/procesar-imagenes/` o `manage.py procesar_imagenes`), que
+también reintenta las que fallaron.
+"""
+
+import io
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image as IMG, ImageOps
+
+from .models import Image, ImagenPendiente, ProductoInfo
+
+# Lado mayor en píxeles de cada variante, de mayor a menor.
+TAMANOS = {"principal": 800, "miniatura": 200}
+CALIDAD_WEBP = 60
+# 0 (rápido) a 6 (más lento y algo más pequeño); 4 es el valor de Pillow.
+METODO_WEBP = 4
+# Margen sobre el tamaño final hasta el que se reduce con draft()/reduce()
+# antes del remuestreo LANCZOS, para no perder calidad.
+REDUCING_GAP = 2
+MAX_INTENTOS = 5
+# Una imagen reclamada hace más de esto se da por abandonada (el proceso que la
+# tomó terminó sin enlazarla) y se puede volver a reclamar.
+RECLAMO_CADUCA = timedelta(minutes=10)
+
+_ejecutor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="imagenes")
+
+
+class CloudinaryUploader:
+    def subir(self, contenido):
+        import cloudinary.uploader
+
+        response = cloudinary.uploader.upload(
+            io.BytesIO(contenido), asset_folder="/dashboard_valero"
+        )
+        return response["secure_url"], response["public_id"]
+
+    def eliminar(self, public_id):
+        import cloudinary.uploader
+
+        cloudinary.uploader.destroy(public_id)
+
+
+class UploaderLocal:
+    """Guarda las imágenes en memoria; para tests y desarrollo sin Cloudinary."""
+
+    archivos = {}
+    ids = itertools.count(1)
+
+    def subir(self, contenido):
+        public_id = f"local/{next(self.ids)}"
+        self.archivos[public_id] = contenido
+        return f"https://imagenes.local/{public_id}.webp", public_id
+
+    def eliminar(self, public_id):
+        self.archivos.pop(public_id, None)
+
+
+def uploader():
+    return import_string(settings.IMAGENES_UPLOADER)()
+
+
+def validar_imagen(contenido):
+    """Lanza una excepción si `contenido` no es una imagen que Pillow entienda."""
+    with IMG.open(io.BytesIO(contenido)) as imagen:
+        imagen.verify()
+
+
+def generar_variantes(contenido):
+    """Decodifica la imagen una sola vez y genera todas las variantes en WebP,
+    reduciendo en el sitio de la mayor a la menor."""
+    variantes = {}
+    with IMG.open(io.BytesIO(contenido)) as original:
+        # En JPEG, draft() decodifica ya reducida por DCT (1/2, 1/4, 1/8), lo
+        # que ahorra casi toda la memoria y el tiempo con fotos de móvil. Hay
+        # que pedirlo antes de exif_transpose, que carga la imagen.
+        lado = max(TAMANOS.values()) * REDUCING_GAP
+        original.draft("RGB", escalar(original.size, lado))
+
+        imagen = ImageOps.exif_transpose(original)
+        if imagen.mode != "RGB":
+            imagen = imagen.convert("RGB")
+
+        for nombre, lado in TAMANOS.items():
+            # thumbnail() usa reduce() por bloques y luego LANCZOS.
+            imagen.thumbnail((lado, lado), IMG.LANCZOS, reducing_gap=REDUCING_GAP)
+            salida = io.BytesIO()
+            imagen.save(salida, "WEBP", quality=CALIDAD_WEBP, method=METODO_WEBP)
+            variantes[nombre] = salida.getvalue()
+
+    return variantes
+
+
+def escalar(tamano, lado):
+    """Tamaño con el lado mayor igual a `lado`, sin ampliar."""
+    ancho, alto = tamano
+    factor = min(lado / max(ancho, alto), 1)
+    return max(round(ancho * factor), 1), max(round(alto * factor), 1)
+
+
+def encolar_imagen(producto_info, contenido):
+    """Guarda la imagen para procesarla cuando se confirme la transacción. Una
+    imagen nueva reemplaza a las que el producto tuviera pendientes."""
+    ImagenPendiente.objects.filter(producto_info=producto_info).delete()
+    pendiente = ImagenPendiente.objects.create(
+        producto_info=producto_info, contenido=contenido
+    )
+    # Sin segundo plano la procesa la tarea programada (ver TareasController).
+    if settings.IMAGENES_EN_SEGUNDO_PLANO:
+        transaction.on_commit(procesar_en_segundo_plano)
+    return pendiente
+
+
+def procesar_en_segundo_plano():
+    _ejecutor.submit(_procesar_y_cerrar)
+
+
+def _procesar_y_cerrar():
+    try:
+        procesar_pendientes()
+    finally:
+        # Cada hilo abre su propia conexión; no dejarla abierta al terminar.
+        connections.close_all()
+
+
+def reclamar_pendientes(limite):
+    """Marca como en proceso hasta `limite` imágenes pendientes y las devuelve.
+
+    La transacción dura solo lo que el SELECT ... FOR UPDATE SKIP LOCKED y el
+    UPDATE: las subidas se hacen después, sin bloqueos, y otro proceso no
+    vuelve a tomar las reclamadas hasta pasado RECLAMO_CADUCA.
+    """
+    ahora = timezone.now()
+    pendientes = ImagenPendiente.objects.filter(
+        Q(procesando_desde__isnull=True)
+        | Q(procesando_desde__lt=ahora - RECLAMO_CADUCA),
+        intentos__lt=MAX_INTENTOS,
+    )
+
+    with transaction.atomic():
+        reclamadas = list(
+            pendientes.select_for_update(skip_locked=True).order_by("id")[:limite]
+        )
+        ImagenPendiente.objects.filter(pk__in=[p.pk for p in reclamadas]).update(
+            procesando_desde=ahora
+        )
+    return reclamadas
+
+
+def procesar_pendientes(limite=10):
+    """Procesa hasta `limite` imágenes pendientes y devuelve cuántas enlazó.
+    Las que otro proceso ya reclamó se saltan."""
+    procesadas = 0
+    for pendiente in reclamar_pendientes(limite):
+        try:
+            if procesar(pendiente):
+                procesadas += 1
+        except Exception as e:
+            ImagenPendiente.objects.filter(pk=pendiente.pk).update(
+                intentos=F("intentos") + 1, error=str(e), procesando_desde=None
+            )
+    return procesadas
+
+
+def procesar(pendiente):
+    """Genera y sube las variantes sin ninguna transacción abierta y luego
+    enlaza la Image en una transacción corta. Devuelve False, y borra lo
+    subido, si la imagen se reemplazó o eliminó mientras tanto."""
+    variantes = generar_variantes(bytes(pendiente.contenido))
+    destino = uploader()
+
+    subidas = []
+    try:
+        for nombre in TAMANOS:
+            subidas.append(destino.subir(variantes[nombre]))
+        with transaction.atomic():
+            enlazada = enlazar(pendiente, *subidas)
+    except Exception:
+        descartar(destino, subidas)
+        raise
+
+    if not enlazada:
+        descartar(destino, subidas)
+    return enlazada
+
+
+def enlazar(pendiente, principal, miniatura):
+    # Mismo orden de bloqueo que updateProducto: primero el ProductoInfo (con
+    # SELECT ... FOR UPDATE) y luego sus imágenes pendientes. Así una edición
+    # en curso no puede guardar después una imagen anterior a esta.
+    info = ProductoInfo.objects.select_for_update().get(pk=pendiente.producto_info_id)
+    if not ImagenPendiente.objects.select_for_update().filter(pk=pendiente.pk).exists():
+        return False
+
+    anterior = info.imagen
+    (url, public_id), (url_miniatura, miniatura_public_id) = principal, miniatura
+    info.imagen = Image.objects.create(
+        url=url,
+        public_id=public_id,
+        miniatura=url_miniatura,
+        miniatura_public_id=miniatura_public_id,
+    )
+    info.save(update_fields=["imagen"])
+    ImagenPendiente.objects.filter(pk=pendiente.pk).delete()
+
+    if anterior:
+        eliminar_imagen(anterior)
+    return True
+
+
+def descartar(destino, subidas):
+    for _, public_id in subidas:
+        try:
+            destino.eliminar(public_id)
+        except Exception:
+            # Solo queda un archivo huérfano en el destino.
+            pass
+
+
+def eliminar_imagen(imagen):
+    """Borra la Image y, al confirmarse la transacción, sus archivos remotos."""
+    public_ids = [imagen.public_id, imagen.miniatura_public_id]
+    imagen.delete()
+
+    def eliminar_remotas():
+        destino = uploader()
+        for public_id in filter(None, public_ids):
+            destino.eliminar(public_id)
+
+    # Si Cloudinary falla solo queda un archivo huérfano; no es motivo para
+    # deshacer el cambio.
+    transaction.on_commit(eliminar_remotas, robust=True)
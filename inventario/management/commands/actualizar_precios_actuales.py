@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventario.models import ProductoInfo, Productos_Cafeteria
+
+
+class Command(BaseCommand):
+    help = "Actualiza los precios actuales de los productos a partir de su historial."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            productos_info = ProductoInfo.objects.actualizar_precios()
+            productos_cafeteria = Productos_Cafeteria.objects.actualizar_precios()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Precios actualizados: {productos_info} productos del salón, "
+                f"{productos_cafeteria} productos de cafetería."
+            )
+        )
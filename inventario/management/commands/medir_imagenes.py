@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image as IMG
+
+from inventario.imagenes import generar_variantes
+
+EXTENSIONES = {".jpg", ".jpeg", ".png", ".webp", ".heic"}
+
+
+def ruta_anterior(contenido):
+    """Lo que hacían addProducto/updateProducto antes de inventario.imagenes
+    (sin la subida), borrando el temporal para no llenar el disco."""
+    import io
+
+    imagen = IMG.open(io.BytesIO(contenido))
+    if imagen.mode in ("RGBA", "P"):
+        imagen = imagen.convert("RGB")
+        ancho, alto = imagen.size
+        imagen = imagen.resize((800, round(800 / (ancho / alto))), IMG.LANCZOS)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".webp") as temp_file:
+        imagen.save(temp_file.name, quality=60)
+        temp_file.seek(0)
+        datos = temp_file.read()
+    os.unlink(temp_file.name)
+    return datos
+
+
+def ruta_actual(contenido):
+    return generar_variantes(contenido)["principal"]
+
+
+RUTAS = {"anterior": ruta_anterior, "actual": ruta_actual}
+
+
+def medir(ruta, archivos, cola):
+    # ru_maxrss está en KiB en Linux; se descuenta lo que ya ocupaba el proceso.
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tiempos, tamanos = [], []
+    for archivo in archivos:
+        contenido = archivo.read_bytes()
+        inicio = time.perf_counter()
+        tamanos.append(len(RUTAS[ruta](contenido)))
+        tiempos.append(time.perf_counter() - inicio)
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+    cola.put((tiempos, tamanos, pico))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tiempo y el pico de memoria de la ruta de imágenes anterior "
+        "y la actual sobre un directorio de fotos. Cada ruta corre en su propio "
+        "proceso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directorio", type=Path)
+
+    def handle(self, *args, **options):
+        directorio = options["directorio"]
+        if not directorio.is_dir():
+            raise CommandError(f"No existe el directorio {directorio}.")
+        archivos = sorted(
+            p for p in directorio.iterdir() if p.suffix.lower() in EXTENSIONES
+        )
+        if not archivos:
+            raise CommandError("El directorio no tiene imágenes.")
+
+        contexto = multiprocessing.get_context("fork")
+        for ruta in RUTAS:
+            cola = contexto.Queue()
+            proceso = contexto.Process(target=medir, args=(ruta, archivos, cola))
+            proceso.start()
+            tiempos, tamanos, pico = cola.get()
+            proceso.join()
+
+            tiempos.sort()
+            self.stdout.write(
+                f"{ruta:>9}: {len(archivos)} imágenes, "
+                f"mediana {tiempos[len(tiempos) // 2] * 1000:.0f} ms, "
+                f"máximo {tiempos[-1] * 1000:.0f} ms, "
+                f"pico RSS +{pico / 1024:.0f} MiB, "
+                f"salida media {sum(tamanos) / len(tamanos) / 1024:.0f} KiB"
+            )
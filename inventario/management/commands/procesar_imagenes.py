@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from inventario.imagenes import procesar_pendientes
+from inventario.models import ImagenPendiente
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa y sube las imágenes de productos pendientes, incluidas las que "
+        "fallaron o quedaron sin procesar en segundo plano."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limite", type=int, default=50)
+
+    def handle(self, *args, **options):
+        procesadas = procesar_pendientes(options["limite"])
+        restantes = ImagenPendiente.objects.count()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{procesadas} imágenes procesadas. Quedan {restantes} pendientes."
+            )
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from inventario.models import Existencia
+
+
+class Command(BaseCommand):
+    help = "Reconstruye las existencias por ubicación a partir de los productos."
+
+    def handle(self, *args, **options):
+        existencias = Existencia.objects.reconstruir()
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(existencias)} existencias reconstruidas.")
+        )
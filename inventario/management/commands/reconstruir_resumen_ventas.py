@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventario.models import VentaDiariaResumen
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen diario de ventas en un rango de fechas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=date.fromisoformat, required=True)
+        parser.add_argument("--hasta", type=date.fromisoformat, default=None)
+
+    def handle(self, *args, **options):
+        desde = options["desde"]
+        hasta = options["hasta"] or timezone.localdate()
+
+        if desde > hasta:
+            raise CommandError("La fecha 'desde' no puede ser posterior a 'hasta'.")
+
+        resumenes = VentaDiariaResumen.objects.reconstruir(desde, hasta)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(resumenes)} resúmenes reconstruidos entre {desde} y {hasta}."
+            )
+        )
@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from inventario.models import HistorialSaldoCuenta, HistorialSaldoInventarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda el saldo de cierre de cada cuenta de los días ya cerrados (hasta "
+        "ayer) y la valoración del inventario de hoy, tomada al ejecutarse. Sin "
+        "--desde, completa los saldos que falten desde el último registro. "
+        "Pensado para ejecutarse poco después de medianoche."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=date.fromisoformat, default=None)
+
+    def handle(self, *args, **options):
+        # El día de hoy no se guarda: su saldo aún cambia y el registro no se
+        # volvería a escribir al día siguiente.
+        hasta = timezone.localdate() - timedelta(days=1)
+        desde = options["desde"]
+
+        if desde is None:
+            ultima = HistorialSaldoCuenta.objects.aggregate(ultima=Max("fecha"))["ultima"]
+            desde = ultima + timedelta(days=1) if ultima else hasta
+        elif desde > hasta:
+            raise CommandError("La fecha 'desde' debe ser anterior a hoy.")
+
+        # La valoración del inventario no depende de los saldos pendientes: es
+        # la de este momento y se guarda con la fecha de hoy.
+        inventario = HistorialSaldoInventarios.objects.registrar()
+
+        if desde > hasta:
+            self.stdout.write(
+                f"Los saldos ya están registrados hasta {hasta}. "
+                f"Inventario del {inventario.fecha}: {inventario.saldo}."
+            )
+            return
+
+        historial = HistorialSaldoCuenta.objects.registrar(desde, hasta)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(historial)} saldos de cuentas guardados entre {desde} y {hasta}. "
+                f"Inventario del {inventario.fecha}: {inventario.saldo}."
+            )
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.models import Existencia
+
+
+class Command(BaseCommand):
+    help = "Compara las existencias con los productos disponibles y opcionalmente las corrige."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corregir",
+            action="store_true",
+            help="Reconstruye las existencias si se encuentran diferencias.",
+        )
+
+    def handle(self, *args, **options):
+        diferencias = Existencia.objects.diferencias()
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("Las existencias están al día."))
+            return
+
+        for (producto_info, ubicacion, area_venta), esperada, actual in diferencias:
+            self.stdout.write(
+                f"ProductoInfo {producto_info} en {ubicacion}"
+                f"{f' ({area_venta})' if area_venta else ''}: "
+                f"esperada {esperada}, registrada {actual}"
+            )
+
+        if not options["corregir"]:
+            raise CommandError(
+                f"{len(diferencias)} existencias no coinciden. Use --corregir para reconstruirlas."
+            )
+
+        Existencia.objects.reconstruir()
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(diferencias)} existencias corregidas.")
+        )
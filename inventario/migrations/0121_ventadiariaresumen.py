@@ -0,0 +1,74 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:19
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def precio(tabla):
+    # Precio vigente en la fecha de la venta o, si es anterior al historial, el primero.
+    return f"""
+        COALESCE(
+            (
+                SELECT h.precio FROM {tabla} h
+                WHERE h.producto_info_id = p.info_id AND h.fecha_inicio <= v.created_at
+                ORDER BY h.fecha_inicio DESC, h.id DESC LIMIT 1
+            ),
+            (
+                SELECT h.precio FROM {tabla} h
+                WHERE h.producto_info_id = p.info_id
+                ORDER BY h.fecha_inicio, h.id LIMIT 1
+            )
+        )
+    """
+
+
+# Rellena el resumen con las ventas ya existentes.
+LLENAR_RESUMEN = f"""
+    INSERT INTO inventario_ventadiariaresumen
+        (area_venta_id, fecha, cantidad, importe, costo, pago_trabajador)
+    SELECT
+        v.area_venta_id,
+        (v.created_at AT TIME ZONE '{settings.TIME_ZONE}')::date,
+        COUNT(*),
+        COALESCE(SUM({precio("inventario_historialprecioventasalon")}), 0),
+        COALESCE(SUM({precio("inventario_historialpreciocostosalon")}), 0),
+        COALESCE(SUM(i.pago_trabajador), 0)
+    FROM inventario_ventas v
+    JOIN inventario_producto p ON p.venta_id = v.id
+    JOIN inventario_productoinfo i ON i.id = p.info_id
+    WHERE v.deleted_at IS NULL
+    GROUP BY 1, 2
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0120_entradas_cafeteria_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiariaResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad', models.IntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('costo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('pago_trabajador', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('area_venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='inventario.areaventa')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de ventas',
+                'verbose_name_plural': 'Resúmenes diarios de ventas',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiariaresumen',
+            constraint=models.UniqueConstraint(fields=('area_venta', 'fecha'), name='unique_venta_diaria_resumen_area_fecha'),
+        ),
+        migrations.RunSQL(LLENAR_RESUMEN, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Los índices se crean sin bloquear las escrituras en tablas ya pobladas.
+    atomic = False
+
+    dependencies = [
+        ('inventario', '0121_ventadiariaresumen'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='historialpreciocostocafeteria',
+            index=models.Index(fields=['producto', 'fecha_inicio'], name='inventario__product_1ebbdb_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='historialpreciocostosalon',
+            index=models.Index(fields=['producto_info', 'fecha_inicio'], name='inventario__product_3f6514_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='historialprecioventacafeteria',
+            index=models.Index(fields=['producto', 'fecha_inicio'], name='inventario__product_6ad896_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='historialprecioventasalon',
+            index=models.Index(fields=['producto_info', 'fecha_inicio'], name='inventario__product_33aaae_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:22
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def ultimo_precio(modelo, **filtros):
+    return Coalesce(
+        Subquery(modelo.objects.filter(**filtros).order_by("-id").values("precio")[:1]),
+        Decimal("0.00"),
+    )
+
+
+def actualizar_precios(apps, schema_editor):
+    ProductoInfo = apps.get_model("inventario", "ProductoInfo")
+    Productos_Cafeteria = apps.get_model("inventario", "Productos_Cafeteria")
+    HistorialPrecioCostoSalon = apps.get_model("inventario", "HistorialPrecioCostoSalon")
+    HistorialPrecioVentaSalon = apps.get_model("inventario", "HistorialPrecioVentaSalon")
+    HistorialPrecioCostoCafeteria = apps.get_model("inventario", "HistorialPrecioCostoCafeteria")
+    HistorialPrecioVentaCafeteria = apps.get_model("inventario", "HistorialPrecioVentaCafeteria")
+
+    ProductoInfo.objects.update(
+        precio_costo=ultimo_precio(HistorialPrecioCostoSalon, producto_info=OuterRef("pk")),
+        precio_venta=ultimo_precio(HistorialPrecioVentaSalon, producto_info=OuterRef("pk")),
+    )
+    Productos_Cafeteria.objects.update(
+        precio_costo=ultimo_precio(HistorialPrecioCostoCafeteria, producto=OuterRef("pk")),
+        precio_venta=ultimo_precio(HistorialPrecioVentaCafeteria, producto=OuterRef("pk")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0122_historial_precio_fecha_inicio_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productoinfo',
+            name='precio_costo',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=7),
+        ),
+        migrations.AddField(
+            model_name='productoinfo',
+            name='precio_venta',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=7),
+        ),
+        migrations.AddField(
+            model_name='productos_cafeteria',
+            name='precio_costo',
+            field=models.DecimalField(decimal_places=10, default=Decimal('0.00'), editable=False, max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='productos_cafeteria',
+            name='precio_venta',
+            field=models.DecimalField(decimal_places=10, default=Decimal('0.00'), editable=False, max_digits=20),
+        ),
+        migrations.RunPython(actualizar_precios, migrations.RunPython.noop),
+    ]
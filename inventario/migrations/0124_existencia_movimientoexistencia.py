@@ -0,0 +1,61 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0123_productoinfo_precio_costo_productoinfo_precio_venta_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Existencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ubicacion', models.CharField(choices=[('ALMACEN_PRINCIPAL', 'Almacén principal'), ('ALMACEN_REVOLTOSA', 'Almacén revoltosa'), ('AREA_VENTA', 'Área de venta')], max_length=30)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('area_venta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventario.areaventa')),
+                ('producto_info', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='existencias', to='inventario.productoinfo')),
+            ],
+            options={
+                'verbose_name': 'Existencia',
+                'verbose_name_plural': 'Existencias',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoExistencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('tipo', models.CharField(choices=[('ENTRADA', 'Entrada'), ('SALIDA', 'Salida'), ('VENTA', 'Venta'), ('TRANSFERENCIA', 'Transferencia'), ('MERMA', 'Merma')], max_length=30)),
+                ('cantidad', models.IntegerField()),
+                ('origen', models.CharField(blank=True, choices=[('ALMACEN_PRINCIPAL', 'Almacén principal'), ('ALMACEN_REVOLTOSA', 'Almacén revoltosa'), ('AREA_VENTA', 'Área de venta')], max_length=30, null=True)),
+                ('destino', models.CharField(blank=True, choices=[('ALMACEN_PRINCIPAL', 'Almacén principal'), ('ALMACEN_REVOLTOSA', 'Almacén revoltosa'), ('AREA_VENTA', 'Área de venta')], max_length=30, null=True)),
+                ('area_destino', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventario.areaventa')),
+                ('area_origen', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventario.areaventa')),
+                ('entrada', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventario.entradaalmacen')),
+                ('merma', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventario.merma')),
+                ('producto_info', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='inventario.productoinfo')),
+                ('salida_revoltosa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventario.salidaalmacenrevoltosa')),
+                ('transferencia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventario.transferencia')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('venta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventario.ventas')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de existencia',
+                'verbose_name_plural': 'Movimientos de existencias',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='existencia',
+            constraint=models.UniqueConstraint(condition=models.Q(('area_venta__isnull', True)), fields=('producto_info', 'ubicacion'), name='unique_existencia_almacen'),
+        ),
+        migrations.AddConstraint(
+            model_name='existencia',
+            constraint=models.UniqueConstraint(condition=models.Q(('area_venta__isnull', False)), fields=('producto_info', 'area_venta'), name='unique_existencia_area_venta'),
+        ),
+    ]
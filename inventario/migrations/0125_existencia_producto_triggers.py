@@ -0,0 +1,122 @@
+from django.db import migrations
+
+
+UBICACION = """
+    CASE
+        WHEN area_venta_id IS NOT NULL THEN 'AREA_VENTA'
+        WHEN almacen_revoltosa THEN 'ALMACEN_REVOLTOSA'
+        ELSE 'ALMACEN_PRINCIPAL'
+    END
+"""
+
+DISPONIBLE = "venta_id IS NULL AND merma_id IS NULL"
+
+
+def filas(tabla, signo):
+    return f"""
+        SELECT info_id, {UBICACION} AS ubicacion, area_venta_id, {signo} AS cantidad
+        FROM {tabla}
+        WHERE {DISPONIBLE}
+    """
+
+
+# Aplica las variaciones por (producto_info, ubicación). Las negativas solo
+# actualizan filas existentes para no recrear existencias que se están
+# eliminando en cascada junto a su ProductoInfo o área de venta.
+APLICAR_DELTAS = """
+    WITH deltas AS (
+        SELECT info_id, ubicacion, area_venta_id, SUM(cantidad) AS cantidad
+        FROM ({filas}) AS filas
+        GROUP BY info_id, ubicacion, area_venta_id
+        HAVING SUM(cantidad) <> 0
+    ),
+    restados AS (
+        UPDATE inventario_existencia AS e
+        SET cantidad = e.cantidad + d.cantidad
+        FROM deltas AS d
+        WHERE d.cantidad < 0
+          AND e.producto_info_id = d.info_id
+          AND e.ubicacion = d.ubicacion
+          AND e.area_venta_id IS NOT DISTINCT FROM d.area_venta_id
+        RETURNING e.id
+    ),
+    almacenes AS (
+        INSERT INTO inventario_existencia (producto_info_id, ubicacion, area_venta_id, cantidad)
+        SELECT info_id, ubicacion, area_venta_id, cantidad
+        FROM deltas
+        WHERE cantidad > 0 AND area_venta_id IS NULL
+        ON CONFLICT (producto_info_id, ubicacion) WHERE area_venta_id IS NULL
+        DO UPDATE SET cantidad = inventario_existencia.cantidad + EXCLUDED.cantidad
+        RETURNING id
+    )
+    INSERT INTO inventario_existencia (producto_info_id, ubicacion, area_venta_id, cantidad)
+    SELECT info_id, ubicacion, area_venta_id, cantidad
+    FROM deltas
+    WHERE cantidad > 0 AND area_venta_id IS NOT NULL
+    ON CONFLICT (producto_info_id, area_venta_id) WHERE area_venta_id IS NOT NULL
+    DO UPDATE SET cantidad = inventario_existencia.cantidad + EXCLUDED.cantidad
+"""
+
+TRIGGERS = {
+    "insert": ("INSERT", "REFERENCING NEW TABLE AS nuevos", filas("nuevos", 1)),
+    "delete": ("DELETE", "REFERENCING OLD TABLE AS viejos", filas("viejos", -1)),
+    "update": (
+        "UPDATE",
+        "REFERENCING OLD TABLE AS viejos NEW TABLE AS nuevos",
+        filas("viejos", -1) + " UNION ALL " + filas("nuevos", 1),
+    ),
+}
+
+
+def crear_triggers():
+    sql = []
+    for nombre, (evento, referencing, filas_sql) in TRIGGERS.items():
+        sql.append(
+            f"""
+            CREATE FUNCTION inventario_producto_existencia_{nombre}() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                {APLICAR_DELTAS.format(filas=filas_sql)};
+                RETURN NULL;
+            END;
+            $$;
+
+            CREATE TRIGGER inventario_producto_existencia_{nombre}
+            AFTER {evento} ON inventario_producto
+            {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION inventario_producto_existencia_{nombre}();
+            """
+        )
+    return sql
+
+
+def eliminar_triggers():
+    return [
+        f"""
+        DROP TRIGGER IF EXISTS inventario_producto_existencia_{nombre} ON inventario_producto;
+        DROP FUNCTION IF EXISTS inventario_producto_existencia_{nombre}();
+        """
+        for nombre in TRIGGERS
+    ]
+
+
+RECONSTRUIR_EXISTENCIAS = f"""
+    DELETE FROM inventario_existencia;
+    INSERT INTO inventario_existencia (producto_info_id, ubicacion, area_venta_id, cantidad)
+    SELECT info_id, {UBICACION}, area_venta_id, COUNT(*)
+    FROM inventario_producto
+    WHERE {DISPONIBLE}
+    GROUP BY info_id, 2, area_venta_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0124_existencia_movimientoexistencia'),
+    ]
+
+    operations = [
+        migrations.RunSQL(crear_triggers(), eliminar_triggers()),
+        migrations.RunSQL(RECONSTRUIR_EXISTENCIAS, migrations.RunSQL.noop),
+    ]
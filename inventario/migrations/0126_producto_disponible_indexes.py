@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:30
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Los índices se crean sin bloquear las escrituras en tablas ya pobladas.
+    atomic = False
+
+    dependencies = [
+        ('inventario', '0125_existencia_producto_triggers'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('almacen_revoltosa', False), ('area_venta__isnull', True), ('merma__isnull', True), ('venta__isnull', True)), fields=['info'], name='producto_disp_almacen_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('almacen_revoltosa', True), ('area_venta__isnull', True), ('merma__isnull', True), ('venta__isnull', True)), fields=['info'], name='producto_disp_revoltosa_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('merma__isnull', True), ('venta__isnull', True)), fields=['area_venta', 'info'], name='producto_disp_area_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:32
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Los índices se crean sin bloquear las escrituras en tablas ya pobladas.
+    atomic = False
+
+    dependencies = [
+        ('inventario', '0126_producto_disponible_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='entradaalmacen',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='entrada_almacen_created_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='gastos',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='gasto_created_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='merma',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='merma_created_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacciones',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['created_at'], name='transaccion_created_activa_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ventas',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['created_at'], name='venta_created_activa_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ventas_cafeteria',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['created_at'], name='venta_caf_created_activa_idx'),
+        ),
+    ]
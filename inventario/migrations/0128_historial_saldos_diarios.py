@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0127_created_at_indexes'),
+    ]
+
+    operations = [
+        # Conserva solo el último registro de cada día antes de hacer fecha única.
+        migrations.RunSQL(
+            """
+            DELETE FROM inventario_historialsaldoinventarios AS h
+            USING inventario_historialsaldoinventarios AS posterior
+            WHERE h.fecha = posterior.fecha AND h.id < posterior.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='historialsaldoinventarios',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate, unique=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:46
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Los índices se crean sin bloquear las escrituras en tablas ya pobladas.
+    atomic = False
+
+    dependencies = [
+        ('inventario', '0128_historial_saldos_diarios'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transacciones',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['cuenta', 'created_at'], include=('cantidad', 'tipo', 'es_reversion'), name='transaccion_cuenta_fecha_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacciones',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('tipo', 'TRANSFERENCIA')), fields=['cuenta_origen', 'created_at'], name='transaccion_origen_fecha_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacciones',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('tipo', 'TRANSFERENCIA')), fields=['cuenta_destino', 'created_at'], name='transaccion_destino_fecha_idx'),
+        ),
+    ]
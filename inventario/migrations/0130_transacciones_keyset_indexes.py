@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:49
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Los índices se reemplazan sin bloquear las escrituras en tablas ya pobladas.
+    atomic = False
+
+    dependencies = [
+        ('inventario', '0129_transacciones_cuenta_indexes'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='transacciones',
+            name='transaccion_created_activa_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='transacciones',
+            name='transaccion_cuenta_fecha_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='transacciones',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['created_at', 'id'], name='transaccion_created_activa_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacciones',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['cuenta', 'created_at', 'id'], include=('cantidad', 'tipo', 'es_reversion'), name='transaccion_cuenta_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0130_transacciones_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='miniatura',
+            field=models.URLField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='miniatura_public_id',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.CreateModel(
+            name='ImagenPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contenido', models.BinaryField()),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('producto_info', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imagenes_pendientes', to='inventario.productoinfo')),
+            ],
+            options={
+                'verbose_name': 'Imagen pendiente',
+                'verbose_name_plural': 'Imágenes pendientes',
+            },
+        ),
+    ]
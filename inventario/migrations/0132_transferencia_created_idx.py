@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:39
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Los índices se crean sin bloquear las escrituras en tablas ya pobladas.
+    atomic = False
+
+    dependencies = [
+        ('inventario', '0131_imagenes_pendientes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transferencia',
+            index=models.Index(fields=['created_at', 'id'], name='transferencia_created_idx'),
+        ),
+    ]
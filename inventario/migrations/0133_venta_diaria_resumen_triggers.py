@@ -0,0 +1,242 @@
+from django.conf import settings
+from django.db import migrations
+
+# El resumen lo mantienen triggers por sentencia sobre ventas, productos,
+# ProductoInfo e historial de precios, para que cuenten también las escrituras
+# que no pasan por señales de Django (QuerySet.update(), bulk_update() o el
+# frontend, que escribe directamente en la base de datos).
+#
+# Cada trigger calcula los días (área de venta, fecha local) afectados y los
+# vuelve a agregar desde cero. Antes bloquea las áreas de venta implicadas
+# (FOR NO KEY UPDATE, que no choca con las claves foráneas de las ventas nuevas)
+# para que dos transacciones que venden a la vez en la misma área recalculen
+# una después de la otra, la segunda viendo ya lo confirmado por la primera.
+
+ZONA = settings.TIME_ZONE
+
+
+def fecha(alias):
+    return f"({alias}.created_at AT TIME ZONE '{ZONA}')::date"
+
+
+def precio(tabla):
+    # Igual que HistorialPrecioQuerySet.precio_en: el vigente en la fecha de la
+    # venta o, si la venta es anterior al historial, el primero.
+    return f"""
+        COALESCE(
+            (
+                SELECT h.precio FROM {tabla} h
+                WHERE h.producto_info_id = p.info_id AND h.fecha_inicio <= v.created_at
+                ORDER BY h.fecha_inicio DESC, h.id DESC LIMIT 1
+            ),
+            (
+                SELECT h.precio FROM {tabla} h
+                WHERE h.producto_info_id = p.info_id
+                ORDER BY h.fecha_inicio, h.id LIMIT 1
+            )
+        )
+    """
+
+
+BLOQUEAR_AREAS = """
+    PERFORM 1 FROM inventario_areaventa
+    WHERE id IN (SELECT area_venta_id FROM ({afectados}) AS afectados)
+    ORDER BY id
+    FOR NO KEY UPDATE
+"""
+
+RECALCULAR = f"""
+    WITH afectados AS (
+        SELECT DISTINCT area_venta_id, fecha FROM ({{afectados}}) AS afectados
+    ),
+    totales AS (
+        SELECT
+            v.area_venta_id,
+            {fecha("v")} AS fecha,
+            COUNT(*) AS cantidad,
+            COALESCE(SUM({precio("inventario_historialprecioventasalon")}), 0) AS importe,
+            COALESCE(SUM({precio("inventario_historialpreciocostosalon")}), 0) AS costo,
+            COALESCE(SUM(i.pago_trabajador), 0) AS pago_trabajador
+        FROM afectados a
+        JOIN inventario_ventas v
+            ON v.area_venta_id = a.area_venta_id
+            AND v.created_at >= (a.fecha::timestamp AT TIME ZONE '{ZONA}')
+            AND v.created_at < ((a.fecha + 1)::timestamp AT TIME ZONE '{ZONA}')
+            AND v.deleted_at IS NULL
+        JOIN inventario_producto p ON p.venta_id = v.id
+        JOIN inventario_productoinfo i ON i.id = p.info_id
+        GROUP BY 1, 2
+    ),
+    vacios AS (
+        DELETE FROM inventario_ventadiariaresumen r
+        USING afectados a
+        WHERE r.area_venta_id = a.area_venta_id
+          AND r.fecha = a.fecha
+          AND NOT EXISTS (
+              SELECT 1 FROM totales t
+              WHERE t.area_venta_id = r.area_venta_id AND t.fecha = r.fecha
+          )
+    )
+    INSERT INTO inventario_ventadiariaresumen
+        (area_venta_id, fecha, cantidad, importe, costo, pago_trabajador)
+    SELECT area_venta_id, fecha, cantidad, importe, costo, pago_trabajador
+    FROM totales
+    ON CONFLICT (area_venta_id, fecha) DO UPDATE SET
+        cantidad = EXCLUDED.cantidad,
+        importe = EXCLUDED.importe,
+        costo = EXCLUDED.costo,
+        pago_trabajador = EXCLUDED.pago_trabajador
+"""
+
+
+def dias_de_ventas(alias):
+    return f"SELECT area_venta_id, {fecha(alias)} AS fecha FROM {alias}"
+
+
+def dias_de_productos(alias, columna="venta_id"):
+    return f"""
+        SELECT v.area_venta_id, {fecha("v")} AS fecha
+        FROM {alias} JOIN inventario_ventas v ON v.id = {alias}.{columna}
+    """
+
+
+# Solo las filas en las que cambió algo que afecta al resumen.
+VENTAS_CAMBIADAS = """
+    FROM viejos o JOIN nuevos n USING (id)
+    WHERE (o.area_venta_id, o.created_at, o.deleted_at IS NULL)
+        IS DISTINCT FROM (n.area_venta_id, n.created_at, n.deleted_at IS NULL)
+"""
+
+PRODUCTOS_CAMBIADOS = """
+    FROM viejos o JOIN nuevos n USING (id)
+    WHERE (o.venta_id, o.info_id) IS DISTINCT FROM (n.venta_id, n.info_id)
+"""
+
+
+def dias_por_precio(alias, tabla):
+    # Un precio afecta a las ventas posteriores a su fecha_inicio y, si es el
+    # primero del historial, también a las anteriores.
+    return f"""
+        SELECT v.area_venta_id, {fecha("v")} AS fecha
+        FROM {alias} h
+        JOIN inventario_producto p ON p.info_id = h.producto_info_id
+        JOIN inventario_ventas v ON v.id = p.venta_id
+        WHERE v.created_at >= h.fecha_inicio
+           OR NOT EXISTS (
+               SELECT 1 FROM {tabla} x
+               WHERE x.producto_info_id = h.producto_info_id
+                 AND (x.fecha_inicio, x.id) < (h.fecha_inicio, h.id)
+           )
+    """
+
+
+def triggers_de_precios(tabla):
+    return {
+        (tabla, "insert"): ("INSERT", "NEW TABLE AS nuevos", dias_por_precio("nuevos", tabla)),
+        (tabla, "delete"): ("DELETE", "OLD TABLE AS viejos", dias_por_precio("viejos", tabla)),
+        (tabla, "update"): (
+            "UPDATE",
+            "OLD TABLE AS viejos NEW TABLE AS nuevos",
+            dias_por_precio("viejos", tabla) + " UNION ALL " + dias_por_precio("nuevos", tabla),
+        ),
+    }
+
+
+TRIGGERS = {
+    ("inventario_ventas", "insert"): ("INSERT", "NEW TABLE AS nuevos", dias_de_ventas("nuevos")),
+    ("inventario_ventas", "delete"): ("DELETE", "OLD TABLE AS viejos", dias_de_ventas("viejos")),
+    ("inventario_ventas", "update"): (
+        "UPDATE",
+        "OLD TABLE AS viejos NEW TABLE AS nuevos",
+        f"""
+        SELECT o.area_venta_id, {fecha("o")} AS fecha {VENTAS_CAMBIADAS}
+        UNION ALL
+        SELECT n.area_venta_id, {fecha("n")} AS fecha {VENTAS_CAMBIADAS}
+        """,
+    ),
+    ("inventario_producto", "insert"): ("INSERT", "NEW TABLE AS nuevos", dias_de_productos("nuevos")),
+    ("inventario_producto", "delete"): ("DELETE", "OLD TABLE AS viejos", dias_de_productos("viejos")),
+    ("inventario_producto", "update"): (
+        "UPDATE",
+        "OLD TABLE AS viejos NEW TABLE AS nuevos",
+        f"""
+        SELECT v.area_venta_id, {fecha("v")} AS fecha
+        FROM inventario_ventas v
+        WHERE v.id IN (
+            SELECT o.venta_id {PRODUCTOS_CAMBIADOS}
+            UNION ALL
+            SELECT n.venta_id {PRODUCTOS_CAMBIADOS}
+        )
+        """,
+    ),
+    ("inventario_productoinfo", "update"): (
+        "UPDATE",
+        "OLD TABLE AS viejos NEW TABLE AS nuevos",
+        f"""
+        SELECT v.area_venta_id, {fecha("v")} AS fecha
+        FROM viejos o
+        JOIN nuevos n USING (id)
+        JOIN inventario_producto p ON p.info_id = n.id
+        JOIN inventario_ventas v ON v.id = p.venta_id
+        WHERE o.pago_trabajador IS DISTINCT FROM n.pago_trabajador
+        """,
+    ),
+    **triggers_de_precios("inventario_historialprecioventasalon"),
+    **triggers_de_precios("inventario_historialpreciocostosalon"),
+}
+
+
+def nombre_trigger(tabla, evento):
+    return f"{tabla}_resumen_{evento}"
+
+
+def crear_triggers():
+    sql = []
+    for (tabla, nombre), (evento, referencing, afectados) in TRIGGERS.items():
+        trigger = nombre_trigger(tabla, nombre)
+        sql.append(
+            f"""
+            CREATE FUNCTION {trigger}() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                {BLOQUEAR_AREAS.format(afectados=afectados)};
+                {RECALCULAR.format(afectados=afectados)};
+                RETURN NULL;
+            END;
+            $$;
+
+            CREATE TRIGGER {trigger}
+            AFTER {evento} ON {tabla}
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION {trigger}();
+            """
+        )
+    return sql
+
+
+def eliminar_triggers():
+    return [
+        f"""
+        DROP TRIGGER IF EXISTS {nombre_trigger(tabla, nombre)} ON {tabla};
+        DROP FUNCTION IF EXISTS {nombre_trigger(tabla, nombre)}();
+        """
+        for tabla, nombre in TRIGGERS
+    ]
+
+
+# Rehace el resumen completo por si cambió algo entre 0121 y estos triggers.
+RECONSTRUIR_RESUMEN = "DELETE FROM inventario_ventadiariaresumen;" + RECALCULAR.format(
+    afectados=dias_de_productos("inventario_producto")
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0132_transferencia_created_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(crear_triggers(), eliminar_triggers()),
+        migrations.RunSQL(RECONSTRUIR_RESUMEN, migrations.RunSQL.noop),
+    ]
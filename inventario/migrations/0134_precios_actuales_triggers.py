@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Los precios actuales guardados en ProductoInfo y Productos_Cafeteria los
+# mantienen triggers sobre su historial, porque el frontend escribe el historial
+# (y crea productos) directamente en la base de datos, sin pasar por las
+# señales de Django. Igual que HistorialPrecioQuerySet.ultimo_precio, el precio
+# actual es el último registrado (mayor id), o 0 si no hay ninguno.
+
+HISTORIALES = {
+    "inventario_historialpreciocostosalon": ("inventario_productoinfo", "producto_info_id", "precio_costo"),
+    "inventario_historialprecioventasalon": ("inventario_productoinfo", "producto_info_id", "precio_venta"),
+    "inventario_historialpreciocostocafeteria": ("inventario_productos_cafeteria", "producto_id", "precio_costo"),
+    "inventario_historialprecioventacafeteria": ("inventario_productos_cafeteria", "producto_id", "precio_venta"),
+}
+
+EVENTOS = {
+    "insert": ("INSERT", "NEW TABLE AS nuevos", "SELECT {fk} FROM nuevos"),
+    "delete": ("DELETE", "OLD TABLE AS viejos", "SELECT {fk} FROM viejos"),
+    "update": (
+        "UPDATE",
+        "OLD TABLE AS viejos NEW TABLE AS nuevos",
+        "SELECT {fk} FROM viejos UNION SELECT {fk} FROM nuevos",
+    ),
+}
+
+ACTUALIZAR = """
+    UPDATE {producto} p
+    SET {campo} = COALESCE(
+        (SELECT h.precio FROM {historial} h WHERE h.{fk} = p.id ORDER BY h.id DESC LIMIT 1),
+        0
+    )
+    WHERE p.id IN ({afectados})
+"""
+
+
+def nombre_trigger(historial, evento):
+    return f"{historial}_actual_{evento}"
+
+
+def crear_triggers():
+    sql = []
+    for historial, (producto, fk, campo) in HISTORIALES.items():
+        for nombre, (evento, referencing, afectados) in EVENTOS.items():
+            trigger = nombre_trigger(historial, nombre)
+            actualizar = ACTUALIZAR.format(
+                producto=producto,
+                campo=campo,
+                historial=historial,
+                fk=fk,
+                afectados=afectados.format(fk=fk),
+            )
+            sql.append(
+                f"""
+                CREATE FUNCTION {trigger}() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    {actualizar};
+                    RETURN NULL;
+                END;
+                $$;
+
+                CREATE TRIGGER {trigger}
+                AFTER {evento} ON {historial}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION {trigger}();
+                """
+            )
+    return sql
+
+
+def eliminar_triggers():
+    return [
+        f"""
+        DROP TRIGGER IF EXISTS {nombre_trigger(historial, nombre)} ON {historial};
+        DROP FUNCTION IF EXISTS {nombre_trigger(historial, nombre)}();
+        """
+        for historial in HISTORIALES
+        for nombre in EVENTOS
+    ]
+
+
+# Pone al día los precios por si el historial cambió sin pasar por las señales.
+SINCRONIZAR = [
+    ACTUALIZAR.format(
+        producto=producto,
+        campo=campo,
+        historial=historial,
+        fk=fk,
+        afectados=f"SELECT id FROM {producto}",
+    )
+    for historial, (producto, fk, campo) in HISTORIALES.items()
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0133_venta_diaria_resumen_triggers"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productoinfo",
+            name="precio_costo",
+            field=models.DecimalField(decimal_places=2, db_default=Decimal("0.00"), default=Decimal("0.00"), editable=False, max_digits=7),
+        ),
+        migrations.AlterField(
+            model_name="productoinfo",
+            name="precio_venta",
+            field=models.DecimalField(decimal_places=2, db_default=Decimal("0.00"), default=Decimal("0.00"), editable=False, max_digits=7),
+        ),
+        migrations.AlterField(
+            model_name="productos_cafeteria",
+            name="precio_costo",
+            field=models.DecimalField(decimal_places=10, db_default=Decimal("0.00"), default=Decimal("0.00"), editable=False, max_digits=20),
+        ),
+        migrations.AlterField(
+            model_name="productos_cafeteria",
+            name="precio_venta",
+            field=models.DecimalField(decimal_places=10, db_default=Decimal("0.00"), default=Decimal("0.00"), editable=False, max_digits=20),
+        ),
+        migrations.RunSQL(crear_triggers(), eliminar_triggers()),
+        migrations.RunSQL(SINCRONIZAR, migrations.RunSQL.noop),
+    ]
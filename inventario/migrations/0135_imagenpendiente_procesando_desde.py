@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0134_precios_actuales_triggers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenpendiente',
+            name='procesando_desde',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
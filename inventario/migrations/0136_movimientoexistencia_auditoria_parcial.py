@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0135_imagenpendiente_procesando_desde'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='movimientoexistencia',
+            name='merma',
+        ),
+        migrations.RemoveField(
+            model_name='movimientoexistencia',
+            name='venta',
+        ),
+        migrations.AlterField(
+            model_name='movimientoexistencia',
+            name='tipo',
+            field=models.CharField(choices=[('ENTRADA', 'Entrada'), ('SALIDA', 'Salida'), ('TRANSFERENCIA', 'Transferencia')], max_length=30),
+        ),
+    ]
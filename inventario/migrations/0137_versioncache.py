@@ -0,0 +1,127 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Las versiones de los grupos de caché las suben triggers por sentencia sobre
+# las tablas de cada grupo, para que cuenten también las escrituras que no
+# pasan por Django (el frontend escribe directamente en la base de datos).
+#
+# Subir la versión dentro de cada sentencia bloquearía la fila del grupo hasta
+# el final de la transacción, y dos transacciones que tocan grupos en distinto
+# orden podrían bloquearse mutuamente. Por eso el trigger de cada tabla solo
+# anota (transacción, grupo) en inventario_cambiocache, y un trigger diferido
+# sube las versiones al confirmar, bloqueándolas siempre en orden de grupo.
+# Quien lea antes de la confirmación sigue viendo la versión anterior junto a
+# los datos anteriores, así que nunca se guarda en caché un estado mezclado.
+
+GRUPOS = ["cafeteria", "catalogo", "cuentas", "inventario", "ventas"]
+
+TABLAS = {
+    "inventario_ventas": ["ventas"],
+    "inventario_producto": ["ventas", "inventario"],
+    "inventario_productoinfo": ["ventas", "catalogo", "inventario"],
+    "inventario_image": ["ventas", "catalogo"],
+    "inventario_categorias": ["ventas", "catalogo", "inventario"],
+    "inventario_historialpreciocostosalon": ["ventas", "catalogo", "inventario"],
+    "inventario_historialprecioventasalon": ["ventas", "catalogo", "inventario"],
+    "inventario_areaventa": ["ventas"],
+    "inventario_gastos": ["ventas"],
+    "inventario_gastos_areas_venta": ["ventas"],
+    "inventario_ventadiariaresumen": ["ventas"],
+    "inventario_existencia": ["inventario"],
+    "inventario_cuentas": ["cuentas"],
+    "inventario_elaboraciones": ["cafeteria"],
+    "inventario_elaboraciones_ingredientes_cantidad": ["cafeteria"],
+    "inventario_ingrediente_cantidad": ["cafeteria"],
+    "inventario_precioelaboracion": ["cafeteria"],
+    "inventario_productos_cafeteria": ["cafeteria"],
+    "inventario_historialpreciocostocafeteria": ["cafeteria"],
+    "inventario_historialprecioventacafeteria": ["cafeteria"],
+}
+
+CREAR_CAMBIOS = f"""
+    INSERT INTO inventario_versioncache (grupo, version, modificado)
+    SELECT unnest(ARRAY{GRUPOS!r}::varchar[]), 0, now();
+
+    CREATE TABLE inventario_cambiocache (
+        txid bigint NOT NULL,
+        grupo varchar(20) NOT NULL,
+        PRIMARY KEY (txid, grupo)
+    );
+
+    CREATE FUNCTION inventario_cache_anotar() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO inventario_cambiocache (txid, grupo)
+        SELECT txid_current(), unnest(TG_ARGV)
+        ON CONFLICT DO NOTHING;
+        RETURN NULL;
+    END;
+    $$;
+
+    CREATE FUNCTION inventario_cache_subir_versiones() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- La primera fila anotada por la transacción sube todos sus grupos y
+        -- borra las anotaciones; para las demás ya no queda nada que hacer.
+        PERFORM 1 FROM inventario_versioncache
+        WHERE grupo IN (SELECT grupo FROM inventario_cambiocache WHERE txid = NEW.txid)
+        ORDER BY grupo
+        FOR NO KEY UPDATE;
+
+        UPDATE inventario_versioncache
+        SET version = version + 1, modificado = clock_timestamp()
+        WHERE grupo IN (SELECT grupo FROM inventario_cambiocache WHERE txid = NEW.txid);
+
+        DELETE FROM inventario_cambiocache WHERE txid = NEW.txid;
+        RETURN NULL;
+    END;
+    $$;
+
+    CREATE CONSTRAINT TRIGGER inventario_cambiocache_subir_versiones
+    AFTER INSERT ON inventario_cambiocache
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION inventario_cache_subir_versiones();
+"""
+
+ELIMINAR_CAMBIOS = """
+    DROP TABLE IF EXISTS inventario_cambiocache;
+    DROP FUNCTION IF EXISTS inventario_cache_subir_versiones();
+    DROP FUNCTION IF EXISTS inventario_cache_anotar();
+"""
+
+
+def crear_triggers():
+    return [
+        f"""
+        CREATE TRIGGER {tabla}_cache
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabla}
+        FOR EACH STATEMENT EXECUTE FUNCTION inventario_cache_anotar({", ".join(f"'{grupo}'" for grupo in grupos)});
+        """
+        for tabla, grupos in TABLAS.items()
+    ]
+
+
+def eliminar_triggers():
+    return [f"DROP TRIGGER IF EXISTS {tabla}_cache ON {tabla};" for tabla in TABLAS]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0136_movimientoexistencia_auditoria_parcial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCache',
+            fields=[
+                ('grupo', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('modificado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunSQL(CREAR_CAMBIOS, ELIMINAR_CAMBIOS),
+        migrations.RunSQL(crear_triggers(), eliminar_triggers()),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:26
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0137_versioncache'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='MovimientoExistencia',
+        ),
+    ]
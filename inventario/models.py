@@ -1,13 +1,32 @@
+from datetime import timedelta
 from decimal import Decimal
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connections, models, transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    UniqueConstraint,
+    Value,
+    When,
+)
+from django.db.models import sql
+from django.db.models.functions import Coalesce, TruncDate
 from django.utils import timezone
+from django.contrib.postgres.indexes import BrinIndex
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from .utils import limites_dias
+
 
 class BancoChoices(models.TextChoices):
     BPA = "BPA", "BPA"
@@ -77,6 +96,11 @@ class TipoTranferenciaChoices(models.TextChoices):
     ENTRADA = "ENTRADA", "Entrada"
     PAGO_DEUDA = "PAGO_DEUDA", "Pago de Deuda"
 
+class UbicacionExistenciaChoices(models.TextChoices):
+    ALMACEN_PRINCIPAL = "ALMACEN_PRINCIPAL", "Almacén principal"
+    ALMACEN_REVOLTOSA = "ALMACEN_REVOLTOSA", "Almacén revoltosa"
+    AREA_VENTA = "AREA_VENTA", "Área de venta"
+
 class TIPO_AJUSTE(models.TextChoices):
     MERMA = "MERMA", "Merma"
     CUENTA_CASA = "CUENTA_CASA", "Cuenta Casa"
@@ -90,6 +114,8 @@ class EstadoDeudaChoices(models.TextChoices):
 class Image(models.Model):
     public_id = models.CharField(max_length=50, unique=True)
     url = models.URLField(unique=True)
+    miniatura_public_id = models.CharField(max_length=50, null=True, blank=True)
+    miniatura = models.URLField(null=True, blank=True)
 
 class Categorias(models.Model):
     nombre = models.CharField(max_length=50)
@@ -116,6 +142,55 @@ class VendedorExterno(models.Model):
         return self.nombre
 
 
+class SaldoInsuficienteError(Exception):
+    def __init__(self, cuenta):
+        self.cuenta = cuenta
+        super().__init__(f"Saldo insuficiente en la cuenta: {cuenta.nombre}.")
+
+class CuentasManager(models.Manager):
+    def bloquear(self, ids):
+        # Siempre en orden de pk para que dos operaciones sobre las mismas
+        # cuentas no se bloqueen mutuamente.
+        cuentas = {
+            cuenta.pk: cuenta
+            for cuenta in self.select_for_update().filter(pk__in=set(ids)).order_by("pk")
+        }
+        if len(cuentas) < len(set(ids)):
+            raise self.model.DoesNotExist("No Cuentas matches the given query.")
+        return cuentas
+
+    def mover_saldos(self, transacciones, signo, crear=True, validar_saldo=False):
+        """Suma signo * transaccion.cantidad al saldo de cada cuenta.
+
+        Las cuentas se bloquean con select_for_update, el saldo se actualiza con
+        F("saldo") y, si crear es True, las transacciones se insertan en bloque
+        con el saldo_resultante de cada una.
+        """
+        transacciones = list(transacciones)
+        with transaction.atomic():
+            cuentas = self.bloquear(t.cuenta_id for t in transacciones)
+            deltas = {}
+            for transaccion in transacciones:
+                cuenta = cuentas[transaccion.cuenta_id]
+                delta = signo * Decimal(transaccion.cantidad)
+                cuenta.saldo += delta
+                if validar_saldo and delta < 0 and cuenta.saldo < 0:
+                    raise SaldoInsuficienteError(cuenta)
+                transaccion.saldo_resultante = cuenta.saldo
+                deltas[cuenta.pk] = deltas.get(cuenta.pk, Decimal(0)) + delta
+
+            if deltas:
+                self.filter(pk__in=deltas).update(
+                    saldo=F("saldo")
+                    + Case(
+                        *(When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()),
+                        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                    )
+                )
+            if crear:
+                Transacciones.objects.bulk_create(transacciones)
+        return transacciones
+
 class Cuentas(models.Model):
     nombre = models.CharField(max_length=50, blank=False, null=False)
     tipo = models.CharField(max_length=30, choices=CuentasChoices.choices, blank=False, null=False)
@@ -126,6 +201,8 @@ class Cuentas(models.Model):
     active = models.BooleanField(default=True, null=False, blank=False)
     eliminado = models.BooleanField(default=False, null=False, blank=False)
 
+    objects = CuentasManager()
+
     def __str__(self):
         return self.nombre
 
@@ -133,11 +210,81 @@ class Cuentas(models.Model):
         verbose_name = "Cuenta"
         verbose_name_plural = "Cuentas"
 
+class HistorialSaldoCuentaManager(models.Manager):
+    def registrar(self, desde, hasta=None):
+        """Guarda el saldo de cierre de cada cuenta para cada día entre desde y
+        hasta (hoy por defecto).
+
+        Se parte del saldo actual y se descuentan las variaciones de las
+        transacciones posteriores a cada día, así que no hace falta reproducir
+        todo el historial.
+        """
+        hoy = timezone.localdate()
+        hasta = min(hasta or hoy, hoy)
+        inicio, _ = limites_dias(desde + timedelta(days=1))
+        variaciones = (
+            Transacciones.objects.filter(created_at__gte=inicio)
+            .annotate(fecha=TruncDate("created_at"))
+            .variaciones_de_saldo("fecha")
+        )
+
+        historial = []
+        for cuenta in Cuentas.objects.only("saldo"):
+            saldo = cuenta.saldo
+            fecha = hoy
+            while fecha >= desde:
+                if fecha <= hasta:
+                    historial.append(
+                        HistorialSaldoCuenta(cuenta=cuenta, fecha=fecha, saldo=saldo)
+                    )
+                saldo -= variaciones.get((cuenta.pk, fecha), 0)
+                fecha -= timedelta(days=1)
+
+        return self.bulk_create(
+            historial,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["cuenta", "fecha"],
+            update_fields=["saldo"],
+        )
+
+    def saldo_en(self, cuenta, momento):
+        """Saldo de la cuenta en un momento dado.
+
+        Parte del último cierre guardado antes de ese día y suma las
+        transacciones posteriores hasta el momento. Sin cierre previo, resta al
+        saldo actual las transacciones posteriores al momento. Devuelve
+        (saldo, fecha del cierre usado o None).
+        """
+        cierre = (
+            self.filter(cuenta=cuenta, fecha__lt=timezone.localdate(momento))
+            .order_by("-fecha")
+            .first()
+        )
+
+        if cierre is not None:
+            inicio, _ = limites_dias(cierre.fecha + timedelta(days=1))
+            transacciones = Transacciones.objects.filter(
+                created_at__gte=inicio, created_at__lte=momento
+            )
+            saldo, signo = cierre.saldo, 1
+        else:
+            transacciones = Transacciones.objects.filter(created_at__gt=momento)
+            saldo, signo = cuenta.saldo, -1
+
+        variacion = transacciones.variaciones_de_saldo(cuentas=[cuenta.pk]).get(
+            (cuenta.pk,), 0
+        )
+        return saldo + signo * variacion, cierre.fecha if cierre else None
+
+
 class HistorialSaldoCuenta(models.Model):
     cuenta = models.ForeignKey(Cuentas, on_delete=models.CASCADE, related_name="historial_saldos")
     saldo = models.DecimalField(max_digits=12, decimal_places=2, blank=False, null=False)
     fecha = models.DateField(default=timezone.localdate, db_index=True)
 
+    objects = HistorialSaldoCuentaManager()
+
     def __str__(self):
         return f"{self.cuenta.nombre} - {self.fecha} - {self.saldo}"
 
@@ -213,52 +360,110 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
 
+class HistorialPrecioQuerySet(models.QuerySet):
+    def precio_en(self, fecha, **filtros):
+        """Precio vigente en `fecha`; si es anterior al historial, el primer precio."""
+        historial = self.filter(**filtros)
+        vigente = historial.filter(fecha_inicio__lte=fecha).order_by("-fecha_inicio", "-id")
+        primero = historial.order_by("fecha_inicio", "id")
+        return Coalesce(
+            Subquery(vigente.values("precio")[:1]),
+            Subquery(primero.values("precio")[:1]),
+        )
+
+    def ultimo_precio(self, **filtros):
+        return Coalesce(
+            Subquery(self.filter(**filtros).order_by("-id").values("precio")[:1]),
+            Decimal("0.00"),
+        )
+
+class ProductoInfoQuerySet(models.QuerySet):
+    def _ultimos_precios(self):
+        return {
+            "precio_costo": HistorialPrecioCostoSalon.objects.ultimo_precio(producto_info=OuterRef("pk")),
+            "precio_venta": HistorialPrecioVentaSalon.objects.ultimo_precio(producto_info=OuterRef("pk")),
+        }
+
+    def con_precios_actuales(self):
+        return self.annotate(**{f"ultimo_{campo}": precio for campo, precio in self._ultimos_precios().items()})
+
+    def actualizar_precios(self):
+        return self.update(**self._ultimos_precios())
+
 class ProductoInfo(models.Model):
     descripcion = models.CharField(max_length=100, blank=False, null=False, unique=True)
     localizacion = models.CharField(max_length=100, blank=True, null=True)
     imagen = models.ForeignKey(Image, on_delete=models.SET_NULL, null=True, blank=True)
     pago_trabajador = models.IntegerField()
     categoria = models.ForeignKey(Categorias, on_delete=models.CASCADE)
+    precio_costo = models.DecimalField(max_digits=7, decimal_places=2, default=Decimal("0.00"), db_default=Decimal("0.00"), editable=False)
+    precio_venta = models.DecimalField(max_digits=7, decimal_places=2, default=Decimal("0.00"), db_default=Decimal("0.00"), editable=False)
 
-    @property
-    def precio_costo(self):
-        return self.historial_costo.order_by("-id").first().precio
-
-    @property
-    def precio_venta(self):
-        return self.historial_venta.order_by("-id").first().precio
+    objects = ProductoInfoQuerySet.as_manager()
 
     def __str__(self):
         return self.descripcion
 
+class ImagenPendiente(models.Model):
+    """Imagen subida para un producto que aún no se ha procesado ni subido a
+    Cloudinary (ver inventario.imagenes)."""
+    producto_info = models.ForeignKey(ProductoInfo, on_delete=models.CASCADE, related_name="imagenes_pendientes")
+    contenido = models.BinaryField()
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    procesando_desde = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Imagen pendiente"
+        verbose_name_plural = "Imágenes pendientes"
+
 class HistorialPrecioCostoSalon(models.Model):
     producto_info = models.ForeignKey(ProductoInfo, on_delete=models.CASCADE, related_name="historial_costo", null=True)
     precio = models.DecimalField(max_digits=7, decimal_places=2, blank=False, null=False)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
     fecha_inicio = models.DateTimeField(auto_now_add=True)
 
+    objects = HistorialPrecioQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["producto_info", "fecha_inicio"]),
+        ]
+
 class HistorialPrecioVentaSalon(models.Model):
     producto_info = models.ForeignKey(ProductoInfo, on_delete=models.CASCADE, related_name="historial_venta", null=True)
     precio = models.DecimalField(max_digits=7, decimal_places=2, blank=False, null=False)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
     fecha_inicio = models.DateTimeField(auto_now_add=True)
 
+    objects = HistorialPrecioQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["producto_info", "fecha_inicio"]),
+        ]
+
+class Productos_CafeteriaQuerySet(models.QuerySet):
+    def _ultimos_precios(self):
+        return {
+            "precio_costo": HistorialPrecioCostoCafeteria.objects.ultimo_precio(producto=OuterRef("pk")),
+            "precio_venta": HistorialPrecioVentaCafeteria.objects.ultimo_precio(producto=OuterRef("pk")),
+        }
+
+    def actualizar_precios(self):
+        return self.update(**self._ultimos_precios())
+
 class Productos_Cafeteria(models.Model):
     nombre = models.CharField(max_length=50, blank=False, null=False, unique=True)
     is_ingrediente = models.BooleanField(default=False)
     unidad = models.CharField(max_length=10, blank=True, null=True)
     active = models.BooleanField(default=True, null=False, blank=False)
     tipo = models.CharField(max_length=15, choices=TipoProductoCafeteriaChoices.choices, blank=True, null=True)
+    precio_costo = models.DecimalField(max_digits=20, decimal_places=10, default=Decimal("0.00"), db_default=Decimal("0.00"), editable=False)
+    precio_venta = models.DecimalField(max_digits=20, decimal_places=10, default=Decimal("0.00"), db_default=Decimal("0.00"), editable=False)
 
-    @property
-    def precio_costo(self):
-        ultimo_costo = self.historial_costo.order_by("-id").first()
-        return ultimo_costo.precio if ultimo_costo else Decimal("0.00")
-
-    @property
-    def precio_venta(self):
-        ultima_venta = self.historial_venta.order_by("-id").first()
-        return ultima_venta.precio if ultima_venta else Decimal("0.00")
+    objects = Productos_CafeteriaQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.nombre
@@ -273,12 +478,26 @@ class HistorialPrecioCostoCafeteria(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
     fecha_inicio = models.DateTimeField(auto_now_add=True)
 
+    objects = HistorialPrecioQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["producto", "fecha_inicio"]),
+        ]
+
 class HistorialPrecioVentaCafeteria(models.Model):
     producto = models.ForeignKey(Productos_Cafeteria, on_delete=models.CASCADE, related_name="historial_venta", null=True)
     precio = models.DecimalField(max_digits=20, decimal_places=10, blank=False, null=False)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
     fecha_inicio = models.DateTimeField(auto_now_add=True)
 
+    objects = HistorialPrecioQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["producto", "fecha_inicio"]),
+        ]
+
 class Ingrediente_Cantidad(models.Model):
     ingrediente = models.ForeignKey(Productos_Cafeteria, on_delete=models.CASCADE, null=False, blank=False)
     cantidad = models.DecimalField(max_digits=20, decimal_places=10, blank=False, null=False)
@@ -350,6 +569,9 @@ class EntradaAlmacen(models.Model):
     class Meta:
         verbose_name = "EntradaAlmacen"
         verbose_name_plural = "EntradasAlmacen"
+        indexes = [
+            BrinIndex(fields=["created_at"], name="entrada_almacen_created_brin"),
+        ]
 
 class Ventas(models.Model):
     area_venta = models.ForeignKey(AreaVenta, on_delete=models.CASCADE)
@@ -360,6 +582,15 @@ class Ventas(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="venta_created_activa_idx",
+            ),
+        ]
+
 class SalidaAlmacen(models.Model):
     area_venta = models.ForeignKey(AreaVenta, on_delete=models.CASCADE, null=True)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
@@ -387,8 +618,108 @@ class Merma(models.Model):
     class Meta:
         verbose_name = "Merma"
         verbose_name_plural = "Mermas"
+        indexes = [
+            BrinIndex(fields=["created_at"], name="merma_created_brin"),
+        ]
+
 
 
+class ProductoQuerySet(models.QuerySet):
+    def con_precios_vigentes(self):
+        return self.annotate(
+            precio_venta_vigente=HistorialPrecioVentaSalon.objects.precio_en(
+                OuterRef("venta__created_at"), producto_info=OuterRef("info")
+            ),
+            precio_costo_vigente=HistorialPrecioCostoSalon.objects.precio_en(
+                OuterRef("venta__created_at"), producto_info=OuterRef("info")
+            ),
+        )
+
+    def ranking_ventas(self, orden="cantidad", con_precios=None):
+        """Productos vendidos agrupados por ProductoInfo con unidades y, si
+        `con_precios`, importe, costo y ganancia a los precios de cada venta,
+        de mayor a menor según `orden`.
+
+        Los precios son dos subconsultas por producto vendido, así que por
+        defecto solo se calculan si `orden` los necesita.
+        """
+        if con_precios is None:
+            con_precios = orden != "cantidad"
+
+        vendidos = self.filter(venta__isnull=False, venta__deleted_at__isnull=True)
+        if con_precios:
+            vendidos = vendidos.con_precios_vigentes()
+
+        ranking = vendidos.values("info").annotate(cantidad=Count("id"))
+        if con_precios:
+            ranking = ranking.annotate(
+                importe=Coalesce(Sum("precio_venta_vigente"), Decimal("0.00")),
+                costo=Coalesce(Sum("precio_costo_vigente"), Decimal("0.00")),
+            ).annotate(
+                ganancia=F("importe") - F("costo") - Sum("info__pago_trabajador")
+            )
+        return ranking.order_by(f"-{orden}", "info")
+
+    def bloquear_y_comprobar(self, ids, condiciones):
+        """Bloquea los productos `ids` con SELECT ... FOR UPDATE (en orden de
+        pk y esperando a quien ya los tenga) y evalúa en esa misma consulta
+        cada condición de `condiciones` ({mensaje: Q}).
+
+        Devuelve {mensaje: [ids]} con los que no cumplen: cada id aparece solo
+        en la primera condición que falla, y los inexistentes en
+        "Algunos ids no existen". Vacío si todos cumplen.
+        """
+        cumple = {
+            f"cumple_{i}": ExpressionWrapper(condicion, output_field=BooleanField())
+            for i, condicion in enumerate(condiciones.values())
+        }
+        estados = {
+            pk: resultados
+            for pk, *resultados in self.select_for_update()
+            .filter(pk__in=ids)
+            .order_by("pk")
+            .annotate(**cumple)
+            .values_list("pk", *cumple)
+        }
+
+        errores = {}
+        for pk in ids:
+            if pk not in estados:
+                mensaje = "Algunos ids no existen"
+            else:
+                mensaje = next(
+                    (m for m, ok in zip(condiciones, estados[pk]) if not ok), None
+                )
+            if mensaje:
+                errores.setdefault(mensaje, []).append(pk)
+        return errores
+
+    def reservar(self, cantidad, **cambios):
+        """Aplica `cambios` a `cantidad` unidades de este queryset en una sola
+        sentencia y devuelve sus ids:
+
+            UPDATE ... WHERE id IN (SELECT id ... LIMIT n FOR UPDATE SKIP LOCKED)
+            RETURNING id
+
+        Las unidades que otra transacción ya tiene bloqueadas se saltan, así
+        dos peticiones concurrentes nunca mueven la misma. Si no hay bastantes
+        libres devuelve menos ids; quien llama debe comprobarlo y abortar la
+        transacción.
+        """
+        libres = (
+            self.select_for_update(skip_locked=True)
+            .order_by("pk")
+            .values("pk")[:cantidad]
+        )
+        query = self.model.objects.filter(pk__in=libres).query.chain(sql.UpdateQuery)
+        query.add_update_values(cambios)
+        sentencia, params = query.get_compiler(self.db).as_sql()
+
+        conexion = connections[self.db]
+        pk = conexion.ops.quote_name(self.model._meta.pk.column)
+        with conexion.cursor() as cursor:
+            cursor.execute(f"{sentencia} RETURNING {pk}", params)
+            return [fila[0] for fila in cursor.fetchall()]
 
 class Producto(models.Model):
     info = models.ForeignKey(ProductoInfo, on_delete=models.CASCADE)
@@ -402,6 +733,68 @@ class Producto(models.Model):
     almacen_revoltosa = models.BooleanField(default=False)
     merma = models.ForeignKey(Merma, on_delete=models.SET_NULL, null=True, blank=True)
 
+    objects = ProductoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["info"],
+                condition=models.Q(
+                    venta__isnull=True,
+                    merma__isnull=True,
+                    area_venta__isnull=True,
+                    almacen_revoltosa=False,
+                ),
+                name="producto_disp_almacen_idx",
+            ),
+            models.Index(
+                fields=["info"],
+                condition=models.Q(
+                    venta__isnull=True,
+                    merma__isnull=True,
+                    area_venta__isnull=True,
+                    almacen_revoltosa=True,
+                ),
+                name="producto_disp_revoltosa_idx",
+            ),
+            models.Index(
+                fields=["area_venta", "info"],
+                condition=models.Q(venta__isnull=True, merma__isnull=True),
+                name="producto_disp_area_idx",
+            ),
+        ]
+
+class PaginadoPorCursorQuerySet(models.QuerySet):
+    """Paginación por cursor (created_at, id) en orden (-created_at, -id), sin
+    OFFSET. Ver inventario_v2.utils.paginar."""
+
+    def recientes(self):
+        return self.order_by("-created_at", "-id")
+
+    def antes_de(self, created_at, pk):
+        """Filas que siguen a (created_at, pk) en orden (-created_at, -id)."""
+        return self.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk),
+            created_at__lte=created_at,
+        ).recientes()
+
+class TransferenciaQuerySet(PaginadoPorCursorQuerySet):
+
+    def totales_por_producto(self, ids):
+        """{transferencia_id: [{"descripcion", "total_transfers"}]} con las
+        unidades de cada ProductoInfo en las transferencias `ids`, agrupadas
+        en una sola consulta sobre la tabla intermedia."""
+        filas = (
+            self.model.productos.through.objects.filter(transferencia_id__in=ids)
+            .values("transferencia_id", descripcion=F("producto__info__descripcion"))
+            .annotate(total_transfers=Count("id"))
+            .order_by("transferencia_id", "descripcion")
+        )
+        totales = {pk: [] for pk in ids}
+        for fila in filas:
+            totales[fila.pop("transferencia_id")].append(fila)
+        return totales
+
 class Transferencia(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
@@ -409,12 +802,95 @@ class Transferencia(models.Model):
     de = models.ForeignKey(AreaVenta, on_delete=models.SET_NULL, null=True, related_name="area_remitente")
     para = models.ForeignKey(AreaVenta, on_delete=models.SET_NULL, null=True, related_name="area_destino")
 
+    objects = TransferenciaQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.created_at}"
 
     class Meta:
         verbose_name = "Transferencia"
         verbose_name_plural = "Transferencias"
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="transferencia_created_idx"),
+        ]
+
+
+class ExistenciaManager(models.Manager):
+    # Las existencias se mantienen con triggers sobre inventario_producto
+    # (migración 0125), así que también cubren las escrituras que no pasan
+    # por Django. reconstruir() recalcula la tabla desde cero.
+    def calcular(self):
+        filas = (
+            Producto.objects.filter(venta__isnull=True, merma__isnull=True)
+            .values("info", "area_venta", "almacen_revoltosa")
+            .annotate(cantidad=Count("id"))
+        )
+        existencias = []
+        for fila in filas:
+            if fila["area_venta"]:
+                ubicacion = UbicacionExistenciaChoices.AREA_VENTA
+            elif fila["almacen_revoltosa"]:
+                ubicacion = UbicacionExistenciaChoices.ALMACEN_REVOLTOSA
+            else:
+                ubicacion = UbicacionExistenciaChoices.ALMACEN_PRINCIPAL
+            existencias.append(
+                Existencia(
+                    producto_info_id=fila["info"],
+                    ubicacion=ubicacion,
+                    area_venta_id=fila["area_venta"],
+                    cantidad=fila["cantidad"],
+                )
+            )
+        return existencias
+
+    def diferencias(self):
+        def clave(existencia):
+            return (
+                existencia.producto_info_id,
+                existencia.ubicacion,
+                existencia.area_venta_id,
+            )
+
+        esperadas = {clave(e): e.cantidad for e in self.calcular()}
+        actuales = {clave(e): e.cantidad for e in self.filter(cantidad__gt=0)}
+        return sorted(
+            (k, esperadas.get(k, 0), actuales.get(k, 0))
+            for k in esperadas.keys() | actuales.keys()
+            if esperadas.get(k, 0) != actuales.get(k, 0)
+        )
+
+    def reconstruir(self):
+        existencias = self.calcular()
+        with transaction.atomic():
+            self.all().delete()
+            return self.bulk_create(existencias)
+
+class Existencia(models.Model):
+    producto_info = models.ForeignKey(ProductoInfo, on_delete=models.CASCADE, related_name="existencias")
+    ubicacion = models.CharField(max_length=30, choices=UbicacionExistenciaChoices.choices)
+    area_venta = models.ForeignKey(AreaVenta, on_delete=models.CASCADE, null=True, blank=True)
+    cantidad = models.IntegerField(default=0)
+
+    objects = ExistenciaManager()
+
+    def __str__(self):
+        return f"{self.producto_info.descripcion} - {self.get_ubicacion_display()}"
+
+    class Meta:
+        verbose_name = "Existencia"
+        verbose_name_plural = "Existencias"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["producto_info", "ubicacion"],
+                condition=models.Q(area_venta__isnull=True),
+                name="unique_existencia_almacen",
+            ),
+            models.UniqueConstraint(
+                fields=["producto_info", "area_venta"],
+                condition=models.Q(area_venta__isnull=False),
+                name="unique_existencia_area_venta",
+            ),
+        ]
 
 
 class Productos_Entradas_Cafeteria(models.Model):
@@ -486,6 +962,15 @@ class Ventas_Cafeteria(models.Model):
     )
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="venta_caf_created_activa_idx",
+            ),
+        ]
+
 class Gastos(models.Model):
     tipo = models.CharField(max_length=30, choices=GastosChoices.choices, blank=False, null=False)
     areas_venta = models.ManyToManyField(AreaVenta, blank=True)
@@ -500,6 +985,11 @@ class Gastos(models.Model):
     dia_mes = models.IntegerField(null=True, blank=True)
     dia_semana = models.IntegerField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            BrinIndex(fields=["created_at"], name="gasto_created_brin"),
+        ]
+
 class Deuda(models.Model):
     proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name="deudas")
 
@@ -542,6 +1032,80 @@ class PagoDeuda(models.Model):
         verbose_name = "Pago de Deuda"
         verbose_name_plural = "Pagos de Deudas"
         
+class TransaccionesQuerySet(PaginadoPorCursorQuerySet):
+    INGRESOS = (TipoTranferenciaChoices.INGRESO, TipoTranferenciaChoices.VENTA)
+
+    def variaciones_de_saldo(self, *campos, cuentas=None):
+        """Devuelve {(cuenta_id, *campos): variación} con lo que las transacciones
+        no eliminadas suman o restan al saldo de cada cuenta.
+
+        Ingresos y ventas suman a `cuenta` y el resto de tipos resta. Las
+        transferencias restan `cantidad` de cuenta_origen y suman a
+        cuenta_destino, convertida con tipo_cambio (CUP por USD) si las monedas
+        difieren. Una reversión tiene el efecto contrario al de su tipo.
+
+        Con cuentas, cada tramo se limita a esas cuentas por su propia columna
+        para aprovechar los índices (cuenta, created_at).
+        """
+        activas = self.filter(deleted_at__isnull=True)
+
+        def de_cuentas(tramo, campo):
+            return tramo if cuentas is None else tramo.filter(**{f"{campo}__in": cuentas})
+
+        transferencia = Q(tipo=TipoTranferenciaChoices.TRANSFERENCIA)
+        cantidad = F("cantidad")
+        cantidad_destino = Case(
+            When(
+                tipo_cambio__gt=0,
+                cuenta_origen__moneda=MonedaChoices.USD,
+                cuenta_destino__moneda=MonedaChoices.CUP,
+                then=cantidad * F("tipo_cambio"),
+            ),
+            When(
+                tipo_cambio__gt=0,
+                cuenta_origen__moneda=MonedaChoices.CUP,
+                cuenta_destino__moneda=MonedaChoices.USD,
+                then=cantidad / F("tipo_cambio"),
+            ),
+            default=cantidad,
+        )
+
+        def con_signo(monto, suma):
+            return Sum(
+                Case(
+                    When(suma, then=monto),
+                    default=-monto,
+                    output_field=models.DecimalField(max_digits=20, decimal_places=2),
+                )
+            )
+
+        reversion = Q(es_reversion=True)
+
+        tramos = [
+            de_cuentas(activas.exclude(transferencia), "cuenta")
+            .values_list("cuenta", *campos)
+            .annotate(total=con_signo(cantidad, Q(tipo__in=self.INGRESOS) ^ reversion)),
+            de_cuentas(
+                activas.filter(transferencia, cuenta_origen__isnull=False),
+                "cuenta_origen",
+            )
+            .values_list("cuenta_origen", *campos)
+            .annotate(total=con_signo(cantidad, reversion)),
+            de_cuentas(
+                activas.filter(transferencia, cuenta_destino__isnull=False),
+                "cuenta_destino",
+            )
+            .values_list("cuenta_destino", *campos)
+            .annotate(total=con_signo(cantidad_destino, ~reversion)),
+        ]
+
+        variaciones = {}
+        for tramo in tramos:
+            for *clave, total in tramo:
+                clave = tuple(clave)
+                variaciones[clave] = variaciones.get(clave, Decimal(0)) + total
+        return variaciones
+
 class Transacciones(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     cantidad = models.DecimalField(max_digits=12, decimal_places=2, blank=False, null=False)
@@ -566,10 +1130,128 @@ class Transacciones(models.Model):
     es_reversion = models.BooleanField(default=False)
     transaccion_origen = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='reversiones')  
 
+    objects = TransaccionesQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Transacción"
         verbose_name_plural = "Transacciones"
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="transaccion_created_activa_idx",
+            ),
+            models.Index(
+                fields=["cuenta", "created_at", "id"],
+                include=["cantidad", "tipo", "es_reversion"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="transaccion_cuenta_fecha_idx",
+            ),
+            models.Index(
+                fields=["cuenta_origen", "created_at"],
+                condition=models.Q(deleted_at__isnull=True, tipo="TRANSFERENCIA"),
+                name="transaccion_origen_fecha_idx",
+            ),
+            models.Index(
+                fields=["cuenta_destino", "created_at"],
+                condition=models.Q(deleted_at__isnull=True, tipo="TRANSFERENCIA"),
+                name="transaccion_destino_fecha_idx",
+            ),
+        ]
+
+class HistorialSaldoInventariosManager(models.Manager):
+    def valoracion_actual(self):
+        salon = Existencia.objects.aggregate(
+            total=Sum(F("cantidad") * F("producto_info__precio_costo"))
+        )["total"]
+        cafeteria = Inventario.objects.aggregate(
+            total=Sum(F("cantidad") * F("producto__precio_costo"))
+        )["total"]
+        return round((salon or 0) + (cafeteria or 0), 2)
+
+    def registrar(self):
+        """Guarda la valoración actual con la fecha de hoy, la primera vez que
+        se llama en el día: registrada poco después de medianoche es la
+        valoración de apertura. La de otros momentos no se puede reconstruir
+        (las existencias de cafetería no guardan historial), así que los días
+        en que no se registra quedan sin valoración."""
+        historial, _ = self.get_or_create(
+            fecha=timezone.localdate(), defaults={"saldo": self.valoracion_actual}
+        )
+        return historial
 
 class HistorialSaldoInventarios(models.Model):
     saldo = models.DecimalField(max_digits=12, decimal_places=2, blank=False, null=False)
-    fecha = models.DateField(auto_now_add=True, db_index=True)
+    fecha = models.DateField(default=timezone.localdate, unique=True)
+
+    objects = HistorialSaldoInventariosManager()
+
+class VentaDiariaResumenManager(models.Manager):
+    # El resumen lo mantienen triggers en la base de datos (migración 0133);
+    # reconstruir() queda para corregir cambios retroactivos a mano.
+    def _agregar(self, productos):
+        return (
+            productos.filter(venta__deleted_at__isnull=True)
+            .con_precios_vigentes()
+            .annotate(fecha=TruncDate("venta__created_at"))
+            .values("venta__area_venta", "fecha")
+            .annotate(
+                cantidad=Count("id"),
+                importe=Coalesce(Sum("precio_venta_vigente"), Decimal("0.00")),
+                costo=Coalesce(Sum("precio_costo_vigente"), Decimal("0.00")),
+                pago_trabajador=Coalesce(Sum("info__pago_trabajador"), 0),
+            )
+        )
+
+    def reconstruir(self, desde, hasta):
+        inicio, fin = limites_dias(desde, hasta)
+        filas = self._agregar(
+            Producto.objects.filter(
+                venta__created_at__gte=inicio, venta__created_at__lt=fin
+            )
+        )
+        with transaction.atomic():
+            self.filter(fecha__range=(desde, hasta)).delete()
+            return self.bulk_create(
+                VentaDiariaResumen(
+                    area_venta_id=fila["venta__area_venta"],
+                    fecha=fila["fecha"],
+                    cantidad=fila["cantidad"],
+                    importe=fila["importe"],
+                    costo=fila["costo"],
+                    pago_trabajador=fila["pago_trabajador"],
+                )
+                for fila in filas
+            )
+
+class VentaDiariaResumen(models.Model):
+    area_venta = models.ForeignKey(AreaVenta, on_delete=models.CASCADE, related_name="resumenes_diarios")
+    fecha = models.DateField()
+    cantidad = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    costo = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    pago_trabajador = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    objects = VentaDiariaResumenManager()
+
+    def __str__(self):
+        return f"{self.area_venta.nombre} - {self.fecha}"
+
+    class Meta:
+        verbose_name = "Resumen diario de ventas"
+        verbose_name_plural = "Resúmenes diarios de ventas"
+        constraints = [
+            models.UniqueConstraint(fields=["area_venta", "fecha"], name="unique_venta_diaria_resumen_area_fecha")
+        ]
+
+
+class VersionCache(models.Model):
+    # Versión de cada grupo de respuestas en caché (ver inventario.cache). La
+    # suben triggers en la base de datos (migración 0137) al confirmarse
+    # cualquier escritura en las tablas del grupo, venga o no de Django.
+    grupo = models.CharField(max_length=20, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    modificado = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.grupo} v{self.version}"
@@ -0,0 +1,16 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def limites_dias(desde, hasta=None):
+    """Devuelve el intervalo [inicio, fin) en la zona horaria actual que cubre
+    los días de `desde` a `hasta`.
+
+    Filtrar con created_at__gte/__lt en lugar de created_at__date permite usar
+    los índices sobre created_at.
+    """
+    hasta = hasta or desde
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return inicio, fin
@@ -10,10 +10,11 @@ from django.conf import settings
 from ninja_extra import NinjaExtraAPI
 from datetime import datetime, timedelta, timezone
 from django.db.models import (
-    Count,
+    Sum,
     Q,
     F,
 )
+from django.db.models.functions import Coalesce
 
 
 from inventario_v2.controllers.entradas import EntradasController
@@ -24,6 +25,11 @@ from inventario_v2.controllers.productos import ProductoController
 from inventario_v2.controllers.usuarios import UsuariosController
 from .controllers.transferencias import TransferenciasController
 from .controllers.cafeteria import CafeteriaController
+from .controllers.cuentas import CuentasController
+from .controllers.transacciones import TransaccionesController
+from .controllers.exportaciones import ExportacionesController
+from .controllers.cache import CacheController
+from .controllers.tareas import TareasController
 
 
 class AuthBearer(HttpBearer):
@@ -83,23 +89,17 @@ def login(request, data: LoginSchema):
 )
 def nR(request):
     productos_info_sin_ventas = (
-        ProductoInfo.objects.select_related("producto")
-        .annotate(
-            productos_disp=Count(
-                "producto",
-                filter=Q(
-                    producto__venta__isnull=True,
-                    producto__area_venta__isnull=True,
-                    producto__merma__isnull=True,
-                ),
+        ProductoInfo.objects.annotate(
+            productos_disp=Sum(
+                "existencias__cantidad",
+                filter=Q(existencias__area_venta__isnull=True),
             ),
-            productos_area_venta=Count(
-                "producto",
-                filter=Q(
-                    producto__venta__isnull=True,
-                    producto__area_venta__isnull=False,
-                    producto__merma__isnull=True,
+            productos_area_venta=Coalesce(
+                Sum(
+                    "existencias__cantidad",
+                    filter=Q(existencias__area_venta__isnull=False),
                 ),
+                0,
             ),
         )
         .filter(
@@ -123,4 +123,9 @@ app.register_controllers(
     UsuariosController,
     TransferenciasController,
     CafeteriaController,
+    CuentasController,
+    TransaccionesController,
+    ExportacionesController,
+    CacheController,
+    TareasController,
 )
@@ -0,0 +1,77 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from ninja.responses import NinjaJSONEncoder
+
+from inventario.cache import PREFIJO, registrar_metrica, versiones
+
+# Nombre de cada endpoint en caché -> grupos de datos de los que depende.
+ENDPOINTS_EN_CACHE = {}
+
+
+def cachear_respuesta(nombre, esquema, grupos, timeout=None):
+    """Guarda el JSON ya serializado de la respuesta por endpoint, rol y
+    parámetros. Se invalida cuando cambia alguno de los `grupos` (ver
+    inventario.cache) o al vencer `timeout`.
+
+    El ETag y el Last-Modified salen de las versiones de los grupos, que se
+    leen en una sola consulta antes de la vista: con If-None-Match o
+    If-Modified-Since vigentes se contesta 304 sin ejecutarla, esté o no la
+    respuesta en caché.
+    """
+    ENDPOINTS_EN_CACHE[nombre] = grupos
+
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(self, *args, **kwargs):
+            request = self.context.request
+            auth = request.auth
+            rol = auth.get("rol") if isinstance(auth, dict) else None
+            filas = versiones(grupos)
+            # El día forma parte de la clave para las respuestas relativas a hoy.
+            clave = ":".join(
+                [PREFIJO, nombre, str(rol), str(timezone.localdate())]
+                + [str(fila.version) for fila in filas]
+                + [f"{k}={v}" for k, v in sorted(kwargs.items())]
+            )
+            etag = f'W/"{hashlib.md5(clave.encode()).hexdigest()}"'
+            modificado = int(max(fila.modificado for fila in filas).timestamp())
+
+            response = HttpResponse(content_type="application/json")
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(modificado)
+            # Privada por ir autenticada; no-cache obliga a revalidar siempre.
+            patch_cache_control(response, private=True, no_cache=True)
+            condicional = get_conditional_response(
+                request, etag=etag, last_modified=modificado, response=response
+            )
+            if condicional is not response:
+                registrar_metrica(nombre, True)
+                return condicional
+
+            contenido = cache.get(clave)
+            acierto = contenido is not None
+            if not acierto:
+                datos = esquema.from_orm(funcion(self, *args, **kwargs)).model_dump()
+                contenido = json.dumps(datos, cls=NinjaJSONEncoder).encode()
+                cache.set(
+                    clave,
+                    contenido,
+                    settings.CACHE_RESPUESTAS_TIMEOUT if timeout is None else timeout,
+                )
+            registrar_metrica(nombre, acierto)
+
+            response.content = contenido
+            response["X-Cache"] = "HIT" if acierto else "MISS"
+            return response
+
+        return envoltura
+
+    return decorador
@@ -0,0 +1,22 @@
+from typing import Dict
+
+from ninja_extra import api_controller, route
+
+from inventario.cache import metricas
+from ..cache import ENDPOINTS_EN_CACHE
+from ..custom_permissions import isAdmin
+from ..schema import MetricasCacheSchema
+
+
+@api_controller("cache/", tags=["Caché"], permissions=[isAdmin])
+class CacheController:
+    @route.get("metricas/", response=Dict[str, MetricasCacheSchema])
+    def getMetricas(self):
+        return {
+            nombre: {
+                **valores,
+                "tasa_aciertos": valores["aciertos"]
+                / ((valores["aciertos"] + valores["fallos"]) or 1),
+            }
+            for nombre, valores in metricas(ENDPOINTS_EN_CACHE).items()
+        }
@@ -10,6 +10,7 @@ from inventario.models import (
     PrecioElaboracion,
 )
 
+from ..cache import cachear_respuesta
 from ..schema import (
     ElaboracionesEndpoint,
     Add_Elaboracion,
@@ -17,14 +18,21 @@ from ..schema import (
 from ninja_extra import api_controller, route
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Prefetch
 from decimal import Decimal
 
 
 @api_controller("cafeteria/", tags=["Cafetería"], permissions=[])
 class CafeteriaController:
     @route.get("elaboraciones/", response=ElaboracionesEndpoint)
+    @cachear_respuesta("elaboraciones", ElaboracionesEndpoint, ["cafeteria"])
     def get_all_elaboraciones(self):
-        elaboraciones = Elaboraciones.objects.all().order_by("-id")
+        elaboraciones = Elaboraciones.objects.prefetch_related(
+            Prefetch(
+                "ingredientes_cantidad",
+                queryset=Ingrediente_Cantidad.objects.select_related("ingrediente"),
+            )
+        ).order_by("-id")
 
         productos = Productos_Cafeteria.objects.all()
 
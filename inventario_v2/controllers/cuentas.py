@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from ninja_extra import api_controller, route
+
+from inventario.models import Cuentas, HistorialSaldoCuenta
+from ..custom_permissions import isAdmin
+from ..schema import SaldoCuentaSchema
+
+
+@api_controller("cuentas/", tags=["Cuentas"], permissions=[isAdmin])
+class CuentasController:
+    @route.get("{id}/saldo/", response=SaldoCuentaSchema)
+    def getSaldo(self, id: int, fecha: datetime = None):
+        cuenta = get_object_or_404(Cuentas, pk=id)
+
+        if fecha is None:
+            fecha = timezone.now()
+        elif timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+
+        saldo, fecha_cierre = HistorialSaldoCuenta.objects.saldo_en(cuenta, fecha)
+        return {
+            "cuenta": cuenta.pk,
+            "fecha": fecha,
+            "saldo": saldo,
+            "fecha_cierre": fecha_cierre,
+        }
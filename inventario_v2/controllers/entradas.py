@@ -1,6 +1,7 @@
 from decimal import Decimal
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from django.db.models import F
+from django.http import Http404
 from ninja.errors import HttpError
 from inventario.models import (
     CuentasChoices,
@@ -17,7 +18,8 @@ from inventario.models import (
     TipoTranferenciaChoices,
     Cuentas,
     METODO_PAGO,
-    Deuda
+    Deuda,
+    SaldoInsuficienteError,
 )
 from ..schema import (
     AddEntradaSchema,
@@ -32,30 +34,134 @@ from django.db import transaction
 from ..custom_permissions import isStaff
 
 
+def get_productos_info(
+    productos: List[ProductosEntradaAlmacenPrincipal],
+) -> Dict[str, ProductoInfo]:
+    ids = {producto.producto for producto in productos}
+    productos_info = (
+        ProductoInfo.objects.select_related("categoria")
+        .con_precios_actuales()
+        .in_bulk(ids)
+    )
+    if len(productos_info) < len(ids):
+        raise Http404("No ProductoInfo matches the given query.")
+    return {str(pk): producto_info for pk, producto_info in productos_info.items()}
+
+
 def sumatoria_precio_costo(
     productos: List[ProductosEntradaAlmacenPrincipal],
-) -> Tuple[int, int]:
-    sum_precio_costo = 0
+    productos_info: Dict[str, ProductoInfo],
+) -> Tuple[Decimal, int]:
+    sum_precio_costo = Decimal(0)
     cantidad_productos = 0
     for producto in productos:
-        producto_info = get_object_or_404(ProductoInfo, pk=producto.producto)
+        producto_info = productos_info[producto.producto]
+        es_zapato = producto_info.categoria.nombre == "Zapatos"
+
+        if producto.isZapato != es_zapato:
+            raise HttpError(
+                400,
+                f"{producto_info.descripcion}: el tipo de producto no coincide con su categoría.",
+            )
+
+        if es_zapato:
+            cantidades = [
+                num.cantidad for variante in producto.variantes for num in variante.numeros
+            ]
+        else:
+            cantidades = [producto.cantidad or 0]
+
+        if not cantidades or min(cantidades) <= 0:
+            raise HttpError(
+                400, f"{producto_info.descripcion}: la cantidad debe ser mayor que 0."
+            )
+
+        cantidad = sum(cantidades)
+        sum_precio_costo += producto_info.ultimo_precio_costo * cantidad
+        cantidad_productos += cantidad
+    return sum_precio_costo, cantidad_productos
+
 
-        # Cambiar localizacion del producto
-        if producto.localizacion.__len__() > 0:
+def formatear_ids(pks: List[int]) -> str:
+    """Los ids en tramos consecutivos, p. ej. "10-12, 15, 17-18". Otra
+    transacción que inserte productos a la vez puede tomar ids de la secuencia
+    entre los de una misma variante, así que no basta con el primero y el
+    último."""
+    tramos = []
+    for pk in sorted(pks):
+        if tramos and pk == tramos[-1][1] + 1:
+            tramos[-1][1] = pk
+        else:
+            tramos.append([pk, pk])
+    return ", ".join(
+        str(inicio) if inicio == fin else f"{inicio}-{fin}" for inicio, fin in tramos
+    )
+
+
+def crear_productos_entrada(
+    entrada: EntradaAlmacen,
+    productos: List[ProductosEntradaAlmacenPrincipal],
+    productos_info: Dict[str, ProductoInfo],
+) -> List[dict]:
+    nuevos = []
+    # (zapato, color, numero, inicio, fin) sobre la lista `nuevos`.
+    rangos = []
+    localizaciones = {}
+
+    for producto in productos:
+        producto_info = productos_info[producto.producto]
+
+        if producto.localizacion:
             producto_info.localizacion = producto.localizacion
-            producto_info.save()
-   
-        if producto_info.categoria.nombre == "Zapatos":
-            if not producto.variantes:
-                continue
+            localizaciones[producto_info.pk] = producto_info
+
+        if producto.isZapato:
             for variante in producto.variantes:
                 for num in variante.numeros:
-                    sum_precio_costo += producto_info.precio_costo * num.cantidad
-                    cantidad_productos += num.cantidad
+                    inicio = len(nuevos)
+                    nuevos.extend(
+                        Producto(
+                            info=producto_info,
+                            color=variante.color,
+                            numero=num.numero,
+                            entrada=entrada,
+                        )
+                        for _ in range(num.cantidad)
+                    )
+                    rangos.append(
+                        (producto_info, variante.color, num.numero, inicio, len(nuevos))
+                    )
         else:
-            sum_precio_costo += producto_info.precio_costo * producto.cantidad
-            cantidad_productos += producto.cantidad or 0
-    return sum_precio_costo, cantidad_productos
+            nuevos.extend(
+                Producto(info=producto_info, entrada=entrada)
+                for _ in range(producto.cantidad)
+            )
+
+    # Lotes de 1000: un único INSERT con decenas de miles de parámetros es más
+    # lento de compilar y enviar que unos pocos medianos.
+    Producto.objects.bulk_create(nuevos, batch_size=1000)
+    if localizaciones:
+        ProductoInfo.objects.bulk_update(localizaciones.values(), ["localizacion"])
+
+    response = []
+    zapatos = {}
+    colores = {}
+    for producto_info, color, numero, inicio, fin in rangos:
+        pks = [producto.pk for producto in nuevos[inicio:fin]]
+        zapato = zapatos.get(producto_info.pk)
+        if zapato is None:
+            zapato = {"zapato": producto_info.descripcion, "variantes": []}
+            zapatos[producto_info.pk] = zapato
+            response.append(zapato)
+        variante = colores.get((producto_info.pk, color))
+        if variante is None:
+            variante = {"color": color, "numeros": []}
+            colores[(producto_info.pk, color)] = variante
+            zapato["variantes"].append(variante)
+        variante["numeros"].append(
+            {"numero": numero, "ids": formatear_ids(pks) if len(pks) > 1 else pks[0]}
+        )
+    return response
 
 
 def is_valid_cuenta(cuenta: Cuentas, metodo_pago: str) -> HttpError | None:
@@ -95,30 +201,27 @@ def procesar_rebajas_cuentas(
         )
 
 
-def rebajar_saldo(cuentas: List[CuentasInCreateEntrada]) -> None:
-    for cuenta in cuentas:
-        cuentaQS = get_object_or_404(Cuentas, pk=cuenta.cuenta)
-        cuentaQS.saldo -= Decimal(cuenta.cantidad or 0)
-        cuentaQS.save()
-
-
 def crear_transacciones(
     entrada: EntradaAlmacen,
     cuentas: List[CuentasInCreateEntrada],
     usuario: User,
     cantidad_productos: int,
 ) -> None:
-    for cuenta in cuentas:
-        cuentaQS = get_object_or_404(Cuentas, pk=cuenta.cuenta)
-        Transacciones.objects.create(
-            entrada=entrada,
-            usuario=usuario,
-            tipo=TipoTranferenciaChoices.ENTRADA,
-            cuenta=cuentaQS,
-            saldo_resultante=cuentaQS.saldo,
-            cantidad=Decimal(cuenta.cantidad or 0),
-            descripcion=f"{cantidad_productos} Productos - Almacén Principal",
-        )
+    Cuentas.objects.mover_saldos(
+        [
+            Transacciones(
+                entrada=entrada,
+                usuario=usuario,
+                tipo=TipoTranferenciaChoices.ENTRADA,
+                cuenta_id=int(cuenta.cuenta),
+                cantidad=Decimal(cuenta.cantidad or 0),
+                descripcion=f"{cantidad_productos} Productos - Almacén Principal",
+            )
+            for cuenta in cuentas
+        ],
+        signo=-1,
+        validar_saldo=True,
+    )
 
 
 @api_controller("entradas/", tags=["Entradas"], permissions=[isStaff])
@@ -153,16 +256,16 @@ class EntradasController:
     def addEntrada(self, request, data: AddEntradaSchema):
         user = get_object_or_404(User, pk=request.auth["id"])
         proveedor = get_object_or_404(Proveedor, pk=data.proveedor)
-        response = []
-        sum_precio_costo, cantidad_productos = sumatoria_precio_costo(data.productos)
+        productos_info = get_productos_info(data.productos)
+        sum_precio_costo, cantidad_productos = sumatoria_precio_costo(
+            data.productos, productos_info
+        )
 
         if(data.metodoPago != METODO_PAGO.DEUDA):
             if len(data.cuentas) == 1:
-                data.cuentas[0].cantidad = Decimal(sum_precio_costo)
+                data.cuentas[0].cantidad = sum_precio_costo
 
-            procesar_rebajas_cuentas(
-                data.cuentas, data.metodoPago, Decimal(sum_precio_costo)
-            )
+            procesar_rebajas_cuentas(data.cuentas, data.metodoPago, sum_precio_costo)
 
         try:
             with transaction.atomic():
@@ -175,72 +278,14 @@ class EntradasController:
                 entrada.save()
 
                 if(data.metodoPago != METODO_PAGO.DEUDA):
-                    rebajar_saldo(data.cuentas)
                     crear_transacciones(entrada, data.cuentas, user, cantidad_productos)
                 else:
                     Deuda.objects.create(proveedor=proveedor, entrada_almacen=entrada, monto_total=sum_precio_costo, usuario=user, descripcion=data.descripcionDeuda)
 
-                for producto in data.productos:
-                    producto_info = get_object_or_404(
-                        ProductoInfo, pk=producto.producto
-                    )
-
-                    variantesResponse = []
-
-                    if producto.isZapato and producto.variantes:
-                        total_zapatos = 0
-
-                        for variante in producto.variantes:
-                            productos_pa = []
-
-                            for num in variante.numeros:
-                                ids = []
-
-                                productos = [
-                                    Producto(
-                                        info=producto_info,
-                                        color=variante.color,
-                                        numero=num.numero,
-                                        entrada=entrada,
-                                    )
-                                    for _ in range(num.cantidad)
-                                ]
-
-                                total_zapatos += num.cantidad
-
-                                ids = Producto.objects.bulk_create(productos)
-
-                                formated_ids = (
-                                    f"{ids[0].pk}-{ids[-1].pk}"
-                                    if len(ids) > 1
-                                    else ids[0].pk
-                                )
-                                productos_pa.append(
-                                    {"numero": num.numero, "ids": formated_ids}
-                                )
-
-                            variantesResponse.append(
-                                {"color": variante.color, "numeros": productos_pa}
-                            )
-                        response.append(
-                            {
-                                "zapato": producto_info.descripcion,
-                                "variantes": variantesResponse,
-                            }
-                        )
-
-                    elif not producto.isZapato and producto.cantidad:
-                        productos = [
-                            Producto(
-                                info=producto_info,
-                                entrada=entrada,
-                            )
-                            for _ in range(producto.cantidad)
-                        ]
-
-                        Producto.objects.bulk_create(productos)
-            return response
+                return crear_productos_entrada(entrada, data.productos, productos_info)
 
+        except SaldoInsuficienteError as err:
+            raise HttpError(400, str(err))
         except Exception as err:
             print(err)
             raise HttpError(500, "Error al crear la entrada.")
@@ -253,13 +298,7 @@ class EntradasController:
 
                 if entrada.metodo_pago != METODO_PAGO.DEUDA:
                     transacciones = Transacciones.objects.filter(entrada=entrada)
-
-                    for transaccion in transacciones:
-                        cuenta = get_object_or_404(Cuentas, pk=transaccion.cuenta.pk)
-
-                        cuenta.saldo += transaccion.cantidad
-                        cuenta.save()
-
+                    Cuentas.objects.mover_saldos(transacciones, signo=1, crear=False)
                     transacciones.delete()
 
                 productos_ids = Producto.objects.filter(entrada=entrada).values_list(
@@ -0,0 +1,249 @@
+from datetime import date
+from itertools import chain
+
+from django.db.models import OuterRef
+from ninja_extra import api_controller, route
+
+from inventario.models import (
+    Entradas_Cafeteria,
+    HistorialPrecioCostoSalon,
+    Producto,
+    Transacciones,
+    Ventas_Cafeteria,
+)
+from inventario.utils import limites_dias
+from ..custom_permissions import isAdmin
+from .utils_reportes.exportaciones import FILAS_POR_TROZO, respuesta_exportacion
+
+
+def filas(queryset, *campos):
+    # iterator() lee con un cursor del servidor en lotes de chunk_size.
+    return queryset.values_list(*campos).iterator(chunk_size=FILAS_POR_TROZO)
+
+
+@api_controller("exportar/", tags=["Exportaciones"], permissions=[isAdmin])
+class ExportacionesController:
+    @route.get("ventas/")
+    def exportarVentas(self, desde: date, hasta: date, formato: str = "csv"):
+        inicio, fin = limites_dias(desde, hasta)
+        productos = (
+            Producto.objects.filter(
+                venta__created_at__gte=inicio,
+                venta__created_at__lt=fin,
+                venta__deleted_at__isnull=True,
+            )
+            .con_precios_vigentes()
+            .order_by("venta__created_at", "venta_id", "id")
+        )
+        return respuesta_exportacion(
+            f"ventas_{desde}_{hasta}",
+            formato,
+            [
+                "Venta",
+                "Fecha",
+                "Área de venta",
+                "Usuario",
+                "Método de pago",
+                "Producto",
+                "Color",
+                "Número",
+                "Precio de venta",
+                "Precio de costo",
+                "Pago al trabajador",
+            ],
+            filas(
+                productos,
+                "venta_id",
+                "venta__created_at",
+                "venta__area_venta__nombre",
+                "venta__usuario__username",
+                "venta__metodo_pago",
+                "info__descripcion",
+                "color",
+                "numero",
+                "precio_venta_vigente",
+                "precio_costo_vigente",
+                "info__pago_trabajador",
+            ),
+        )
+
+    @route.get("ventas-cafeteria/")
+    def exportarVentasCafeteria(self, desde: date, hasta: date, formato: str = "csv"):
+        inicio, fin = limites_dias(desde, hasta)
+        filtro = {
+            "ventas_cafeteria__created_at__gte": inicio,
+            "ventas_cafeteria__created_at__lt": fin,
+            "ventas_cafeteria__deleted_at__isnull": True,
+        }
+        orden = ("ventas_cafeteria__created_at", "ventas_cafeteria_id", "id")
+        venta = (
+            "ventas_cafeteria_id",
+            "ventas_cafeteria__created_at",
+            "ventas_cafeteria__usuario__username",
+            "ventas_cafeteria__metodo_pago",
+            "ventas_cafeteria__efectivo",
+            "ventas_cafeteria__transferencia",
+        )
+        productos = Ventas_Cafeteria.productos.through.objects.filter(
+            **filtro
+        ).order_by(*orden)
+        elaboraciones = Ventas_Cafeteria.elaboraciones.through.objects.filter(
+            **filtro
+        ).order_by(*orden)
+
+        return respuesta_exportacion(
+            f"ventas_cafeteria_{desde}_{hasta}",
+            formato,
+            [
+                "Venta",
+                "Fecha",
+                "Usuario",
+                "Método de pago",
+                "Efectivo",
+                "Transferencia",
+                "Tipo",
+                "Producto",
+                "Cantidad",
+            ],
+            chain(
+                (
+                    (*fila[:-2], "Producto", *fila[-2:])
+                    for fila in filas(
+                        productos,
+                        *venta,
+                        "productos_ventas_cafeteria__producto__nombre",
+                        "productos_ventas_cafeteria__cantidad",
+                    )
+                ),
+                (
+                    (*fila[:-2], "Elaboración", *fila[-2:])
+                    for fila in filas(
+                        elaboraciones,
+                        *venta,
+                        "elaboraciones_ventas_cafeteria__producto__nombre",
+                        "elaboraciones_ventas_cafeteria__cantidad",
+                    )
+                ),
+            ),
+        )
+
+    @route.get("entradas/")
+    def exportarEntradas(self, desde: date, hasta: date, formato: str = "csv"):
+        inicio, fin = limites_dias(desde, hasta)
+        productos = (
+            Producto.objects.filter(
+                entrada__created_at__gte=inicio, entrada__created_at__lt=fin
+            )
+            # El costo de cada producto cuando entró, no el actual.
+            .annotate(
+                precio_costo_entrada=HistorialPrecioCostoSalon.objects.precio_en(
+                    OuterRef("entrada__created_at"), producto_info=OuterRef("info")
+                )
+            )
+            .order_by("entrada__created_at", "entrada_id", "id")
+        )
+        return respuesta_exportacion(
+            f"entradas_{desde}_{hasta}",
+            formato,
+            [
+                "Entrada",
+                "Fecha",
+                "Proveedor",
+                "Comprador",
+                "Usuario",
+                "Método de pago",
+                "Producto",
+                "Color",
+                "Número",
+                "Precio de costo",
+            ],
+            filas(
+                productos,
+                "entrada_id",
+                "entrada__created_at",
+                "entrada__proveedor__nombre",
+                "entrada__comprador",
+                "entrada__usuario__username",
+                "entrada__metodo_pago",
+                "info__descripcion",
+                "color",
+                "numero",
+                "precio_costo_entrada",
+            ),
+        )
+
+    @route.get("entradas-cafeteria/")
+    def exportarEntradasCafeteria(self, desde: date, hasta: date, formato: str = "csv"):
+        inicio, fin = limites_dias(desde, hasta)
+        productos = Entradas_Cafeteria.productos.through.objects.filter(
+            entradas_cafeteria__created_at__gte=inicio,
+            entradas_cafeteria__created_at__lt=fin,
+            entradas_cafeteria__deleted_at__isnull=True,
+        ).order_by("entradas_cafeteria__created_at", "entradas_cafeteria_id", "id")
+        return respuesta_exportacion(
+            f"entradas_cafeteria_{desde}_{hasta}",
+            formato,
+            [
+                "Entrada",
+                "Fecha",
+                "Proveedor",
+                "Comprador",
+                "Usuario",
+                "Método de pago",
+                "Producto",
+                "Cantidad",
+            ],
+            filas(
+                productos,
+                "entradas_cafeteria_id",
+                "entradas_cafeteria__created_at",
+                "entradas_cafeteria__proveedor__nombre",
+                "entradas_cafeteria__comprador",
+                "entradas_cafeteria__usuario__username",
+                "entradas_cafeteria__metodo_pago",
+                "productos_entradas_cafeteria__producto__nombre",
+                "productos_entradas_cafeteria__cantidad",
+            ),
+        )
+
+    @route.get("transacciones/")
+    def exportarTransacciones(self, desde: date, hasta: date, formato: str = "csv"):
+        inicio, fin = limites_dias(desde, hasta)
+        transacciones = Transacciones.objects.filter(
+            created_at__gte=inicio, created_at__lt=fin, deleted_at__isnull=True
+        ).order_by("created_at", "id")
+        return respuesta_exportacion(
+            f"transacciones_{desde}_{hasta}",
+            formato,
+            [
+                "Transacción",
+                "Fecha",
+                "Tipo",
+                "Cuenta",
+                "Cantidad",
+                "Moneda",
+                "Saldo resultante",
+                "Cuenta de origen",
+                "Cuenta de destino",
+                "Tipo de cambio",
+                "Reversión",
+                "Descripción",
+                "Usuario",
+            ],
+            filas(
+                transacciones,
+                "id",
+                "created_at",
+                "tipo",
+                "cuenta__nombre",
+                "cantidad",
+                "moneda",
+                "saldo_resultante",
+                "cuenta_origen__nombre",
+                "cuenta_destino__nombre",
+                "tipo_cambio",
+                "es_reversion",
+                "descripcion",
+                "usuario__username",
+            ),
+        )
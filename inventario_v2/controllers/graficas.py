@@ -1,440 +1,45 @@
-from inventario.models import (
-    Producto,
-    AreaVenta,
-    ProductoInfo,
-    Gastos,
-    GastosChoices,
-    FrecuenciaChoices,
-)
-from ..schema import GraficasSchema
+from datetime import date
+from typing import List
+
+from ..cache import cachear_respuesta
+from ..custom_permissions import isAdmin
+from ..schema import GraficasSchema, RankingVentasSchema
+from ninja.errors import HttpError
 from ninja_extra import api_controller, route
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import F, Sum, Case, When, IntegerField
 
-from inventario_v2.utils import get_month_name
-from ..utils import (
-    get_day_name,
-    calcular_dias_laborables,
-    obtener_inicio_fin_mes,
-    obtener_ultimo_dia_mes,
-    obtener_dias_semana_rango,
+from .utils_reportes.graficas import (
+    ORDENES_RANKING,
+    get_graficas_ventas,
+    get_mas_vendidos,
 )
 
-from datetime import datetime
-
 
 @api_controller("graficas/", tags=["Gráficas"], permissions=[])
 class GraficasController:
     @route.get("", response=GraficasSchema)
-    def ventas(self):
-        hoy = timezone.now().date()
-        inicio_semana = hoy - timedelta(days=hoy.weekday())
-        fin_semana = inicio_semana + timedelta(days=6)
-        inicio_mes = hoy.replace(day=1)
-        proximo_mes = inicio_mes.replace(day=28) + timedelta(days=4)
-        fin_mes = proximo_mes - timedelta(days=proximo_mes.day)
-        anno = hoy.year
-        mes_actual = hoy.month
-        gastos_variables = Gastos.objects.filter(tipo=GastosChoices.VARIABLE)
-        gastos_fijos = Gastos.objects.filter(
-            tipo=GastosChoices.FIJO, created_at__date__lte=inicio_mes
-        )
-
-        respuestas = {
-            "ventasPorArea": [],
-            "ventasAnuales": [],
-            "masVendidos": [],
-            "ventasHoy": 0,
-            "ventasSemana": 0,
-            "ventasMes": 0,
-            "total_zapatos": 0,
-        }
-
-        # Ventas por área
-        areas = AreaVenta.objects.all()
-        if areas:
-            for dia in range(7):
-                dia_fecha = inicio_semana + timedelta(days=dia)
-                dia_ventas = {"dia": get_day_name(dia)}
-                for area in areas:
-                    total_ventas = (
-                        Producto.objects.filter(
-                            venta__created_at__date=dia_fecha, area_venta=area
-                        )
-                        .annotate(
-                            diferencia=F("info__historial_venta__precio")
-                            - F("info__historial_costo__precio")
-                            - F("info__pago_trabajador")
-                        )
-                        .aggregate(total=Sum("diferencia"))["total"]
-                        or 0
-                    )
-
-                    gastos_variables_graf_areas = (
-                        gastos_variables.filter(
-                            created_at=dia_fecha, area_venta=area
-                        ).aggregate(total=Sum("cantidad"))["total"]
-                        or 0
-                    )
-
-                    gastos_fijos_mesuales_graf_areas = (
-                        gastos_fijos.filter(
-                            frecuencia=FrecuenciaChoices.MENSUAL,
-                            dia_mes=dia_fecha.day,
-                            area_venta=area,
-                        ).aggregate(total=Sum("cantidad"))["total"]
-                        or 0
-                    )
-
-                    gastos_fijos_semanales_graf_areas = (
-                        gastos_fijos.filter(
-                            frecuencia=FrecuenciaChoices.SEMANAL,
-                            dia_semana=dia_fecha.weekday(),
-                            area_venta=area,
-                        ).aggregate(total=Sum("cantidad"))["total"]
-                        or 0
-                    )
-
-                    gastos_lunes_sabado_graf_areas = (
-                        (
-                            gastos_fijos.filter(
-                                frecuencia=FrecuenciaChoices.LUNES_SABADO,
-                                area_venta=area,
-                            ).aggregate(total=Sum("cantidad"))["total"]
-                            or 0
-                        )
-                        if dia_fecha.weekday() != 6
-                        else 0
-                    )
-
-                    total_gastos_graf_areas = (
-                        gastos_variables_graf_areas
-                        + gastos_fijos_mesuales_graf_areas
-                        + gastos_fijos_semanales_graf_areas
-                        + gastos_lunes_sabado_graf_areas
-                    )
-
-                    total_ventas_graf_areas = total_ventas - total_gastos_graf_areas
-
-                    dia_ventas[area.nombre] = {
-                        "ventas": round(total_ventas_graf_areas, 2),
-                        "color": area.color if area.color else "#000",
-                    }
-                respuestas["ventasPorArea"].append(dia_ventas)
-
-        # Ventas anuales
-        if mes_actual > 0:
-            for mes in range(1, mes_actual + 1):
-                prod = (
-                    Producto.objects.filter(
-                        venta__created_at__date__year=anno,
-                        venta__created_at__date__month=mes,
-                    )
-                    .annotate(
-                        diferencia=F("info__historial_venta__precio")
-                        - F("info__historial_costo__precio")
-                        - F("info__pago_trabajador")
-                    )
-                    .aggregate(total=Sum("diferencia"))
-                )
-                inicio_mes_graf_anual, fin_mes_graf_anual = obtener_inicio_fin_mes(
-                    datetime.now().year, mes
-                )
-
-                gastos_variables__graf_anual = (
-                    gastos_variables.filter(
-                        created_at__date__range=(
-                            inicio_mes_graf_anual,
-                            fin_mes_graf_anual,
-                        ),
-                    ).aggregate(total=Sum("cantidad"))["total"]
-                    or 0
-                )
-
-                ultimo_dia_hasta = obtener_ultimo_dia_mes(fin_mes_graf_anual)
-
-                gastos_fijos_mes_optimizado_graf_anual = gastos_fijos.filter(
-                    frecuencia=FrecuenciaChoices.MENSUAL,
-                ).annotate(
-                    dia_mes_ajustado=Case(
-                        When(dia_mes__gt=ultimo_dia_hasta, then=ultimo_dia_hasta),
-                        default=F("dia_mes"),
-                        output_field=IntegerField(),
-                    )
-                )
-
-                gastos_fijos_mesuales_graf_anual = (
-                    gastos_fijos_mes_optimizado_graf_anual.filter(
-                        dia_mes_ajustado__range=(
-                            inicio_mes_graf_anual.day,
-                            fin_mes_graf_anual.day + 1,
-                        )
-                    ).aggregate(total=Sum("cantidad"))["total"]
-                    or 0
-                )
-
-                dias_semana_graf_anual = obtener_dias_semana_rango(
-                    inicio_mes_graf_anual, fin_mes_graf_anual
-                )
-
-                filter_gastos_fijos_semanales_graf_anual = gastos_fijos.filter(
-                    frecuencia=FrecuenciaChoices.SEMANAL,
-                    dia_semana__in=dias_semana_graf_anual,
-                )
-
-                gastos_fijos_semanales_graf_anual = (
-                    sum(
-                        gasto.cantidad * dias_semana_graf_anual.get(gasto.dia_semana, 0)
-                        for gasto in filter_gastos_fijos_semanales_graf_anual
-                    )
-                    or 0
-                )
-
-                dias_laborales_graf_anual = calcular_dias_laborables(
-                    inicio_mes_graf_anual, fin_mes_graf_anual
-                )
-
-                gastos_lunes_sabado_graf_anual = (
-                    gastos_fijos.filter(
-                        frecuencia=FrecuenciaChoices.LUNES_SABADO
-                    ).aggregate(total=Sum("cantidad"))["total"]
-                    or 0
-                )
-
-                total_gastos_lunes_sabado_graf_anual = (
-                    gastos_lunes_sabado_graf_anual * dias_laborales_graf_anual
-                )
-
-                total_gastos_graf_anual = (
-                    gastos_variables__graf_anual
-                    + gastos_fijos_mesuales_graf_anual
-                    + gastos_fijos_semanales_graf_anual
-                    + total_gastos_lunes_sabado_graf_anual
-                )
-
-                nombre_mes = get_month_name(mes)
-
-                respuestas["ventasAnuales"].append(
-                    {
-                        "mes": nombre_mes.capitalize(),
-                        "ventas": round(
-                            (prod["total"] if prod["total"] else 0)
-                            - total_gastos_graf_anual,
-                            2,
-                        ),
-                    }
-                )
-
-        # Ventas hoy
-        productos_hoy = (
-            Producto.objects.filter(venta__created_at__date=hoy)
-            .annotate(
-                diferencia=F("info__historial_venta__precio")
-                - F("info__historial_costo__precio")
-                - F("info__pago_trabajador")
-            )
-            .aggregate(ventaHoy=Sum("diferencia"))["ventaHoy"]
-        ) or 0
-
-        gastos_variables_hoy = (
-            gastos_variables.filter(created_at=hoy).aggregate(total=Sum("cantidad"))[
-                "total"
-            ]
-            or 0
-        )
-        gastos_fijos_mesuales_hoy = (
-            gastos_fijos.filter(
-                frecuencia=FrecuenciaChoices.MENSUAL,
-                dia_mes=hoy.day,
-            ).aggregate(total=Sum("cantidad"))["total"]
-            or 0
-        )
-
-        gastos_fijos_semanales_hoy = (
-            gastos_fijos.filter(
-                frecuencia=FrecuenciaChoices.SEMANAL,
-                dia_semana=hoy.weekday(),
-            ).aggregate(total=Sum("cantidad"))["total"]
-            or 0
-        )
-
-        gastos_lunes_sabado = (
-            (
-                gastos_fijos.filter(
-                    frecuencia=FrecuenciaChoices.LUNES_SABADO
-                ).aggregate(total=Sum("cantidad"))["total"]
-                or 0
-            )
-            if hoy.weekday() == 6
-            else 0
-        )
-
-        total_gastos_hoy = (
-            gastos_variables_hoy
-            + gastos_fijos_mesuales_hoy
-            + gastos_fijos_semanales_hoy
-            + gastos_lunes_sabado
-        )
-
-        total_ventas_hoy = productos_hoy - total_gastos_hoy
-
-        respuestas["ventasHoy"] = round(total_ventas_hoy, 2)
-
-        # Ventas de la semana
-        productos_semana = (
-            Producto.objects.filter(
-                venta__created_at__range=[inicio_semana, fin_semana]
-            )
-            .annotate(
-                diferencia=F("info__historial_venta__precio")
-                - F("info__historial_costo__precio")
-                - F("info__pago_trabajador")
-            )
-            .aggregate(ventaSemana=Sum("diferencia"))["ventaSemana"]
-            or 0
+    @cachear_respuesta("graficas", GraficasSchema, ["ventas"])
+    def ventas(self, dias_mas_vendidos: int = None):
+        if dias_mas_vendidos is not None and dias_mas_vendidos < 1:
+            raise HttpError(400, "dias_mas_vendidos debe ser mayor que 0")
+
+        return get_graficas_ventas(timezone.localdate(), dias_mas_vendidos)
+
+    @route.get(
+        "mas-vendidos/", response=List[RankingVentasSchema], permissions=[isAdmin]
+    )
+    def masVendidos(
+        self,
+        desde: date = None,
+        hasta: date = None,
+        area_venta: int = None,
+        categoria: int = None,
+        orden: str = "cantidad",
+        limite: int = 10,
+    ):
+        if orden not in ORDENES_RANKING:
+            raise HttpError(400, f"Orden no válido, use {', '.join(ORDENES_RANKING)}")
+
+        return get_mas_vendidos(
+            desde, hasta, area_venta, categoria, orden, max(1, min(limite, 100))
         )
-
-        gastos_variables_semana = (
-            gastos_variables.filter(
-                created_at__range=[inicio_semana, fin_semana],
-            ).aggregate(total=Sum("cantidad"))["total"]
-            or 0
-        )
-
-        gastos_fijos_mesuales_semana = (
-            gastos_fijos.filter(
-                frecuencia=FrecuenciaChoices.MENSUAL,
-                dia_semana__range=[inicio_semana.day, fin_semana.day],
-            ).aggregate(total=Sum("cantidad"))["total"]
-            or 0
-        )
-
-        gastos_fijos_semanales_semana = (
-            gastos_fijos.filter(
-                frecuencia=FrecuenciaChoices.SEMANAL,
-            ).aggregate(
-                total=Sum("cantidad")
-            )["total"]
-            or 0
-        )
-
-        gastos_lunes_sabado_semanal = (
-            gastos_fijos.filter(frecuencia=FrecuenciaChoices.LUNES_SABADO).aggregate(
-                total=Sum("cantidad")
-            )["total"]
-            or 0
-        )
-
-        total_gastos_lunes_sabado_semanal = gastos_lunes_sabado_semanal * 6
-
-        total_gastos_semana = (
-            gastos_variables_semana
-            + gastos_fijos_mesuales_semana
-            + gastos_fijos_semanales_semana
-            + total_gastos_lunes_sabado_semanal
-        )
-
-        total_ventas_semana = productos_semana - total_gastos_semana
-
-        respuestas["ventasSemana"] = round(total_ventas_semana, 2)
-
-        # Ventas del mes
-        productos_mes = (
-            Producto.objects.filter(venta__created_at__range=[inicio_mes, fin_mes])
-            .annotate(
-                diferencia=F("info__historial_venta__precio")
-                - F("info__historial_costo__precio")
-                - F("info__pago_trabajador")
-            )
-            .aggregate(ventaMes=Sum("diferencia"))["ventaMes"]
-            or 0
-        )
-
-        gastos_variables_mes = (
-            gastos_variables.filter(created_at__range=[inicio_mes, fin_mes]).aggregate(
-                total=Sum("cantidad")
-            )["total"]
-            or 0
-        )
-
-        ultimo_dia_hasta = obtener_ultimo_dia_mes(fin_mes)
-
-        gastos_fijos_mes_optimizado = gastos_fijos.filter(
-            frecuencia=FrecuenciaChoices.MENSUAL,
-        ).annotate(
-            dia_mes_ajustado=Case(
-                When(dia_mes__gt=ultimo_dia_hasta, then=ultimo_dia_hasta),
-                default=F("dia_mes"),
-                output_field=IntegerField(),
-            )
-        )
-
-        gastos_fijos_mesuales_mes = (
-            gastos_fijos_mes_optimizado.filter(
-                dia_mes_ajustado__range=(inicio_mes.day, fin_mes.day + 1)
-            ).aggregate(total=Sum("cantidad"))["total"]
-            or 0
-        )
-
-        dias_semana = obtener_dias_semana_rango(inicio_mes, fin_mes)
-
-        filter_gastos_fijos_semanales_mes = gastos_fijos.filter(
-            frecuencia=FrecuenciaChoices.SEMANAL,
-            dia_semana__in=dias_semana,
-        )
-
-        gastos_fijos_semanales_mes = (
-            sum(
-                gasto.cantidad * dias_semana.get(gasto.dia_semana, 0)
-                for gasto in filter_gastos_fijos_semanales_mes
-            )
-            or 0
-        )
-
-        dias_laborales_mes = calcular_dias_laborables(inicio_mes, fin_mes)
-
-        gastos_lunes_sabado_mes = (
-            gastos_fijos.filter(frecuencia=FrecuenciaChoices.LUNES_SABADO).aggregate(
-                total=Sum("cantidad")
-            )["total"]
-            or 0
-        )
-
-        total_gastos_lunes_sabado_mes = gastos_lunes_sabado_mes * dias_laborales_mes
-
-        total_gastos_mes = (
-            gastos_variables_mes
-            + gastos_fijos_mesuales_mes
-            + gastos_fijos_semanales_mes
-            + total_gastos_lunes_sabado_mes
-        )
-
-        total_ventas_mes = productos_mes - total_gastos_mes
-
-        respuestas["ventasMes"] = round(total_ventas_mes, 2)
-
-        # Más vendidos
-        product_info = ProductoInfo.objects.all()
-        products = []
-
-        if product_info:
-            for prod_info in product_info:
-                productos = Producto.objects.filter(
-                    venta__isnull=False, info=prod_info
-                ).count()
-                if productos < 1:
-                    continue
-                products.append({"producto": prod_info, "cantidad": productos})
-
-            products.sort(key=lambda producto: producto["cantidad"], reverse=True)
-        respuestas["masVendidos"] = products[0:5]
-
-        # Total Zapatos
-        total_zapatos = Producto.objects.filter(
-            info__categoria__nombre="Zapatos",
-            venta__isnull=True,
-        ).count()
-        respuestas["total_zapatos"] = total_zapatos
-
-        return respuestas
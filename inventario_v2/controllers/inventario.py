@@ -2,41 +2,33 @@ from inventario.models import (
     ProductoInfo,
     Producto,
     Categorias,
-    HistorialPrecioVentaSalon,
+    UbicacionExistenciaChoices,
 )
 from ..schema import Almacenes
 from ninja_extra import api_controller, route
-from django.db.models import F, Count, Q, OuterRef, Subquery
+from django.db.models import F
+from ..cache import cachear_respuesta
 from ..custom_permissions import isAuthenticated
 
 
 @api_controller("inventario/", tags=["Inventario"], permissions=[isAuthenticated])
 class InventarioController:
     @route.get("almacen/", response=Almacenes)
+    @cachear_respuesta("inventario_almacen", Almacenes, ["inventario", "catalogo"])
     def getInventarioAlmacen(self):
-        ultimo_precio = (
-            HistorialPrecioVentaSalon.objects.filter(producto_info=OuterRef("pk"))
-            .order_by("-fecha_inicio")
-            .values("precio")[:1]
-        )
         producto_info = (
-            ProductoInfo.objects.select_related("producto", "categoria")
-            .filter(
-                producto__venta__isnull=True,
-                producto__area_venta__isnull=True,
-                producto__almacen_revoltosa=False,
-                producto__merma__isnull=True,
-            )
-            .annotate(
-                cantidad=Count(F("producto")), precio_venta=Subquery(ultimo_precio)
+            ProductoInfo.objects.filter(
+                existencias__ubicacion=UbicacionExistenciaChoices.ALMACEN_PRINCIPAL,
+                existencias__area_venta__isnull=True,
+                existencias__cantidad__gt=0,
             )
-            .exclude(Q(cantidad__lt=1) | Q(categoria__nombre="Zapatos"))
+            .exclude(categoria__nombre="Zapatos")
             .values(
                 "id",
                 "descripcion",
-                "cantidad",
                 "categoria__nombre",
                 "precio_venta",
+                cantidad=F("existencias__cantidad"),
             )
         )
 
@@ -61,31 +53,23 @@ class InventarioController:
         }
 
     @route.get("almacen-revoltosa/", response=Almacenes)
+    @cachear_respuesta(
+        "inventario_almacen_revoltosa", Almacenes, ["inventario", "catalogo"]
+    )
     def getInventarioAlmacenRevoltosa(self):
-        ultimo_precio = (
-            HistorialPrecioVentaSalon.objects.filter(producto_info=OuterRef("pk"))
-            .order_by("-fecha_inicio")
-            .values("precio")[:1]
-        )
-
         producto_info = (
-            ProductoInfo.objects.select_related("producto", "categoria")
-            .filter(
-                producto__venta__isnull=True,
-                producto__area_venta__isnull=True,
-                producto__almacen_revoltosa=True,
-                producto__merma__isnull=True,
-            )
-            .annotate(
-                cantidad=Count(F("producto")), precio_venta=Subquery(ultimo_precio)
+            ProductoInfo.objects.filter(
+                existencias__ubicacion=UbicacionExistenciaChoices.ALMACEN_REVOLTOSA,
+                existencias__area_venta__isnull=True,
+                existencias__cantidad__gt=0,
             )
-            .exclude(Q(cantidad__lt=1) | Q(categoria__nombre="Zapatos"))
+            .exclude(categoria__nombre="Zapatos")
             .values(
                 "id",
                 "descripcion",
-                "cantidad",
                 "categoria__nombre",
                 "precio_venta",
+                cantidad=F("existencias__cantidad"),
             )
         )
         zapatos = Producto.objects.filter(
@@ -1,12 +1,10 @@
-import tempfile
 from ninja import File
-from PIL import Image as IMG
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from ninja.errors import HttpError
 from ninja.files import UploadedFile
 from inventario.models import (
     Categorias,
-    Image,
     ProductoInfo,
     Producto,
     Ventas,
@@ -26,11 +24,23 @@ from ..schema import (
 )
 from ninja_extra import api_controller, route
 from typing import Optional
-import cloudinary.uploader
 from django.db import transaction
 from django.db.models import F
+from inventario.imagenes import eliminar_imagen, encolar_imagen, validar_imagen
+from ..cache import cachear_respuesta
 from ..custom_permissions import isAuthenticated
 
+def leer_imagen(imagen):
+    # La imagen se procesa y sube en segundo plano (inventario.imagenes);
+    # aquí solo se comprueba que sea válida antes de aceptarla.
+    contenido = imagen.read()
+    try:
+        validar_imagen(contenido)
+    except Exception:
+        raise HttpError(400, "La imagen no es válida")
+    return contenido
+
+
 # TODO:
 #      * Permisos => Admin y Vendedor de la area de venta
 #      * Endpoint /productos?area_venta=id
@@ -41,9 +51,12 @@ from ..custom_permissions import isAuthenticated
 class ProductoController:
 
     @route.get("", response=ResponseEntradasPrinciapl)
+    @cachear_respuesta("productos", ResponseEntradasPrinciapl, ["catalogo", "cuentas"])
     def getProductos(self):
 
-        producto_info = ProductoInfo.objects.all().order_by("-id")
+        producto_info = ProductoInfo.objects.select_related(
+            "imagen", "categoria"
+        ).order_by("-id")
         cuentas = Cuentas.objects.all()
 
         return {"productos": producto_info, "cuentas": cuentas}
@@ -90,50 +103,22 @@ class ProductoController:
         )
 
         if imagen:
-            try:
-                # Abrir la imagen usando Pillow
-                imagen = IMG.open(imagen)
-
-                # Convertir a RGB si es necesario
-                if imagen.mode in ("RGBA", "P"):
-                    imagen = imagen.convert("RGB")
-
-                    # Redimensionar la imagen (ajusta el tamaño según tus necesidades)
-                    ancho, alto = imagen.size
-                    # Calcular la relación de aspecto
-                    relacion_aspecto = ancho / alto
-
-                    imagen = imagen.resize(
-                        (800, round(800 / relacion_aspecto)), IMG.LANCZOS
-                    )
-
-                # Guardar la imagen optimizada en un archivo temporal
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=".webp"
-                ) as temp_file:
-                    imagen.save(temp_file.name, quality=60)
-                    temp_file.seek(0)
-
-                    # Subir la imagen optimizada a Cloudinary
-                    response = cloudinary.uploader.upload(
-                        temp_file.name, asset_folder="/dashboard_valero"
-                    )
-                    # Actualizar el campo de imagen con la URL de Cloudinary
-                    imagen = Image(
-                        url=response["secure_url"], public_id=response["public_id"]
-                    )
-                    imagen.save()
-                    productoInfo.imagen = imagen
-            except:
-                raise HttpError(424, "Failed Dependecy")
+            contenido = leer_imagen(imagen)
         try:
-            productoInfo.save()
-            HistorialPrecioCostoSalon.objects.create(
-                precio=data.precio_costo, usuario=usuario, producto_info=productoInfo
-            )
-            HistorialPrecioVentaSalon.objects.create(
-                precio=data.precio_venta, usuario=usuario, producto_info=productoInfo
-            )
+            with transaction.atomic():
+                productoInfo.save()
+                if imagen:
+                    encolar_imagen(productoInfo, contenido)
+                HistorialPrecioCostoSalon.objects.create(
+                    precio=data.precio_costo,
+                    usuario=usuario,
+                    producto_info=productoInfo,
+                )
+                HistorialPrecioVentaSalon.objects.create(
+                    precio=data.precio_venta,
+                    usuario=usuario,
+                    producto_info=productoInfo,
+                )
         except Exception as e:
             raise HttpError(500, "Error inesperado")
 
@@ -147,64 +132,37 @@ class ProductoController:
         imagen: Optional[UploadedFile] = File(None),
     ):
 
-        producto = get_object_or_404(ProductoInfo, pk=id)
         categoria_query = get_object_or_404(Categorias, pk=data.categoria)
 
-        producto.descripcion = data.descripcion
-        producto.localizacion = data.localizacion
-        producto.categoria = categoria_query
-        producto.pago_trabajador = data.pago_trabajador
-
-        if not imagen and data.deletePhoto:
-            if producto.imagen:
-                try:
-                    cloudinary.uploader.destroy(producto.imagen.public_id)
-                    img = get_object_or_404(Image, public_id=producto.imagen.public_id)
-                    img.delete()
-                    producto.imagen = None
-                except:
-                    raise HttpError(424, "Dependency fail")
-
         if imagen:
-            try:
-                # Abrir la imagen usando Pillow
-                imagen = IMG.open(imagen)
-
-                # Convertir a RGB si es necesario
-                if imagen.mode in ("RGBA", "P"):
-                    imagen = imagen.convert("RGB")
-
-                    # Redimensionar la imagen (ajusta el tamaño según tus necesidades)
-                    ancho, alto = imagen.size
-                    # Calcular la relación de aspecto
-                    relacion_aspecto = ancho / alto
-
-                    imagen = imagen.resize(
-                        (800, round(800 / relacion_aspecto)), IMG.LANCZOS
-                    )
-
-                # Guardar la imagen optimizada en un archivo temporal
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=".webp"
-                ) as temp_file:
-                    imagen.save(temp_file.name, quality=60)
-                    temp_file.seek(0)
-
-                    # Subir la imagen optimizada a Cloudinary
-                    response = cloudinary.uploader.upload(
-                        temp_file.name, asset_folder="/dashboard_valero"
-                    )
-                    # Actualizar el campo de imagen con la URL de Cloudinary
-                    imagen = Image(
-                        url=response["secure_url"], public_id=response["public_id"]
-                    )
-                    imagen.save()
-                    producto.imagen = imagen
-            except:
-                raise HttpError(424, "Failed Dependecy")
+            contenido = leer_imagen(imagen)
 
         try:
-            producto.save()
+            with transaction.atomic():
+                # Bloqueado y guardando solo lo que edita este endpoint: los
+                # precios actuales los escriben los triggers del historial y la
+                # imagen nueva la enlaza inventario.imagenes, y un save()
+                # completo devolvería los valores leídos aquí.
+                producto = get_object_or_404(
+                    ProductoInfo.objects.select_for_update(), pk=id
+                )
+                producto.descripcion = data.descripcion
+                producto.localizacion = data.localizacion
+                producto.categoria = categoria_query
+                producto.pago_trabajador = data.pago_trabajador
+                campos = ["descripcion", "localizacion", "categoria", "pago_trabajador"]
+
+                if not imagen and data.deletePhoto:
+                    producto.imagenes_pendientes.all().delete()
+                    if producto.imagen:
+                        eliminar_imagen(producto.imagen)
+                        producto.imagen = None
+                        campos.append("imagen")
+                producto.save(update_fields=campos)
+                if imagen:
+                    encolar_imagen(producto, contenido)
+        except Http404:
+            raise
         except:
             raise HttpError(500, "Error inesperado")
 
@@ -223,10 +181,7 @@ class ProductoController:
 
         with transaction.atomic():
             if productoInfo.imagen:
-                try:
-                    cloudinary.uploader.destroy(productoInfo.imagen.public_id)
-                except:
-                    raise HttpError(424, "Error al eliminar el recurso")
+                eliminar_imagen(productoInfo.imagen)
 
             ventas.delete()
             salidas.delete()
@@ -10,9 +10,10 @@ from ..schema import AddSalidaRevoltosaSchema, ProductoInfoSalidaAlmacenRevoltos
 from ninja_extra import api_controller, route
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from django.db.models import Count
+from django.db.models import Count, Q
 
 from ..custom_permissions import isStaff
+from ..utils import describir_errores
 
 
 @api_controller("salidas-revoltosa/", tags=["SalidasRevoltosa"], permissions=[isStaff])
@@ -62,46 +63,42 @@ class SalidasRevoltosaController:
 
             ids_unicos = list(dict.fromkeys(dataDict["zapatos_id"]))
 
-            ids_count = Producto.objects.filter(id__in=ids_unicos).count()
-
-            if ids_count < len(ids_unicos):
-                raise HttpError(400, "Algunos ids no existen")
-
-            filtro1 = Producto.objects.filter(pk__in=ids_unicos, info=producto_info)
-
-            if filtro1.count() < len(ids_unicos):
-                raise HttpError(400, "Los ids deben ser de un único producto")
-
-            filtro2 = filtro1.filter(venta__isnull=True)
-
-            if filtro2.count() < len(ids_unicos):
-                raise HttpError(400, "Algunos productos ya han sido vendidos.")
-
-            filtro3 = filtro2.filter(area_venta__isnull=True)
-
-            if filtro3.count() < len(ids_unicos):
-                raise HttpError(400, "Algunos productos ya están en un área de venta.")
-
-            productos = filtro3.filter(
-                almacen_revoltosa=True,
-                merma__isnull=True,
-            )
-
-            if productos.count() < len(ids_unicos):
-                raise HttpError(400, "Algunos productos no están en el almacén.")
-
             try:
                 with transaction.atomic():
+                    # Una sola consulta valida y bloquea los productos hasta el
+                    # update, para que nadie los mueva entre medias.
+                    errores = Producto.objects.bloquear_y_comprobar(
+                        ids_unicos,
+                        {
+                            "Los ids deben ser de un único producto": Q(
+                                info=producto_info
+                            ),
+                            "Algunos productos ya han sido vendidos": Q(
+                                venta__isnull=True
+                            ),
+                            "Algunos productos ya están en un área de venta": Q(
+                                area_venta__isnull=True
+                            ),
+                            "Algunos productos no están en el almacén": Q(
+                                almacen_revoltosa=True, merma__isnull=True
+                            ),
+                        },
+                    )
+                    if errores:
+                        raise HttpError(400, describir_errores(errores))
+
                     salida = SalidaAlmacenRevoltosa.objects.create(
                         usuario=usuario_search
                     )
-                    productos.update(
+                    Producto.objects.filter(pk__in=ids_unicos).update(
                         area_venta=area_revoltosa,
                         almacen_revoltosa=False,
                         salida_revoltosa=salida,
                     )
 
                     return {"success": True}
+            except HttpError:
+                raise
             except Exception as e:
                 raise HttpError(500, f"Algo salió mal al agregar la salida: {str(e)}")
 
@@ -111,35 +108,25 @@ class SalidasRevoltosaController:
                 cantidad = dataDict["cantidad"]
                 salida = SalidaAlmacenRevoltosa.objects.create(usuario=usuario_search)
 
-                productos = Producto.objects.filter(
+                movidos = Producto.objects.filter(
                     venta__isnull=True,
                     area_venta__isnull=True,
                     almacen_revoltosa=True,
                     info=producto_info,
                     merma__isnull=True,
-                )[:cantidad]
+                ).reservar(
+                    cantidad,
+                    area_venta=area_revoltosa,
+                    almacen_revoltosa=False,
+                    salida_revoltosa=salida,
+                )
 
-                if productos.count() < cantidad:
+                if len(movidos) < cantidad:
                     raise HttpError(
                         400,
                         f"No hay {producto_info.descripcion} suficientes para esta accion",
                     )
 
-                prods = [
-                    Producto(
-                        id=producto.pk,
-                        area_venta=area_revoltosa,
-                        almacen_revoltosa=False,
-                        salida_revoltosa=salida,
-                    )
-                    for producto in productos
-                ]
-
-                Producto.objects.bulk_update(
-                    prods,
-                    fields=["area_venta", "almacen_revoltosa", "salida_revoltosa"],
-                )
-
                 return {"success": True}
 
         else:
@@ -149,23 +136,27 @@ class SalidasRevoltosaController:
     def deleteSalida(self, id: int):
         salida = get_object_or_404(SalidaAlmacenRevoltosa, pk=id)
 
-        productos_vendidos = Producto.objects.filter(
-            salida_revoltosa=salida, venta__isnull=False
-        ).exists()
-
-        if productos_vendidos:
-            raise HttpError(
-                400,
-                "No se puede eliminar la salida porque algunos productos ya han sido vendidos.",
-            )
-
         try:
             with transaction.atomic():
-                Producto.objects.filter(salida_revoltosa=salida).update(
+                productos = Producto.objects.filter(salida_revoltosa=salida)
+                total = productos.count()
+                # La condición va en el propio UPDATE: si otra transacción vende
+                # un producto a la vez, el UPDATE espera su bloqueo, vuelve a
+                # comprobarla con la fila nueva, no lo cuenta y se deshace todo.
+                devueltos = productos.filter(venta__isnull=True).update(
                     area_venta=None, salida_revoltosa=None, almacen_revoltosa=True
                 )
+
+                if devueltos != total:
+                    raise HttpError(
+                        400,
+                        "No se puede eliminar la salida porque algunos productos ya han sido vendidos.",
+                    )
+
                 salida.delete()
 
             return {"success": True}
+        except HttpError:
+            raise
         except Exception as e:
             raise HttpError(500, f"Error inesperado: {str(e)}")
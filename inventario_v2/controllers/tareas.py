@@ -0,0 +1,18 @@
+from ninja_extra import api_controller, route
+
+from inventario.imagenes import procesar_pendientes
+from inventario.models import ImagenPendiente
+from ..custom_permissions import isCron
+from ..schema import ProcesarImagenesSchema
+
+
+@api_controller("tareas/", tags=["Tareas"], auth=None, permissions=[isCron])
+class TareasController:
+    # Vercel llama a las tareas programadas (vercel.json) con GET.
+    @route.get("procesar-imagenes/", response=ProcesarImagenesSchema)
+    def procesarImagenes(self, limite: int = 10):
+        procesadas = procesar_pendientes(max(1, min(limite, 50)))
+        return {
+            "procesadas": procesadas,
+            "pendientes": ImagenPendiente.objects.count(),
+        }
@@ -0,0 +1,43 @@
+from datetime import date
+
+from ninja_extra import api_controller, route
+
+from inventario.models import Transacciones
+from inventario.utils import limites_dias
+from ..custom_permissions import isAdmin
+from ..schema import TransaccionesPaginaSchema
+from ..utils import paginar
+
+
+@api_controller("transacciones/", tags=["Transacciones"], permissions=[isAdmin])
+class TransaccionesController:
+    @route.get("", response=TransaccionesPaginaSchema)
+    def getTransacciones(
+        self,
+        cuenta: int = None,
+        tipo: str = None,
+        moneda: str = None,
+        desde: date = None,
+        hasta: date = None,
+        cursor: str = None,
+        limite: int = 50,
+    ):
+        transacciones = Transacciones.objects.filter(
+            deleted_at__isnull=True
+        ).select_related("cuenta", "usuario")
+
+        if cuenta is not None:
+            transacciones = transacciones.filter(cuenta_id=cuenta)
+        if tipo:
+            transacciones = transacciones.filter(tipo=tipo)
+        if moneda:
+            transacciones = transacciones.filter(moneda=moneda)
+        if desde:
+            inicio, _ = limites_dias(desde)
+            transacciones = transacciones.filter(created_at__gte=inicio)
+        if hasta:
+            _, fin = limites_dias(hasta)
+            transacciones = transacciones.filter(created_at__lt=fin)
+
+        pagina, siguiente = paginar(transacciones, cursor, limite)
+        return {"transacciones": pagina, "siguiente": siguiente}
@@ -1,17 +1,44 @@
 from ninja.errors import HttpError
-from inventario.models import Transferencia, AreaVenta, ProductoInfo, Producto, User
+from inventario.models import (
+    Transferencia,
+    AreaVenta,
+    ProductoInfo,
+    Producto,
+    User,
+)
 from ..schema import (
     TransferenciasModifySchema,
+    TransferenciasPaginaSchema,
 )
 from ninja_extra import api_controller, route
 from django.shortcuts import get_object_or_404
 from ..custom_permissions import isAdmin
+from ..utils import describir_errores, paginar
 from django.db import transaction
+from django.db.models import Q
+from functools import reduce
+from operator import or_
 import re
 
 
 @api_controller("transferencias/", tags=["Transferencias"], permissions=[isAdmin])
 class TransferenciasController:
+    @route.get("", response=TransferenciasPaginaSchema)
+    def getTransferencias(self, area: int = None, cursor: str = None, limite: int = 50):
+        transferencias = Transferencia.objects.select_related(
+            "usuario__area_venta", "de", "para"
+        )
+        if area is not None:
+            transferencias = transferencias.filter(Q(de_id=area) | Q(para_id=area))
+
+        pagina, siguiente = paginar(transferencias, cursor, limite)
+
+        totales = Transferencia.objects.totales_por_producto([t.pk for t in pagina])
+        for transferencia in pagina:
+            transferencia.totales = totales[transferencia.pk]
+
+        return {"transferencias": pagina, "siguiente": siguiente}
+
     @route.post("")
     def addTransferencia(self, request, body: TransferenciasModifySchema):
         body_dict = body.model_dump()
@@ -20,68 +47,82 @@ class TransferenciasController:
         area_destino = get_object_or_404(AreaVenta, pk=body_dict["para"])
         usuario = get_object_or_404(User, pk=request.auth["id"])
 
-        try:
-            with transaction.atomic():
-                new_products = []
-                for producto in body_dict["productos"]:
-                    product = get_object_or_404(ProductoInfo, pk=producto["producto"])
-                    if producto["cantidad"] and not producto["zapatos_id"]:
-                        filtro = Producto.objects.filter(
-                            info=product,
-                            area_venta=area_origen,
-                            almacen_revoltosa=False,
-                            venta__isnull=True,
-                            merma__isnull=True,
-                        )[: producto["cantidad"]]
-
-                        if filtro.count() < producto["cantidad"]:
-                            raise HttpError(
-                                400,
-                                f"No hay {product.descripcion} suficientes en {area_origen.nombre} para esta acción",
-                            )
+        lineas = body_dict["productos"]
+        infos = ProductoInfo.objects.in_bulk({linea["producto"] for linea in lineas})
+        if len(infos) < len({linea["producto"] for linea in lineas}):
+            raise HttpError(404, "Algunos productos no existen")
 
-                        for producto in filtro:
-                            new_products.append(
-                                Producto(
-                                    id=producto.pk,
-                                    area_venta=area_destino,
-                                )
-                            )
+        # Ids de zapatos de cada ProductoInfo, para validar los de todas las
+        # líneas juntos en una sola consulta.
+        zapatos = {}
+        for linea in lineas:
+            if linea["zapatos_id"] and not linea["cantidad"]:
+                for zapato in re.split(r"[;,]", linea["zapatos_id"]):
+                    try:
+                        zapatos.setdefault(linea["producto"], []).append(int(zapato))
+                    except ValueError:
+                        raise HttpError(400, f"Id de zapato no válido: {zapato}")
+        ids_zapatos = list(dict.fromkeys(pk for ids in zapatos.values() for pk in ids))
 
-                    elif producto["zapatos_id"] and not producto["cantidad"]:
-                        zapatos_ids = re.split(r"[;,]", producto["zapatos_id"])
+        disponible = Q(
+            area_venta=area_origen,
+            almacen_revoltosa=False,
+            venta__isnull=True,
+            merma__isnull=True,
+        )
 
-                        zapatos = Producto.objects.filter(
-                            pk__in=zapatos_ids,
-                            info=product,
-                            area_venta=area_origen,
-                            almacen_revoltosa=False,
-                            venta__isnull=True,
-                            merma__isnull=True,
-                        )
-                        if zapatos.count() < len(zapatos_ids):
+        try:
+            with transaction.atomic():
+                transferidos = []
+                for linea in lineas:
+                    product = infos[linea["producto"]]
+                    if linea["cantidad"] and not linea["zapatos_id"]:
+                        movidos = Producto.objects.filter(
+                            disponible, info=product
+                        ).reservar(linea["cantidad"], area_venta=area_destino)
+
+                        if len(movidos) < linea["cantidad"]:
                             raise HttpError(
                                 400,
                                 f"No hay {product.descripcion} suficientes en {area_origen.nombre} para esta acción",
                             )
 
-                        for zapato in zapatos:
-                            new_products.append(
-                                Producto(
-                                    id=zapato.pk,
-                                    area_venta=area_destino,
-                                )
-                            )
+                        transferidos.extend(movidos)
 
-                Producto.objects.bulk_update(
-                    new_products,
-                    fields=["area_venta"],
-                )
+                if zapatos:
+                    errores = Producto.objects.bloquear_y_comprobar(
+                        ids_zapatos,
+                        {
+                            "Algunos zapatos no son del producto indicado": reduce(
+                                or_,
+                                (
+                                    Q(pk__in=ids, info_id=info)
+                                    for info, ids in zapatos.items()
+                                ),
+                            ),
+                            f"Algunos zapatos no están disponibles en {area_origen.nombre}": disponible,
+                        },
+                    )
+                    if errores:
+                        raise HttpError(400, describir_errores(errores))
+
+                    Producto.objects.filter(pk__in=ids_zapatos).update(
+                        area_venta=area_destino
+                    )
+                    transferidos.extend(ids_zapatos)
 
                 transferencia = Transferencia.objects.create(
                     de=area_origen, para=area_destino, usuario=usuario
                 )
-                transferencia.productos.set(new_products)
+                Transferencia.productos.through.objects.bulk_create(
+                    [
+                        Transferencia.productos.through(
+                            transferencia_id=transferencia.pk, producto_id=pk
+                        )
+                        for pk in transferidos
+                    ],
+                    ignore_conflicts=True,
+                )
 
             return
         except Exception as e:
@@ -92,22 +133,34 @@ class TransferenciasController:
     @route.delete("{id}/")
     def deleteTransferencia(self, id: int):
         transferencia = get_object_or_404(Transferencia, pk=id)
-        productos = transferencia.productos.all()
-        productos_to_update = Producto.objects.filter(
-            pk__in=productos.values_list("id", flat=True),
-            area_venta=transferencia.para,
-            venta__isnull=True,
-            almacen_revoltosa=False,
-            merma__isnull=True,
-        )
 
-        if productos_to_update.count() != productos.count():
-            raise HttpError(
-                400, "Alguno productos ya no se encuentran en el área de venta."
-            )
         try:
-            productos_to_update.update(area_venta=transferencia.de)
-            transferencia.delete()
+            with transaction.atomic():
+                productos = Transferencia.productos.through.objects.filter(
+                    transferencia=transferencia
+                ).values("producto_id")
+                total = productos.count()
+                # Las condiciones van sobre la propia tabla de productos y no
+                # dentro de la subconsulta: así, si otra transacción vende o
+                # mueve un producto a la vez, el UPDATE espera su bloqueo,
+                # vuelve a comprobarlas con la fila nueva, no lo cuenta y se
+                # deshace todo.
+                devueltos = Producto.objects.filter(
+                    pk__in=productos,
+                    area_venta=transferencia.para,
+                    venta__isnull=True,
+                    almacen_revoltosa=False,
+                    merma__isnull=True,
+                ).update(area_venta=transferencia.de)
+
+                if devueltos != total:
+                    raise HttpError(
+                        400, "Alguno productos ya no se encuentran en el área de venta."
+                    )
+
+                transferencia.delete()
             return
+        except HttpError:
+            raise
         except:
             raise HttpError(500, "Error inesperado.")
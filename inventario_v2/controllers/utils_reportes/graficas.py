@@ -0,0 +1,279 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from inventario.models import (
+    AreaVenta,
+    FrecuenciaChoices,
+    Gastos,
+    GastosChoices,
+    Producto,
+    ProductoInfo,
+    VentaDiariaResumen,
+)
+from inventario.utils import limites_dias
+from ...utils import get_day_name, get_month_name, obtener_ultimo_dia_mes
+
+
+def ganancia_resumen():
+    return F("importe") - F("costo") - F("pago_trabajador")
+
+
+def gasto_fijo_en_fecha(gasto, fecha: date) -> bool:
+    frecuencia = gasto["frecuencia"]
+
+    if frecuencia == FrecuenciaChoices.MENSUAL:
+        if gasto["dia_mes"] is None:
+            return False
+        return fecha.day == min(gasto["dia_mes"], obtener_ultimo_dia_mes(fecha))
+
+    if frecuencia == FrecuenciaChoices.SEMANAL:
+        return fecha.weekday() == gasto["dia_semana"]
+
+    if frecuencia == FrecuenciaChoices.LUNES_SABADO:
+        return fecha.weekday() != 6
+
+    return False
+
+
+def rango_fechas(desde: date, hasta: date):
+    while desde <= hasta:
+        yield desde
+        desde += timedelta(days=1)
+
+
+def get_gastos_fijos(hasta: date):
+    gastos = {}
+    _, fin = limites_dias(hasta)
+    filas = Gastos.objects.filter(tipo=GastosChoices.FIJO, created_at__lt=fin).values(
+        "id", "frecuencia", "dia_mes", "dia_semana", "cantidad", "areas_venta"
+    )
+
+    for fila in filas:
+        gasto = gastos.setdefault(fila["id"], {**fila, "areas": set()})
+        if fila["areas_venta"] is not None:
+            gasto["areas"].add(fila["areas_venta"])
+
+    return list(gastos.values())
+
+
+ORDENES_RANKING = ("cantidad", "importe", "ganancia")
+
+# Segundos en caché del ranking: las ventanas que incluyen hoy siguen
+# cambiando, las cerradas solo con ediciones o eliminaciones de ventas.
+CACHE_RANKING_ABIERTO = 5 * 60
+CACHE_RANKING_CERRADO = 60 * 60
+
+
+def get_mas_vendidos(
+    desde: date = None,
+    hasta: date = None,
+    area_venta: int = None,
+    categoria: int = None,
+    orden: str = "cantidad",
+    limite: int = 5,
+    con_precios: bool = True,
+):
+    clave = (
+        f"mas_vendidos:{desde}:{hasta}:{area_venta}:{categoria}:{orden}:{limite}"
+        f":{con_precios}"
+    )
+    ranking = cache.get(clave)
+    if ranking is not None:
+        return ranking
+
+    productos = Producto.objects.all()
+    if desde:
+        inicio, _ = limites_dias(desde)
+        productos = productos.filter(venta__created_at__gte=inicio)
+    if hasta:
+        _, fin = limites_dias(hasta)
+        productos = productos.filter(venta__created_at__lt=fin)
+    if area_venta:
+        productos = productos.filter(venta__area_venta_id=area_venta)
+    if categoria:
+        productos = productos.filter(info__categoria_id=categoria)
+
+    filas = list(productos.ranking_ventas(orden)[:limite])
+    if con_precios and orden == "cantidad" and filas:
+        # Los precios solo de los productos del ranking, no de todo lo vendido.
+        precios = {
+            fila["info"]: fila
+            for fila in productos.filter(
+                info__in=[fila["info"] for fila in filas]
+            ).ranking_ventas(con_precios=True)
+        }
+        filas = [precios[fila["info"]] for fila in filas]
+
+    infos = ProductoInfo.objects.select_related("imagen", "categoria").in_bulk(
+        [fila["info"] for fila in filas]
+    )
+    ranking = [{**fila, "producto": infos[fila["info"]]} for fila in filas]
+
+    abierto = hasta is None or hasta >= timezone.localdate()
+    cache.set(
+        clave,
+        ranking,
+        CACHE_RANKING_ABIERTO if abierto else CACHE_RANKING_CERRADO,
+    )
+    return ranking
+
+
+def get_graficas_ventas(hoy: date, dias_mas_vendidos: int = None):
+    inicio_semana = hoy - timedelta(days=hoy.weekday())
+    fin_semana = inicio_semana + timedelta(days=6)
+    inicio_mes = hoy.replace(day=1)
+    fin_mes = hoy.replace(day=obtener_ultimo_dia_mes(hoy))
+    inicio_anno = date(hoy.year, 1, 1)
+
+    desde = min(inicio_semana, inicio_anno)
+    hasta = max(fin_semana, fin_mes)
+
+    respuestas = {
+        "ventasPorArea": [],
+        "ventasAnuales": [],
+        "masVendidos": [],
+        "ventasHoy": 0,
+        "ventasSemana": 0,
+        "ventasMes": 0,
+        "total_zapatos": 0,
+    }
+
+    # Gastos
+    inicio, fin = limites_dias(desde, hasta)
+    gastos_variables = Gastos.objects.filter(
+        tipo=GastosChoices.VARIABLE, created_at__gte=inicio, created_at__lt=fin
+    ).annotate(fecha=TruncDate("created_at"))
+
+    gastos_variables_por_fecha = dict(
+        gastos_variables.values("fecha")
+        .annotate(total=Sum("cantidad"))
+        .values_list("fecha", "total")
+    )
+
+    gastos_fijos = get_gastos_fijos(inicio_mes)
+
+    gastos_fijos_por_fecha = {
+        fecha: sum(
+            gasto["cantidad"]
+            for gasto in gastos_fijos
+            if gasto_fijo_en_fecha(gasto, fecha)
+        )
+        for fecha in rango_fechas(desde, hasta)
+    }
+
+    def total_gastos(inicio: date, fin: date):
+        return sum(
+            gastos_variables_por_fecha.get(fecha, 0) + gastos_fijos_por_fecha[fecha]
+            for fecha in rango_fechas(inicio, fin)
+        )
+
+    # Ventas por área
+    areas = AreaVenta.objects.all()
+    if areas:
+        ventas_por_area = {
+            (fila["fecha"], fila["area_venta"]): fila["total"]
+            for fila in VentaDiariaResumen.objects.filter(
+                fecha__range=(inicio_semana, fin_semana)
+            ).values("fecha", "area_venta", total=ganancia_resumen())
+        }
+
+        gastos_variables_por_area = {
+            (fila["fecha"], fila["areas_venta"]): fila["total"]
+            for fila in gastos_variables.filter(
+                fecha__range=(inicio_semana, fin_semana),
+                areas_venta__isnull=False,
+            )
+            .values("fecha", "areas_venta")
+            .annotate(total=Sum("cantidad"))
+        }
+
+        for dia in range(7):
+            dia_fecha = inicio_semana + timedelta(days=dia)
+            dia_ventas = {"dia": get_day_name(dia)}
+            for area in areas:
+                total_gastos_area = gastos_variables_por_area.get(
+                    (dia_fecha, area.pk), 0
+                ) + sum(
+                    gasto["cantidad"]
+                    for gasto in gastos_fijos
+                    if area.pk in gasto["areas"]
+                    and gasto_fijo_en_fecha(gasto, dia_fecha)
+                )
+
+                total_ventas_area = (
+                    ventas_por_area.get((dia_fecha, area.pk)) or 0
+                ) - total_gastos_area
+
+                dia_ventas[area.nombre] = {
+                    "ventas": round(total_ventas_area, 2),
+                    "color": area.color if area.color else "#000",
+                }
+            respuestas["ventasPorArea"].append(dia_ventas)
+
+    # Ventas anuales
+    ventas_por_mes = defaultdict(int)
+    for fila in (
+        VentaDiariaResumen.objects.filter(fecha__range=(inicio_anno, fin_mes))
+        .annotate(mes=TruncMonth("fecha"))
+        .values("mes")
+        .annotate(total=Sum(ganancia_resumen()))
+    ):
+        ventas_por_mes[fila["mes"].month] += fila["total"] or 0
+
+    for mes in range(1, hoy.month + 1):
+        inicio_mes_graf_anual = date(hoy.year, mes, 1)
+        fin_mes_graf_anual = inicio_mes_graf_anual.replace(
+            day=obtener_ultimo_dia_mes(inicio_mes_graf_anual)
+        )
+
+        respuestas["ventasAnuales"].append(
+            {
+                "mes": get_month_name(mes).capitalize(),
+                "ventas": round(
+                    ventas_por_mes[mes]
+                    - total_gastos(inicio_mes_graf_anual, fin_mes_graf_anual),
+                    2,
+                ),
+            }
+        )
+
+    # Ventas hoy, semana y mes
+    ventas = VentaDiariaResumen.objects.filter(
+        fecha__range=(min(inicio_semana, inicio_mes), max(fin_semana, fin_mes))
+    ).aggregate(
+        hoy=Sum(ganancia_resumen(), filter=Q(fecha=hoy)),
+        semana=Sum(
+            ganancia_resumen(), filter=Q(fecha__range=(inicio_semana, fin_semana))
+        ),
+        mes=Sum(ganancia_resumen(), filter=Q(fecha__range=(inicio_mes, fin_mes))),
+    )
+
+    respuestas["ventasHoy"] = round((ventas["hoy"] or 0) - total_gastos(hoy, hoy), 2)
+    respuestas["ventasSemana"] = round(
+        (ventas["semana"] or 0) - total_gastos(inicio_semana, fin_semana), 2
+    )
+    respuestas["ventasMes"] = round(
+        (ventas["mes"] or 0) - total_gastos(inicio_mes, fin_mes), 2
+    )
+
+    # Más vendidos de siempre o, si se pide, de los últimos días. El panel solo
+    # muestra unidades y el ranking queda en caché aparte (ver get_mas_vendidos).
+    if dias_mas_vendidos:
+        respuestas["masVendidos"] = get_mas_vendidos(
+            hoy - timedelta(days=dias_mas_vendidos - 1), hoy, con_precios=False
+        )
+    else:
+        respuestas["masVendidos"] = get_mas_vendidos(con_precios=False)
+
+    # Total Zapatos
+    respuestas["total_zapatos"] = Producto.objects.filter(
+        info__categoria__nombre="Zapatos",
+        venta__isnull=True,
+    ).count()
+
+    return respuestas
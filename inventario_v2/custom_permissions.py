@@ -1,3 +1,6 @@
+import hmac
+
+from django.conf import settings
 from ninja_extra.permissions import BasePermission, SAFE_METHODS
 from inventario.models import RolesChoices
 
@@ -28,6 +31,16 @@ class isAuthenticated(BasePermission):
             return True
 
 
+class isCron(BasePermission):
+    """Tareas programadas de Vercel, que envían CRON_SECRET como token Bearer."""
+
+    def has_permission(self, request, view=None, controller=None):
+        cabecera = request.headers.get("Authorization", "")
+        return bool(settings.CRON_SECRET) and hmac.compare_digest(
+            cabecera, f"Bearer {settings.CRON_SECRET}"
+        )
+
+
 # TODO
 # class isAuthorizeVenta(BasePermission):
 #     def has_permission(self, request, view=None, controller=None):
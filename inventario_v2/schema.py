@@ -362,6 +362,12 @@ class MasVendidosSchema(Schema):
     cantidad: int
 
 
+class RankingVentasSchema(MasVendidosSchema):
+    importe: Decimal
+    costo: Decimal
+    ganancia: Decimal
+
+
 class GraficasSchema(Schema):
     ventasPorArea: Any
     ventasAnuales: List[VentasAnualesSchema]
@@ -387,6 +393,17 @@ class TransferenciaSchema(ModelSchema):
         model = Transferencia
         fields = "__all__"
 
+    @staticmethod
+    def resolve_productos(obj):
+        # Totales ya agrupados por ProductoInfo (ver
+        # TransferenciaQuerySet.totales_por_producto).
+        return obj.totales
+
+
+class TransferenciasPaginaSchema(Schema):
+    transferencias: List[TransferenciaSchema]
+    siguiente: Optional[str] = None
+
 
 class ProductosTransfer(Schema):
     producto: int
@@ -662,3 +679,53 @@ class MermaSchema(ModelSchema):
 class NoRepresentadosSchema(Schema):
     id: int
     nombre: str
+
+
+class SaldoCuentaSchema(Schema):
+    cuenta: int
+    fecha: datetime.datetime
+    saldo: Decimal
+    fecha_cierre: Optional[datetime.date] = None
+
+
+class CuentaTransaccionSchema(ModelSchema):
+    class Meta:
+        model = Cuentas
+        fields = ["id", "nombre", "tipo", "moneda"]
+
+
+class TransaccionSchema(ModelSchema):
+    cuenta: CuentaTransaccionSchema
+    usuario: Optional[User_Only_Username] = None
+
+    class Meta:
+        model = Transacciones
+        fields = [
+            "id",
+            "created_at",
+            "tipo",
+            "cantidad",
+            "moneda",
+            "descripcion",
+            "saldo_resultante",
+            "cuenta_origen",
+            "cuenta_destino",
+            "tipo_cambio",
+            "es_reversion",
+        ]
+
+
+class TransaccionesPaginaSchema(Schema):
+    transacciones: List[TransaccionSchema]
+    siguiente: Optional[str] = None
+
+
+class MetricasCacheSchema(Schema):
+    aciertos: int
+    fallos: int
+    tasa_aciertos: float
+
+
+class ProcesarImagenesSchema(Schema):
+    procesadas: int
+    pendientes: int
@@ -1,3 +1,1785 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+import zipfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from time import sleep
 
-# Create your tests here.
+import jwt
+import PIL.Image
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inventario.cache import versiones
+from inventario.imagenes import (
+    RECLAMO_CADUCA,
+    UploaderLocal,
+    encolar_imagen,
+    generar_variantes,
+    procesar,
+    procesar_pendientes,
+    reclamar_pendientes,
+)
+from inventario.models import (
+    AreaVenta,
+    Categorias,
+    Cuentas,
+    CuentasChoices,
+    Deuda,
+    Elaboraciones,
+    Elaboraciones_Ventas_Cafeteria,
+    EntradaAlmacen,
+    Existencia,
+    FrecuenciaChoices,
+    Gastos,
+    GastosChoices,
+    HistorialPrecioCostoCafeteria,
+    HistorialPrecioCostoSalon,
+    HistorialPrecioVentaSalon,
+    HistorialSaldoCuenta,
+    HistorialSaldoInventarios,
+    ImagenPendiente,
+    METODO_PAGO,
+    MonedaChoices,
+    Producto,
+    ProductoInfo,
+    Productos_Cafeteria,
+    Productos_Ventas_Cafeteria,
+    Proveedor,
+    RolesChoices,
+    SaldoInsuficienteError,
+    SalidaAlmacenRevoltosa,
+    TipoTranferenciaChoices,
+    Transacciones,
+    Transferencia,
+    UbicacionExistenciaChoices,
+    User,
+    VentaDiariaResumen,
+    Ventas,
+    Ventas_Cafeteria,
+)
+from .controllers.entradas import formatear_ids
+from .controllers.utils_reportes.graficas import get_graficas_ventas
+
+
+def auth_headers(usuario):
+    token = jwt.encode(
+        {"id": usuario.pk, "rol": usuario.rol}, settings.SECRET_KEY, algorithm="HS256"
+    )
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+def explain_sin_seqscan(sentencias):
+    """EXPLAIN de cada sentencia sin permitir scans secuenciales, para que con
+    las tablas pequeñas de los tests el planificador muestre el índice que
+    usaría con más datos."""
+    planes = []
+    with connection.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+        try:
+            for sql in sentencias:
+                cursor.execute(f"EXPLAIN {sql}")
+                planes.append("\n".join(fila[0] for fila in cursor.fetchall()))
+        finally:
+            cursor.execute("RESET enable_seqscan")
+    return planes
+
+
+# Datos base que repiten casi todas las pruebas: la cuenta "Caja", áreas de
+# venta sobre ella, la categoría "Ropa" y el producto "Blusa".
+
+
+def crear_admin():
+    return User.objects.create_user("admin", "admin", rol=RolesChoices.ADMIN)
+
+
+def crear_cuenta(**kwargs):
+    return Cuentas.objects.create(nombre="Caja", tipo=CuentasChoices.EFECTIVO, **kwargs)
+
+
+def crear_areas(*nombres, cuenta=None):
+    cuenta = cuenta or crear_cuenta()
+    return [
+        AreaVenta.objects.create(nombre=nombre, color="#fff", cuenta=cuenta)
+        for nombre in nombres
+    ]
+
+
+def crear_info(descripcion="Blusa", categoria="Ropa", costo=None, venta=None):
+    """ProductoInfo con pago_trabajador 5 y, si se indican, sus precios de costo
+    y de venta en el historial."""
+    if isinstance(categoria, str):
+        categoria, _ = Categorias.objects.get_or_create(nombre=categoria)
+    info = ProductoInfo.objects.create(
+        descripcion=descripcion, pago_trabajador=5, categoria=categoria
+    )
+    if costo is not None:
+        HistorialPrecioCostoSalon.objects.create(producto_info=info, precio=costo)
+    if venta is not None:
+        HistorialPrecioVentaSalon.objects.create(producto_info=info, precio=venta)
+    return info
+
+
+class GraficasVentasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cuenta = crear_cuenta()
+        cls.info = crear_info(costo=50, venta=100)
+
+    def setUp(self):
+        cache.clear()
+
+    def crear_area(self, nombre):
+        (area,) = crear_areas(nombre, cuenta=self.cuenta)
+        venta = Ventas.objects.create(area_venta=area, metodo_pago=METODO_PAGO.EFECTIVO)
+        Producto.objects.create(info=self.info, area_venta=area, venta=venta)
+
+        gasto = Gastos.objects.create(
+            tipo=GastosChoices.FIJO,
+            frecuencia=FrecuenciaChoices.LUNES_SABADO,
+            descripcion="Salario",
+            cantidad=10,
+        )
+        gasto.areas_venta.add(area)
+        Gastos.objects.filter(pk=gasto.pk).update(
+            created_at=timezone.make_aware(datetime(2020, 1, 1))
+        )
+        return area
+
+    def vender_en(self, fecha):
+        Ventas.objects.update(
+            created_at=timezone.make_aware(datetime.combine(fecha, time(12)))
+        )
+
+    def test_numero_de_consultas_constante(self):
+        self.crear_area("Área 1")
+        for hoy in (date(2026, 1, 5), date(2026, 12, 28)):
+            cache.clear()
+            self.vender_en(hoy)
+            with self.assertNumQueries(10):
+                get_graficas_ventas(hoy)
+
+        for i in range(2, 6):
+            self.crear_area(f"Área {i}")
+        for hoy in (date(2026, 1, 5), date(2026, 12, 28)):
+            cache.clear()
+            self.vender_en(hoy)
+            with self.assertNumQueries(10):
+                get_graficas_ventas(hoy)
+
+        # Con el ranking en caché no se vuelve a agrupar.
+        with self.assertNumQueries(8):
+            get_graficas_ventas(date(2026, 12, 28))
+
+    def test_ranking(self):
+        area = self.crear_area("Área 1")
+        otra_area = self.crear_area("Área 2")
+        camisa = ProductoInfo.objects.create(
+            descripcion="Camisa", pago_trabajador=1, categoria=self.info.categoria
+        )
+        HistorialPrecioCostoSalon.objects.create(producto_info=camisa, precio=10)
+        HistorialPrecioVentaSalon.objects.create(producto_info=camisa, precio=20)
+        venta = Ventas.objects.create(area_venta=area, metodo_pago=METODO_PAGO.EFECTIVO)
+        Producto.objects.bulk_create(
+            [Producto(info=camisa, area_venta=area, venta=venta) for _ in range(4)]
+        )
+        eliminada = Ventas.objects.create(
+            area_venta=area,
+            metodo_pago=METODO_PAGO.EFECTIVO,
+            deleted_at=timezone.now(),
+        )
+        Producto.objects.bulk_create(
+            [
+                Producto(info=self.info, area_venta=area, venta=eliminada)
+                for _ in range(9)
+            ]
+        )
+
+        usuario = crear_admin()
+
+        def ranking(**params):
+            response = self.client.get(
+                "/v2/graficas/mas-vendidos/", params, **auth_headers(usuario)
+            )
+            self.assertEqual(response.status_code, 200)
+            return [
+                (fila["producto"]["descripcion"], fila["cantidad"], fila["ganancia"])
+                for fila in response.json()
+            ]
+
+        self.assertEqual(ranking(), [("Camisa", 4, "36.00"), ("Blusa", 2, "90.00")])
+        self.assertEqual(
+            ranking(orden="ganancia"), [("Blusa", 2, "90.00"), ("Camisa", 4, "36.00")]
+        )
+        self.assertEqual(ranking(area_venta=otra_area.pk), [("Blusa", 1, "45.00")])
+        self.assertEqual(ranking(hasta=timezone.localdate() - timedelta(days=1)), [])
+        self.assertEqual(ranking(orden="importe", limite=1), [("Blusa", 2, "90.00")])
+
+        with self.assertNumQueries(0):
+            ranking()
+
+        # Por cantidad se ordena sin precios y luego se calculan solo los del
+        # ranking.
+        cache.clear()
+        with CaptureQueriesContext(connection) as consultas:
+            ranking(limite=1)
+        agrupadas = [c["sql"] for c in consultas if "GROUP BY" in c["sql"]]
+        self.assertEqual(len(agrupadas), 2)
+        self.assertNotIn("historialprecio", agrupadas[0])
+        self.assertIn(f'"info_id" IN ({camisa.pk})', agrupadas[1])
+
+        response = self.client.get(
+            "/v2/graficas/mas-vendidos/", {"orden": "id"}, **auth_headers(usuario)
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_ventas_hoy(self):
+        area = self.crear_area("Área 1")
+        hoy = timezone.localdate()
+        gastos_hoy = 0 if hoy.weekday() == 6 else 10
+
+        respuestas = get_graficas_ventas(hoy)
+
+        self.assertEqual(respuestas["ventasHoy"], Decimal(45 - gastos_hoy))
+        dia = respuestas["ventasPorArea"][hoy.weekday()]
+        self.assertEqual(dia[area.nombre]["ventas"], Decimal(45 - gastos_hoy))
+        self.assertEqual(respuestas["masVendidos"][0]["cantidad"], 1)
+
+        # El ranking del panel es de siempre salvo que se pida una ventana.
+        cache.clear()
+        self.vender_en(hoy - timedelta(days=30))
+        self.assertEqual(get_graficas_ventas(hoy)["masVendidos"][0]["cantidad"], 1)
+        self.assertEqual(get_graficas_ventas(hoy, 30)["masVendidos"], [])
+        self.assertEqual(get_graficas_ventas(hoy, 31)["masVendidos"][0]["cantidad"], 1)
+
+        usuario = crear_admin()
+        response = self.client.get(
+            "/v2/graficas/", {"dias_mas_vendidos": 30}, **auth_headers(usuario)
+        )
+        self.assertEqual(response.json()["masVendidos"], [])
+
+
+class VentaDiariaResumenTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.area,) = crear_areas("Salón")
+        cls.info = crear_info(costo=50, venta=100)
+
+    def vender(self, cantidad):
+        venta = Ventas.objects.create(
+            area_venta=self.area, metodo_pago=METODO_PAGO.EFECTIVO
+        )
+        for _ in range(cantidad):
+            Producto.objects.create(info=self.info, area_venta=self.area, venta=venta)
+        return venta
+
+    def test_resumen_incremental(self):
+        self.vender(2)
+        venta = self.vender(1)
+
+        resumen = VentaDiariaResumen.objects.get(area_venta=self.area)
+        self.assertEqual(resumen.cantidad, 3)
+        self.assertEqual(resumen.importe, Decimal("300.00"))
+        self.assertEqual(resumen.costo, Decimal("150.00"))
+        self.assertEqual(resumen.pago_trabajador, Decimal("15.00"))
+
+        venta.deleted_at = timezone.now()
+        venta.save()
+
+        resumen.refresh_from_db()
+        self.assertEqual(resumen.cantidad, 2)
+
+    def test_escrituras_sin_senales(self):
+        # Lo que hace el frontend o un QuerySet.update(): no hay señales.
+        venta = self.vender(3)
+        vendidos = Producto.objects.filter(venta=venta).values_list("pk", flat=True)
+        Producto.objects.filter(pk__in=list(vendidos[:2])).update(venta=None)
+        resumen = VentaDiariaResumen.objects.get(area_venta=self.area)
+        self.assertEqual(resumen.cantidad, 1)
+        self.assertEqual(resumen.importe, Decimal("100.00"))
+
+        ProductoInfo.objects.filter(pk=self.info.pk).update(pago_trabajador=7)
+        resumen.refresh_from_db()
+        self.assertEqual(resumen.pago_trabajador, Decimal("7.00"))
+
+        Ventas.objects.filter(pk=venta.pk).update(deleted_at=timezone.now())
+        self.assertFalse(VentaDiariaResumen.objects.exists())
+
+    def test_reconstruir(self):
+        self.vender(2)
+        hoy = timezone.localdate()
+        VentaDiariaResumen.objects.all().delete()
+
+        VentaDiariaResumen.objects.reconstruir(hoy, hoy)
+
+        resumen = VentaDiariaResumen.objects.get(area_venta=self.area, fecha=hoy)
+        self.assertEqual(resumen.cantidad, 2)
+        self.assertEqual(resumen.importe, Decimal("200.00"))
+
+    def test_precio_vigente_en_la_fecha_de_venta(self):
+        self.vender(1)
+        HistorialPrecioVentaSalon.objects.create(producto_info=self.info, precio=120)
+        HistorialPrecioVentaSalon.objects.filter(precio=120).update(
+            fecha_inicio=timezone.now() + timedelta(days=1)
+        )
+
+        producto = Producto.objects.con_precios_vigentes().get()
+
+        self.assertEqual(producto.precio_venta_vigente, Decimal("100.00"))
+        self.assertEqual(producto.precio_costo_vigente, Decimal("50.00"))
+
+
+class ResumenVentasConcurrenciaTest(TransactionTestCase):
+    HILOS = 8
+
+    def setUp(self):
+        (self.area,) = crear_areas("Salón")
+        self.info = crear_info(venta=100)
+
+    def vender(self, barrera, errores):
+        try:
+            barrera.wait()
+            with transaction.atomic():
+                venta = Ventas.objects.create(
+                    area_venta=self.area, metodo_pago=METODO_PAGO.EFECTIVO
+                )
+                Producto.objects.create(
+                    info=self.info, area_venta=self.area, venta=venta
+                )
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connection.close()
+
+    def test_ventas_simultaneas(self):
+        barrera = threading.Barrier(self.HILOS, timeout=10)
+        errores = []
+        hilos = [
+            threading.Thread(target=self.vender, args=(barrera, errores))
+            for _ in range(self.HILOS)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        resumen = VentaDiariaResumen.objects.get(area_venta=self.area)
+        self.assertEqual(resumen.cantidad, self.HILOS)
+        self.assertEqual(resumen.importe, Decimal(100 * self.HILOS))
+
+
+class PreciosActualesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_admin()
+        cls.categoria = Categorias.objects.create(nombre="Ropa")
+
+    def setUp(self):
+        cache.clear()
+
+    def crear_producto(self, descripcion):
+        return crear_info(descripcion, self.categoria, costo=50, venta=100)
+
+    def test_historial_actualiza_precio_actual(self):
+        info = self.crear_producto("Blusa")
+        HistorialPrecioVentaSalon.objects.create(producto_info=info, precio=120)
+
+        info.refresh_from_db()
+        self.assertEqual(info.precio_costo, Decimal("50.00"))
+        self.assertEqual(info.precio_venta, Decimal("120.00"))
+
+        producto = Productos_Cafeteria.objects.create(nombre="Café")
+        HistorialPrecioCostoCafeteria.objects.create(producto=producto, precio=3)
+
+        producto.refresh_from_db()
+        self.assertEqual(producto.precio_costo, Decimal("3"))
+        self.assertEqual(producto.precio_venta, Decimal("0"))
+
+    def test_escrituras_fuera_de_django(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO inventario_productoinfo"
+                " (descripcion, pago_trabajador, categoria_id)"
+                " VALUES (%s, %s, %s) RETURNING id",
+                ["Blusa", 5, self.categoria.pk],
+            )
+            (info_id,) = cursor.fetchone()
+        info = ProductoInfo.objects.get(pk=info_id)
+        self.assertEqual(info.precio_venta, Decimal("0.00"))
+
+        HistorialPrecioVentaSalon.objects.bulk_create(
+            [HistorialPrecioVentaSalon(producto_info=info, precio=100)]
+        )
+        HistorialPrecioVentaSalon.objects.filter(producto_info=info).update(precio=90)
+        info.refresh_from_db()
+        self.assertEqual(info.precio_venta, Decimal("90.00"))
+
+        HistorialPrecioVentaSalon.objects.filter(producto_info=info).delete()
+        info.refresh_from_db()
+        self.assertEqual(info.precio_venta, Decimal("0.00"))
+
+    def test_editar_no_pisa_el_precio_actual(self):
+        info = self.crear_producto("Blusa")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO inventario_historialprecioventasalon"
+                " (producto_info_id, precio, fecha_inicio) VALUES (%s, 130, now())",
+                [info.pk],
+            )
+
+        datos = {
+            "descripcion": "Blusa roja",
+            "categoria": self.categoria.pk,
+            "pago_trabajador": 6,
+            "deletePhoto": False,
+        }
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(
+                f"/v2/productos/{info.pk}/",
+                {"data": json.dumps(datos)},
+                **auth_headers(self.usuario),
+            )
+        self.assertEqual(response.status_code, 200)
+
+        info.refresh_from_db()
+        self.assertEqual(info.descripcion, "Blusa roja")
+        self.assertEqual(info.precio_venta, Decimal("130.00"))
+        (update,) = [
+            c["sql"]
+            for c in consultas
+            if c["sql"].startswith('UPDATE "inventario_productoinfo"')
+        ]
+        self.assertNotIn("precio", update)
+        self.assertNotIn("imagen", update)
+
+    def test_catalogo_sin_consultas_por_producto(self):
+        for i in range(5):
+            self.crear_producto(f"Blusa {i}")
+
+        # Autenticación (usuario no se consulta), versiones de la caché,
+        # productos y cuentas.
+        with self.assertNumQueries(3):
+            response = self.client.get("/v2/productos", **auth_headers(self.usuario))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["productos"][0]["precio_venta"], "100.00")
+
+
+class ExistenciasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.area,) = crear_areas("Salón")
+        cls.info = crear_info()
+
+    def existencia(self, ubicacion, area_venta=None):
+        return Existencia.objects.get(
+            producto_info=self.info, ubicacion=ubicacion, area_venta=area_venta
+        ).cantidad
+
+    def test_triggers_mantienen_existencias(self):
+        Producto.objects.bulk_create([Producto(info=self.info) for _ in range(10)])
+        ids = list(Producto.objects.values_list("id", flat=True)[:4])
+        Producto.objects.filter(id__in=ids).update(area_venta=self.area)
+
+        self.assertEqual(self.existencia(UbicacionExistenciaChoices.ALMACEN_PRINCIPAL), 6)
+        self.assertEqual(
+            self.existencia(UbicacionExistenciaChoices.AREA_VENTA, self.area), 4
+        )
+
+        venta = Ventas.objects.create(
+            area_venta=self.area, metodo_pago=METODO_PAGO.EFECTIVO
+        )
+        Producto.objects.filter(id=ids[0]).update(venta=venta)
+        Producto.objects.filter(area_venta__isnull=True).first().delete()
+
+        self.assertEqual(self.existencia(UbicacionExistenciaChoices.ALMACEN_PRINCIPAL), 5)
+        self.assertEqual(
+            self.existencia(UbicacionExistenciaChoices.AREA_VENTA, self.area), 3
+        )
+        self.assertEqual(Existencia.objects.diferencias(), [])
+
+    def test_eliminar_producto_info(self):
+        Producto.objects.bulk_create([Producto(info=self.info) for _ in range(2)])
+
+        self.info.delete()
+
+        self.assertFalse(Existencia.objects.exists())
+
+    def test_diferencias_y_reconstruir(self):
+        Producto.objects.bulk_create(
+            [Producto(info=self.info) for _ in range(3)]
+            + [Producto(info=self.info, area_venta=self.area) for _ in range(2)]
+        )
+        Existencia.objects.filter(area_venta=self.area).update(cantidad=7)
+
+        self.assertEqual(
+            Existencia.objects.diferencias(),
+            [
+                (
+                    (self.info.pk, UbicacionExistenciaChoices.AREA_VENTA, self.area.pk),
+                    2,
+                    7,
+                )
+            ],
+        )
+
+        Existencia.objects.reconstruir()
+
+        self.assertEqual(self.existencia(UbicacionExistenciaChoices.ALMACEN_PRINCIPAL), 3)
+        self.assertEqual(
+            self.existencia(UbicacionExistenciaChoices.AREA_VENTA, self.area), 2
+        )
+        self.assertEqual(Existencia.objects.diferencias(), [])
+
+
+class ProductoDisponibleIndexesTest(TestCase):
+    INDICES = (
+        "producto_disp_almacen_idx",
+        "producto_disp_revoltosa_idx",
+        "producto_disp_area_idx",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_admin()
+        cls.salon, cls.revoltosa = crear_areas("Salón", "Revoltosa")
+        cls.info = crear_info(venta=100)
+        Producto.objects.bulk_create(
+            [Producto(info=cls.info, almacen_revoltosa=True) for _ in range(3)]
+            + [Producto(info=cls.info, area_venta=cls.salon) for _ in range(3)]
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def planes(self, metodo, url, **kwargs):
+        """Ejecuta la petición y devuelve el plan de cada consulta que filtra
+        productos disponibles."""
+        with CaptureQueriesContext(connection) as consultas:
+            response = getattr(self.client, metodo)(
+                url, content_type="application/json", **kwargs, **auth_headers(self.usuario)
+            )
+        self.assertLess(response.status_code, 300, response.content)
+
+        # Los movimientos reservan las unidades con un UPDATE cuya subconsulta
+        # es la que filtra los disponibles.
+        sentencias = [
+            consulta["sql"]
+            for consulta in consultas
+            if consulta["sql"].startswith(("SELECT", "UPDATE"))
+            and 'FROM "inventario_producto"' in consulta["sql"]
+            and '"venta_id" IS NULL' in consulta["sql"]
+        ]
+        self.assertTrue(sentencias)
+        return explain_sin_seqscan(sentencias)
+
+    def assertUsaIndice(self, planes):
+        for plan in planes:
+            self.assertTrue(
+                any(indice in plan for indice in self.INDICES), f"Sin índice:\n{plan}"
+            )
+
+    def test_inventario(self):
+        self.assertUsaIndice(self.planes("get", "/v2/inventario/almacen/"))
+        self.assertUsaIndice(self.planes("get", "/v2/inventario/almacen-revoltosa/"))
+
+    def test_transferencias(self):
+        otra = AreaVenta.objects.create(
+            nombre="Otra", color="#fff", cuenta=self.salon.cuenta
+        )
+        planes = self.planes(
+            "post",
+            "/v2/transferencias/",
+            data={
+                "de": self.salon.pk,
+                "para": otra.pk,
+                "productos": [{"producto": self.info.pk, "cantidad": 2}],
+            },
+        )
+        self.assertUsaIndice(planes)
+
+    def test_salidas_revoltosa(self):
+        planes = self.planes(
+            "post",
+            "/v2/salidas-revoltosa/",
+            data={"producto_info": str(self.info.pk), "cantidad": 2},
+        )
+        self.assertUsaIndice(planes)
+
+
+class CreatedAtIndexesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_admin()
+
+    def sentencias(self, funcion, tabla):
+        with CaptureQueriesContext(connection) as consultas:
+            funcion()
+        return [
+            consulta["sql"]
+            for consulta in consultas
+            if consulta["sql"].startswith("SELECT")
+            and f'FROM "{tabla}"' in consulta["sql"]
+            and any(f'"created_at" {op}' in consulta["sql"] for op in ("<", ">="))
+        ]
+
+    def test_entradas_recientes(self):
+        (plan,) = explain_sin_seqscan(
+            self.sentencias(
+                lambda: self.client.get(
+                    "/v2/entradas/principal/", **auth_headers(self.usuario)
+                ),
+                "inventario_entradaalmacen",
+            )
+        )
+        self.assertIn("entrada_almacen_created_brin", plan)
+
+    def test_graficas(self):
+        planes = explain_sin_seqscan(
+            self.sentencias(
+                lambda: get_graficas_ventas(date(2026, 3, 10)), "inventario_gastos"
+            )
+        )
+        self.assertEqual(len(planes), 2)
+        for plan in planes:
+            self.assertIn("gasto_created_brin", plan)
+
+    def test_resumen_de_ventas(self):
+        (plan,) = explain_sin_seqscan(
+            self.sentencias(
+                lambda: VentaDiariaResumen.objects.reconstruir(
+                    date(2026, 3, 1), date(2026, 3, 31)
+                ),
+                "inventario_producto",
+            )
+        )
+        self.assertIn("venta_created_activa_idx", plan)
+
+
+class EntradasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_admin()
+        cls.proveedor = Proveedor.objects.create(
+            nombre="Proveedor", direccion="Calle 1", nit="1", telefono="555"
+        )
+        cls.blusa = crear_info(costo=50)
+        cls.zapato = crear_info("Tenis", "Zapatos", costo=80)
+
+    def entrada(self, cantidad, numeros):
+        return self.client.post(
+            "/v2/entradas/",
+            data={
+                "metodoPago": METODO_PAGO.DEUDA,
+                "proveedor": str(self.proveedor.pk),
+                "comprador": "Juan",
+                "cuentas": [],
+                "productos": [
+                    {
+                        "producto": str(self.blusa.pk),
+                        "localizacion": "Estante 1",
+                        "cantidad": cantidad,
+                        "isZapato": False,
+                    },
+                    {
+                        "producto": str(self.zapato.pk),
+                        "localizacion": "",
+                        "isZapato": True,
+                        "variantes": [
+                            {
+                                "color": "Negro",
+                                "numeros": [
+                                    {"numero": numero, "cantidad": cantidad}
+                                    for numero in numeros
+                                ],
+                            }
+                        ],
+                    },
+                ],
+            },
+            content_type="application/json",
+            **auth_headers(self.usuario),
+        )
+
+    def test_entrada_por_lotes(self):
+        response = self.entrada(3, [38, 39])
+
+        self.assertEqual(response.status_code, 200, response.content)
+        primero = Producto.objects.filter(info=self.zapato).order_by("id").first().pk
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "zapato": "Tenis",
+                    "variantes": [
+                        {
+                            "color": "Negro",
+                            "numeros": [
+                                {"numero": 38, "ids": f"{primero}-{primero + 2}"},
+                                {"numero": 39, "ids": f"{primero + 3}-{primero + 5}"},
+                            ],
+                        }
+                    ],
+                }
+            ],
+        )
+        self.blusa.refresh_from_db()
+        self.assertEqual(self.blusa.localizacion, "Estante 1")
+        self.assertEqual(Producto.objects.count(), 9)
+        self.assertEqual(
+            Existencia.objects.get(
+                producto_info=self.blusa,
+                ubicacion=UbicacionExistenciaChoices.ALMACEN_PRINCIPAL,
+            ).cantidad,
+            3,
+        )
+        self.assertEqual(Deuda.objects.get().monto_total, Decimal("630.00"))
+
+    def test_ids_intercalados(self):
+        # Ids de la secuencia tomados por otra transacción entre los nuestros.
+        self.assertEqual(formatear_ids([9, 3, 4, 5, 7, 10]), "3-5, 7, 9-10")
+
+    def test_consultas_no_dependen_del_tamanno(self):
+        with CaptureQueriesContext(connection) as pequenna:
+            self.entrada(1, [38])
+        with CaptureQueriesContext(connection) as grande:
+            self.entrada(50, [38, 39, 40, 41])
+
+        self.assertEqual(len(pequenna), len(grande))
+
+    def test_tipo_no_coincide_con_categoria(self):
+        response = self.client.post(
+            "/v2/entradas/",
+            data={
+                "metodoPago": METODO_PAGO.DEUDA,
+                "proveedor": str(self.proveedor.pk),
+                "comprador": "Juan",
+                "cuentas": [],
+                "productos": [
+                    {
+                        "producto": str(self.zapato.pk),
+                        "localizacion": "",
+                        "cantidad": 2,
+                        "isZapato": False,
+                    }
+                ],
+            },
+            content_type="application/json",
+            **auth_headers(self.usuario),
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Producto.objects.exists())
+
+
+class SaldoCuentasConcurrenciaTest(TransactionTestCase):
+    HILOS = 8
+    OPERACIONES = 10
+
+    def setUp(self):
+        self.cuentas = [
+            Cuentas.objects.create(
+                nombre=f"Cuenta {i}", tipo=CuentasChoices.EFECTIVO, saldo=1000
+            )
+            for i in range(2)
+        ]
+
+    def operar(self, hilo, errores):
+        # Hilos pares e impares piden las cuentas en orden inverso: sin el
+        # bloqueo ordenado por pk esto produciría deadlocks.
+        cuentas = self.cuentas if hilo % 2 else self.cuentas[::-1]
+        try:
+            for _ in range(self.OPERACIONES):
+                Cuentas.objects.mover_saldos(
+                    [
+                        Transacciones(
+                            cuenta_id=cuenta.pk,
+                            cantidad=Decimal("1.50"),
+                            tipo=TipoTranferenciaChoices.ENTRADA,
+                            descripcion=f"Hilo {hilo}",
+                        )
+                        for cuenta in cuentas
+                    ],
+                    signo=-1,
+                    validar_saldo=True,
+                )
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connection.close()
+
+    def test_movimientos_concurrentes(self):
+        errores = []
+        hilos = [
+            threading.Thread(target=self.operar, args=(i, errores))
+            for i in range(self.HILOS)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        total = self.HILOS * self.OPERACIONES
+        for cuenta in self.cuentas:
+            cuenta.refresh_from_db()
+            self.assertEqual(cuenta.saldo, Decimal(1000) - total * Decimal("1.50"))
+
+            saldos = list(
+                Transacciones.objects.filter(cuenta=cuenta)
+                .order_by("-saldo_resultante")
+                .values_list("saldo_resultante", flat=True)
+            )
+            self.assertEqual(
+                saldos,
+                [Decimal(1000) - i * Decimal("1.50") for i in range(1, total + 1)],
+            )
+
+    def test_saldo_insuficiente(self):
+        cuenta = self.cuentas[0]
+        with self.assertRaises(SaldoInsuficienteError):
+            Cuentas.objects.mover_saldos(
+                [
+                    Transacciones(
+                        cuenta_id=cuenta.pk,
+                        cantidad=Decimal("600"),
+                        tipo=TipoTranferenciaChoices.ENTRADA,
+                        descripcion="Compra",
+                    )
+                    for _ in range(2)
+                ],
+                signo=-1,
+                validar_saldo=True,
+            )
+
+        cuenta.refresh_from_db()
+        self.assertEqual(cuenta.saldo, Decimal(1000))
+        self.assertFalse(Transacciones.objects.exists())
+
+
+class ReservaStockConcurrenciaTest(TransactionTestCase):
+    HILOS = 8
+    UNIDADES = 20
+    POR_HILO = 3
+
+    def setUp(self):
+        self.origen, self.destino = crear_areas("Salón", "Otra")
+        self.info = crear_info()
+        Producto.objects.bulk_create(
+            [
+                Producto(info=self.info, area_venta=self.origen)
+                for _ in range(self.UNIDADES)
+            ]
+        )
+
+    def reservar(self, barrera, reservas, errores):
+        try:
+            # Todos empiezan a la vez. Los triggers de Existencia serializan
+            # la actualización del contador, pero las subconsultas corren en
+            # paralelo y deben saltarse las unidades que otra ya bloqueó.
+            barrera.wait()
+            with transaction.atomic():
+                ids = Producto.objects.filter(
+                    info=self.info, area_venta=self.origen, venta__isnull=True
+                ).reservar(self.POR_HILO, area_venta=self.destino)
+            reservas.append(ids)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connection.close()
+
+    def test_ninguna_unidad_se_mueve_dos_veces(self):
+        barrera = threading.Barrier(self.HILOS, timeout=10)
+        reservas, errores = [], []
+        hilos = [
+            threading.Thread(target=self.reservar, args=(barrera, reservas, errores))
+            for _ in range(self.HILOS)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        movidos = [pk for ids in reservas for pk in ids]
+        self.assertEqual(len(movidos), len(set(movidos)))
+        self.assertTrue(all(len(ids) <= self.POR_HILO for ids in reservas))
+        self.assertEqual(len(movidos), self.UNIDADES)
+        self.assertEqual(
+            set(
+                Producto.objects.filter(area_venta=self.destino).values_list(
+                    "pk", flat=True
+                )
+            ),
+            set(movidos),
+        )
+
+
+class HistorialSaldosTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.caja = crear_cuenta(saldo=10000)
+        cls.usd = Cuentas.objects.create(
+            nombre="Zelle",
+            tipo=CuentasChoices.ZELLE,
+            moneda=MonedaChoices.USD,
+            saldo=50,
+        )
+        cls.usuario = crear_admin()
+
+    def transaccion(self, dias, tipo, cantidad, cuenta=None, **kwargs):
+        transaccion = Transacciones.objects.create(
+            tipo=tipo,
+            cantidad=cantidad,
+            cuenta=cuenta or self.caja,
+            saldo_resultante=0,
+            descripcion=tipo,
+            **kwargs,
+        )
+        Transacciones.objects.filter(pk=transaccion.pk).update(
+            created_at=timezone.make_aware(
+                datetime.combine(timezone.localdate() - timedelta(days=dias), time(12))
+            )
+        )
+
+    def test_registrar_desde_el_historial(self):
+        hoy = timezone.localdate()
+        self.transaccion(2, TipoTranferenciaChoices.VENTA, 200)
+        self.transaccion(1, TipoTranferenciaChoices.ENTRADA, 100)
+        self.transaccion(
+            1,
+            TipoTranferenciaChoices.TRANSFERENCIA,
+            10,
+            cuenta_origen=self.usd,
+            cuenta_destino=self.caja,
+            tipo_cambio=300,
+        )
+        self.transaccion(0, TipoTranferenciaChoices.GASTO_VARIABLE, 50, es_reversion=True)
+        self.transaccion(
+            0, TipoTranferenciaChoices.EGRESO, 999, deleted_at=timezone.now()
+        )
+
+        HistorialSaldoCuenta.objects.registrar(hoy - timedelta(days=2))
+        HistorialSaldoCuenta.objects.registrar(hoy - timedelta(days=1))
+
+        saldos = {
+            (h.cuenta_id, (hoy - h.fecha).days): h.saldo
+            for h in HistorialSaldoCuenta.objects.all()
+        }
+        self.assertEqual(
+            saldos,
+            {
+                (self.caja.pk, 0): Decimal("10000.00"),
+                (self.caja.pk, 1): Decimal("9950.00"),
+                (self.caja.pk, 2): Decimal("7050.00"),
+                (self.usd.pk, 0): Decimal("50.00"),
+                (self.usd.pk, 1): Decimal("50.00"),
+                (self.usd.pk, 2): Decimal("60.00"),
+            },
+        )
+
+    def test_comando_solo_guarda_dias_cerrados(self):
+        hoy = timezone.localdate()
+        self.transaccion(1, TipoTranferenciaChoices.ENTRADA, 100)
+        HistorialSaldoCuenta.objects.registrar(
+            hoy - timedelta(days=3), hoy - timedelta(days=3)
+        )
+
+        call_command("registrar_saldos_diarios", stdout=io.StringIO())
+        self.assertEqual(
+            set(
+                HistorialSaldoCuenta.objects.filter(cuenta=self.caja).values_list(
+                    "fecha", flat=True
+                )
+            ),
+            {hoy - timedelta(days=d) for d in (3, 2, 1)},
+        )
+        # La valoración es la del momento, así que va con la fecha de hoy.
+        self.assertEqual(HistorialSaldoInventarios.objects.get().fecha, hoy)
+
+        HistorialSaldoInventarios.objects.all().delete()
+        salida = io.StringIO()
+        call_command("registrar_saldos_diarios", stdout=salida)
+        self.assertIn("ya están registrados", salida.getvalue())
+        self.assertEqual(HistorialSaldoInventarios.objects.get().fecha, hoy)
+
+    def saldo_en(self, dias, hora):
+        momento = datetime.combine(
+            timezone.localdate() - timedelta(days=dias), time(hora)
+        )
+        response = self.client.get(
+            f"/v2/cuentas/{self.caja.pk}/saldo/",
+            {"fecha": momento.isoformat()},
+            **auth_headers(self.usuario),
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_saldo_en_fecha(self):
+        hoy = timezone.localdate()
+        self.transaccion(2, TipoTranferenciaChoices.VENTA, 200)
+        self.transaccion(1, TipoTranferenciaChoices.ENTRADA, 100)
+        self.transaccion(
+            1,
+            TipoTranferenciaChoices.TRANSFERENCIA,
+            10,
+            cuenta_origen=self.usd,
+            cuenta_destino=self.caja,
+            tipo_cambio=300,
+        )
+        self.transaccion(0, TipoTranferenciaChoices.GASTO_VARIABLE, 50, es_reversion=True)
+
+        # Sin cierre previo se parte del saldo actual hacia atrás.
+        saldo = self.saldo_en(2, 13)
+        self.assertIsNone(saldo["fecha_cierre"])
+        self.assertEqual(Decimal(saldo["saldo"]), Decimal("7050"))
+
+        HistorialSaldoCuenta.objects.registrar(hoy - timedelta(days=2))
+        with CaptureQueriesContext(connection) as consultas:
+            saldo = self.saldo_en(1, 18)
+        self.assertEqual(saldo["fecha_cierre"], str(hoy - timedelta(days=2)))
+        self.assertEqual(Decimal(saldo["saldo"]), Decimal("9950"))
+
+        planes = explain_sin_seqscan(
+            c["sql"] for c in consultas if 'FROM "inventario_transacciones"' in c["sql"]
+        )
+        self.assertEqual(len(planes), 3)
+        for plan in planes:
+            self.assertRegex(plan, r"transaccion_(cuenta|origen|destino)_fecha_idx")
+
+        HistorialSaldoCuenta.objects.filter(cuenta=self.caja).update(saldo=7000)
+        self.assertEqual(Decimal(self.saldo_en(1, 18)["saldo"]), Decimal("9900"))
+        self.assertEqual(Decimal(self.saldo_en(1, 11)["saldo"]), Decimal("7000"))
+
+    def test_valoracion_del_inventario(self):
+        info = crear_info(costo=50)
+        Producto.objects.bulk_create([Producto(info=info) for _ in range(3)])
+
+        HistorialSaldoInventarios.objects.registrar()
+        # Una segunda llamada en el día no pisa la valoración de apertura.
+        Producto.objects.create(info=info)
+        historial = HistorialSaldoInventarios.objects.registrar()
+
+        self.assertEqual(historial.fecha, timezone.localdate())
+        self.assertEqual(historial.saldo, Decimal("150.00"))
+        self.assertEqual(HistorialSaldoInventarios.objects.count(), 1)
+
+
+class TransaccionesLedgerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_admin()
+        cls.caja = crear_cuenta()
+        cls.banco = Cuentas.objects.create(
+            nombre="Banco", tipo=CuentasChoices.BANCARIA
+        )
+        inicio = timezone.make_aware(datetime(2026, 3, 1, 12))
+        cls.transacciones = []
+        for i in range(7):
+            transaccion = Transacciones.objects.create(
+                tipo=TipoTranferenciaChoices.VENTA,
+                cantidad=10 + i,
+                cuenta=cls.caja if i % 2 else cls.banco,
+                usuario=cls.usuario,
+                saldo_resultante=0,
+                descripcion=f"Venta {i}",
+            )
+            # Las dos últimas comparten created_at para probar el desempate por id.
+            transaccion.created_at = inicio + timedelta(hours=min(i, 5))
+            cls.transacciones.append(transaccion)
+        Transacciones.objects.bulk_update(cls.transacciones, ["created_at"])
+        Transacciones.objects.filter(pk=cls.transacciones[0].pk).update(
+            deleted_at=timezone.now()
+        )
+
+    def pagina(self, **params):
+        response = self.client.get(
+            "/v2/transacciones/", params, **auth_headers(self.usuario)
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def recorrer(self, **params):
+        ids = []
+        params["limite"] = 2
+        while True:
+            with self.assertNumQueries(1):
+                pagina = self.pagina(**params)
+            ids += [t["id"] for t in pagina["transacciones"]]
+            if pagina["siguiente"] is None:
+                return ids
+            params["cursor"] = pagina["siguiente"]
+
+    def test_paginacion_por_cursor(self):
+        esperadas = [t.pk for t in reversed(self.transacciones[1:])]
+        self.assertEqual(self.recorrer(), esperadas)
+
+        primera = self.pagina(limite=1)["transacciones"][0]
+        self.assertEqual(primera["cuenta"]["nombre"], "Banco")
+        self.assertEqual(primera["usuario"]["username"], "admin")
+
+    def test_filtros(self):
+        self.assertEqual(
+            self.recorrer(cuenta=self.caja.pk),
+            [t.pk for t in reversed(self.transacciones) if t.cuenta == self.caja],
+        )
+        self.assertEqual(self.recorrer(desde="2026-03-02"), [])
+        self.assertEqual(len(self.recorrer(hasta="2026-03-01", moneda="CUP")), 6)
+        self.assertEqual(self.recorrer(tipo=TipoTranferenciaChoices.EGRESO), [])
+
+    def test_cursor_invalido(self):
+        response = self.client.get(
+            "/v2/transacciones/",
+            {"cursor": "no-es-un-cursor"},
+            **auth_headers(self.usuario),
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_paginas_profundas_sin_ordenar(self):
+        cursor = self.pagina(limite=2)["siguiente"]
+        for params, indice in (
+            ({}, "transaccion_created_activa_idx"),
+            ({"cuenta": self.caja.pk}, "transaccion_cuenta_fecha_idx"),
+        ):
+            with CaptureQueriesContext(connection) as consultas:
+                self.pagina(limite=2, cursor=cursor, **params)
+            (plan,) = explain_sin_seqscan(c["sql"] for c in consultas)
+            self.assertIn(indice, plan)
+            self.assertNotIn("Sort", plan)
+
+
+class ExportacionesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_admin()
+        (area,) = crear_areas("Salón")
+        info = crear_info("Blusa, talla única", costo=50, venta=100)
+
+        venta = Ventas.objects.create(
+            area_venta=area, metodo_pago=METODO_PAGO.EFECTIVO, usuario=cls.usuario
+        )
+        Producto.objects.bulk_create(
+            [Producto(info=info, venta=venta, area_venta=area) for _ in range(3)]
+        )
+
+        venta_cafeteria = Ventas_Cafeteria.objects.create(
+            metodo_pago=METODO_PAGO.EFECTIVO, efectivo=30
+        )
+        venta_cafeteria.productos.add(
+            Productos_Ventas_Cafeteria.objects.create(
+                producto=Productos_Cafeteria.objects.create(nombre="Café"),
+                cantidad=2,
+            )
+        )
+        venta_cafeteria.elaboraciones.add(
+            Elaboraciones_Ventas_Cafeteria.objects.create(
+                producto=Elaboraciones.objects.create(nombre="Pizza", mano_obra=5),
+                cantidad=1,
+            )
+        )
+
+    def exportar(self, recurso, formato="csv"):
+        hoy = timezone.localdate()
+        response = self.client.get(
+            f"/v2/exportar/{recurso}/",
+            {"desde": hoy - timedelta(days=1), "hasta": hoy, "formato": formato},
+            **auth_headers(self.usuario),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv(self):
+        contenido = self.exportar("ventas").decode("utf-8-sig")
+        encabezado, *filas = csv.reader(io.StringIO(contenido))
+
+        self.assertEqual(encabezado[0], "Venta")
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(
+            filas[0][2:6], ["Salón", "admin", "EFECTIVO", "Blusa, talla única"]
+        )
+        self.assertEqual(filas[0][8:], ["100.00", "50.00", "5"])
+
+        contenido = self.exportar("ventas-cafeteria").decode("utf-8-sig")
+        filas = list(csv.reader(io.StringIO(contenido)))[1:]
+        self.assertEqual(
+            [fila[6:] for fila in filas],
+            [["Producto", "Café", "2.00"], ["Elaboración", "Pizza", "1"]],
+        )
+
+        for recurso in ("entradas", "entradas-cafeteria", "transacciones"):
+            self.assertTrue(self.exportar(recurso).startswith(b"\xef\xbb\xbf"))
+
+    def test_entradas_al_costo_de_la_fecha(self):
+        info = ProductoInfo.objects.get()
+        entrada = EntradaAlmacen.objects.create(
+            metodo_pago=METODO_PAGO.EFECTIVO, comprador="Ana", usuario=self.usuario
+        )
+        Producto.objects.create(info=info, entrada=entrada)
+        HistorialPrecioCostoSalon.objects.create(producto_info=info, precio=70)
+
+        contenido = self.exportar("entradas").decode("utf-8-sig")
+        (fila,) = list(csv.reader(io.StringIO(contenido)))[1:]
+        self.assertEqual(fila[9], "50.00")
+
+    def test_xlsx(self):
+        with zipfile.ZipFile(io.BytesIO(self.exportar("ventas", "xlsx"))) as archivo:
+            hoja = archivo.read("xl/worksheets/sheet1.xml").decode()
+            self.assertIn("xl/styles.xml", archivo.namelist())
+
+        self.assertEqual(hoja.count("<row>"), 4)
+        self.assertIn("Blusa, talla única", hoja)
+        self.assertIn('<c s="1"><v>', hoja)
+
+    def test_formato_no_soportado(self):
+        response = self.client.get(
+            "/v2/exportar/transacciones/",
+            {"desde": "2026-01-01", "hasta": "2026-12-31", "formato": "pdf"},
+            **auth_headers(self.usuario),
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CacheRespuestasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_admin()
+        cls.vendedor = User.objects.create_user(
+            "vendedor", "vendedor", rol=RolesChoices.VENDEDOR
+        )
+        cls.info = crear_info(venta=100)
+
+    def setUp(self):
+        cache.clear()
+
+    def confirmar(self):
+        # Dispara los triggers diferidos que suben las versiones, como el
+        # commit que TestCase nunca llega a hacer.
+        connection.check_constraints()
+
+    def get(self, url, usuario=None):
+        response = self.client.get(url, **auth_headers(usuario or self.admin))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_aciertos_e_invalidacion(self):
+        fallo = self.get("/v2/productos")
+        # Solo las versiones de los grupos.
+        with self.assertNumQueries(1):
+            acierto = self.get("/v2/productos")
+
+        self.assertEqual(fallo["X-Cache"], "MISS")
+        self.assertEqual(acierto["X-Cache"], "HIT")
+        self.assertEqual(acierto.json(), fallo.json())
+        self.assertEqual(self.get("/v2/productos", self.vendedor)["X-Cache"], "MISS")
+
+        # Sin confirmar la transacción todavía no se invalida.
+        HistorialPrecioVentaSalon.objects.create(producto_info=self.info, precio=130)
+        self.assertEqual(self.get("/v2/productos")["X-Cache"], "HIT")
+
+        self.confirmar()
+        response = self.get("/v2/productos")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["productos"][0]["precio_venta"], "130.00")
+
+    def test_escrituras_fuera_de_django(self):
+        self.get("/v2/inventario/almacen/")
+        self.get("/v2/cafeteria/elaboraciones/")
+        (inventario,) = versiones(["inventario"])
+
+        # Como el frontend: SQL directo, varias sentencias en la transacción.
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE inventario_existencia SET cantidad = cantidad")
+            cursor.execute("DELETE FROM inventario_existencia WHERE cantidad < 0")
+        self.confirmar()
+
+        self.assertEqual(
+            versiones(["inventario"])[0].version, inventario.version + 1
+        )
+        self.assertEqual(self.get("/v2/inventario/almacen/")["X-Cache"], "MISS")
+        self.assertEqual(self.get("/v2/cafeteria/elaboraciones/")["X-Cache"], "HIT")
+
+    def test_peticiones_condicionales(self):
+        response = self.get("/v2/productos")
+        etag, modificado = response["ETag"], response["Last-Modified"]
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/v2/productos", HTTP_IF_NONE_MATCH=etag, **auth_headers(self.admin)
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(
+            "/v2/productos",
+            HTTP_IF_MODIFIED_SINCE=modificado,
+            **auth_headers(self.admin),
+        )
+        self.assertEqual(response.status_code, 304)
+
+        # Sin la respuesta en caché (o sin caché, como en Vercel sin redis) el
+        # ETag no cambia y el 304 sigue sin ejecutar la vista.
+        with override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        ):
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    "/v2/productos", HTTP_IF_NONE_MATCH=etag, **auth_headers(self.admin)
+                )
+        self.assertEqual(response.status_code, 304)
+
+        HistorialPrecioVentaSalon.objects.create(producto_info=self.info, precio=130)
+        self.confirmar()
+        response = self.client.get(
+            "/v2/productos", HTTP_IF_NONE_MATCH=etag, **auth_headers(self.admin)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_metricas(self):
+        for _ in range(3):
+            self.get("/v2/productos")
+
+        metricas = self.get("/v2/cache/metricas/").json()
+        self.assertEqual(
+            metricas["productos"], {"aciertos": 2, "fallos": 1, "tasa_aciertos": 2 / 3}
+        )
+        self.assertEqual(metricas["graficas"]["aciertos"], 0)
+
+
+@override_settings(
+    IMAGENES_UPLOADER="inventario.imagenes.UploaderLocal",
+    IMAGENES_EN_SEGUNDO_PLANO=False,
+)
+class ImagenesProductosTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_admin()
+        cls.categoria = Categorias.objects.create(nombre="Ropa")
+
+    def imagen(self, ancho, alto, nombre="foto.png"):
+        contenido = io.BytesIO()
+        PIL.Image.new("RGBA", (ancho, alto), (200, 30, 30, 255)).save(contenido, "PNG")
+        return SimpleUploadedFile(nombre, contenido.getvalue(), "image/png")
+
+    def crear(self, imagen):
+        datos = {
+            "descripcion": "Blusa",
+            "categoria": self.categoria.pk,
+            "precio_costo": "50",
+            "precio_venta": "100",
+            "pago_trabajador": 5,
+        }
+        return self.client.post(
+            "/v2/productos",
+            {"data": json.dumps(datos), "imagen": imagen},
+            **auth_headers(self.admin),
+        )
+
+    def test_imagen_procesada_fuera_de_la_peticion(self):
+        response = self.crear(self.imagen(1600, 1200))
+        self.assertEqual(response.status_code, 200)
+
+        info = ProductoInfo.objects.get(descripcion="Blusa")
+        self.assertIsNone(info.imagen)
+        self.assertEqual(info.imagenes_pendientes.count(), 1)
+
+        self.assertEqual(procesar_pendientes(), 1)
+
+        info.refresh_from_db()
+        self.assertFalse(ImagenPendiente.objects.exists())
+        tamanos = [
+            PIL.Image.open(io.BytesIO(UploaderLocal.archivos[public_id])).size
+            for public_id in (info.imagen.public_id, info.imagen.miniatura_public_id)
+        ]
+        self.assertEqual(tamanos, [(800, 600), (200, 150)])
+
+        # Una imagen nueva reemplaza a la anterior, también en el destino.
+        anterior = info.imagen
+        with self.captureOnCommitCallbacks(execute=True):
+            encolar_imagen(info, self.imagen(300, 300).read())
+            procesar_pendientes()
+        info.refresh_from_db()
+        self.assertNotEqual(info.imagen, anterior)
+        self.assertNotIn(anterior.public_id, UploaderLocal.archivos)
+
+    def test_variantes_de_foto_jpeg(self):
+        # Foto apaisada de móvil con orientación EXIF "girar 90°".
+        exif = PIL.Image.Exif()
+        exif[0x0112] = 6
+        contenido = io.BytesIO()
+        PIL.Image.new("RGB", (4000, 3000)).save(contenido, "JPEG", exif=exif)
+
+        variantes = generar_variantes(contenido.getvalue())
+
+        tamanos = {
+            nombre: PIL.Image.open(io.BytesIO(datos)).size
+            for nombre, datos in variantes.items()
+        }
+        self.assertEqual(tamanos, {"principal": (600, 800), "miniatura": (150, 200)})
+
+    def editar(self, info, **extra):
+        datos = {
+            "descripcion": info.descripcion,
+            "categoria": self.categoria.pk,
+            "pago_trabajador": 5,
+            "deletePhoto": False,
+        }
+        return self.client.post(
+            f"/v2/productos/{info.pk}/",
+            {"data": json.dumps(datos), **extra},
+            **auth_headers(self.admin),
+        )
+
+    def test_editar_no_deshace_la_imagen_enlazada(self):
+        self.crear(self.imagen(300, 300))
+        info = ProductoInfo.objects.get(descripcion="Blusa")
+
+        # La edición con foto nueva bloquea el producto y no toca la columna
+        # imagen, así que no pisa la que se enlace mientras tanto.
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.editar(info, imagen=self.imagen(200, 200))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            any(
+                'FROM "inventario_productoinfo"' in c["sql"] and "FOR UPDATE" in c["sql"]
+                for c in consultas
+            )
+        )
+        (update,) = [
+            c["sql"]
+            for c in consultas
+            if c["sql"].startswith('UPDATE "inventario_productoinfo"')
+        ]
+        self.assertNotIn("imagen", update)
+
+        self.assertEqual(procesar_pendientes(), 1)
+        info.refresh_from_db()
+        enlazada = info.imagen
+
+        self.assertEqual(self.editar(info).status_code, 200)
+        info.refresh_from_db()
+        self.assertEqual(info.imagen, enlazada)
+
+    @override_settings(CRON_SECRET="secreto")
+    def test_tarea_programada(self):
+        # Sin segundo plano, la petición solo encola la imagen.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear(self.imagen(300, 300))
+        self.assertEqual(ImagenPendiente.objects.count(), 1)
+
+        url = "/v2/tareas/procesar-imagenes/"
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION="Bearer otro").status_code, 403
+        )
+
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secreto")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"procesadas": 1, "pendientes": 0})
+        self.assertIsNotNone(ProductoInfo.objects.get().imagen)
+
+    def test_reclamo_y_reemplazo_durante_la_subida(self):
+        info = crear_info(categoria=self.categoria)
+        encolar_imagen(info, self.imagen(300, 300).read())
+
+        (pendiente,) = reclamar_pendientes(10)
+        self.assertEqual(reclamar_pendientes(10), [])
+
+        # Otro proceso puede retomarla si quien la reclamó no terminó.
+        ImagenPendiente.objects.update(
+            procesando_desde=timezone.now() - RECLAMO_CADUCA - timedelta(minutes=1)
+        )
+        (pendiente,) = reclamar_pendientes(10)
+
+        # Si la imagen se reemplaza mientras se sube, lo subido se descarta.
+        archivos = dict(UploaderLocal.archivos)
+        encolar_imagen(info, self.imagen(200, 200).read())
+        self.assertFalse(procesar(pendiente))
+        self.assertEqual(UploaderLocal.archivos, archivos)
+        info.refresh_from_db()
+        self.assertIsNone(info.imagen)
+
+        self.assertEqual(procesar_pendientes(), 1)
+        info.refresh_from_db()
+        self.assertIsNotNone(info.imagen)
+
+    def test_imagen_invalida(self):
+        invalida = SimpleUploadedFile("foto.png", b"no es una imagen", "image/png")
+        self.assertEqual(self.crear(invalida).status_code, 400)
+        self.assertFalse(ProductoInfo.objects.exists())
+
+
+class SalidasRevoltosaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_admin()
+        (cls.revoltosa,) = crear_areas("Revoltosa")
+        cls.info = crear_info("Tenis", "Zapatos")
+        cls.otro = crear_info("Botas", "Zapatos")
+
+    def salida(self, ids):
+        return self.client.post(
+            "/v2/salidas-revoltosa/",
+            {"producto_info": str(self.info.pk), "zapatos_id": ids},
+            content_type="application/json",
+            **auth_headers(self.admin),
+        )
+
+    def test_eliminar_con_productos_vendidos(self):
+        libres = Producto.objects.bulk_create(
+            [Producto(info=self.info, almacen_revoltosa=True) for _ in range(2)]
+        )
+        self.assertEqual(self.salida([p.pk for p in libres]).status_code, 200)
+        salida = SalidaAlmacenRevoltosa.objects.get()
+        venta = Ventas.objects.create(
+            area_venta=self.revoltosa, metodo_pago=METODO_PAGO.EFECTIVO
+        )
+        Producto.objects.filter(pk=libres[0].pk).update(venta=venta)
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.delete(
+                f"/v2/salidas-revoltosa/{salida.pk}/", **auth_headers(self.admin)
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            Producto.objects.filter(
+                salida_revoltosa=salida, area_venta=self.revoltosa
+            ).count(),
+            2,
+        )
+        (update,) = [
+            c["sql"]
+            for c in consultas
+            if c["sql"].startswith('UPDATE "inventario_producto"')
+        ]
+        self.assertIn('"venta_id" IS NULL', update)
+
+    def test_zapatos_validados_en_una_consulta(self):
+        libres = Producto.objects.bulk_create(
+            [Producto(info=self.info, almacen_revoltosa=True) for _ in range(3)]
+        )
+        otro = Producto.objects.create(info=self.otro, almacen_revoltosa=True)
+        en_area = Producto.objects.create(info=self.info, area_venta=self.revoltosa)
+
+        response = self.salida([libres[0].pk, otro.pk, en_area.pk, 999999])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["detail"],
+            f"Los ids deben ser de un único producto: {otro.pk}. "
+            f"Algunos productos ya están en un área de venta: {en_area.pk}. "
+            "Algunos ids no existen: 999999",
+        )
+        self.assertFalse(Producto.objects.filter(salida_revoltosa__isnull=False))
+
+        (version,) = versiones(["inventario"])
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.salida([p.pk for p in libres])
+        self.assertEqual(response.status_code, 200)
+        connection.check_constraints()
+        self.assertGreater(versiones(["inventario"])[0].version, version.version)
+
+        # Validación con bloqueo y un único update.
+        sobre_productos = [
+            c["sql"]
+            for c in consultas
+            if 'FROM "inventario_producto"' in c["sql"]
+            or c["sql"].startswith('UPDATE "inventario_producto"')
+        ]
+        self.assertEqual(len(sobre_productos), 2)
+        self.assertIn("FOR UPDATE", sobre_productos[0])
+        self.assertEqual(
+            Producto.objects.filter(
+                area_venta=self.revoltosa, salida_revoltosa__isnull=False
+            ).count(),
+            3,
+        )
+
+
+class TransferenciasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_admin()
+        cls.origen, cls.destino = crear_areas("Salón", "Otra")
+        cls.blusa = crear_info()
+        cls.tenis = crear_info("Tenis", "Zapatos")
+
+    def setUp(self):
+        self.blusas = Producto.objects.bulk_create(
+            [Producto(info=self.blusa, area_venta=self.origen) for _ in range(5)]
+        )
+        self.zapatos = Producto.objects.bulk_create(
+            [Producto(info=self.tenis, area_venta=self.origen) for _ in range(4)]
+        )
+
+    def transferir(self, productos):
+        return self.client.post(
+            "/v2/transferencias/",
+            {"de": self.origen.pk, "para": self.destino.pk, "productos": productos},
+            content_type="application/json",
+            **auth_headers(self.admin),
+        )
+
+    def test_transferencia_en_bloque(self):
+        ids = ",".join(str(p.pk) for p in self.zapatos[:3])
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.transferir(
+                [
+                    {"producto": self.blusa.pk, "cantidad": 4},
+                    {"producto": self.tenis.pk, "zapatos_id": ids},
+                ]
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        transferencia = Transferencia.objects.get()
+        self.assertEqual(transferencia.productos.count(), 7)
+        self.assertEqual(Producto.objects.filter(area_venta=self.destino).count(), 7)
+
+        # Reserva de las blusas, validación y update de los zapatos y un único
+        # INSERT de las filas de la relación.
+        sql = [c["sql"] for c in consultas]
+        updates = [s for s in sql if s.startswith('UPDATE "inventario_producto"')]
+        inserts = [
+            s for s in sql if s.startswith('INSERT INTO "inventario_transferencia_')
+        ]
+        self.assertEqual((len(updates), len(inserts)), (2, 1))
+
+    def test_zapatos_no_disponibles(self):
+        vendido = self.zapatos[0]
+        Producto.objects.filter(pk=vendido.pk).update(area_venta=self.destino)
+        ids = f"{vendido.pk};{self.blusas[0].pk};{self.zapatos[1].pk}"
+
+        response = self.transferir([{"producto": self.tenis.pk, "zapatos_id": ids}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["detail"],
+            f"Algunos zapatos no están disponibles en Salón: {vendido.pk}. "
+            f"Algunos zapatos no son del producto indicado: {self.blusas[0].pk}",
+        )
+        self.assertFalse(Transferencia.objects.exists())
+        self.assertEqual(
+            self.transferir([{"producto": self.tenis.pk, "zapatos_id": "1,x"}]).json(),
+            {"detail": "Id de zapato no válido: x"},
+        )
+
+    def test_historial_paginado(self):
+        for cantidad in (1, 2, 3):
+            self.transferir([{"producto": self.blusa.pk, "cantidad": 1}])
+            self.transferir(
+                [
+                    {
+                        "producto": self.tenis.pk,
+                        "zapatos_id": str(self.zapatos[cantidad].pk),
+                    }
+                ]
+            )
+
+        paginas = []
+        cursor = ""
+        while cursor is not None:
+            # Página de transferencias y totales agrupados, sin N+1.
+            with self.assertNumQueries(2):
+                response = self.client.get(
+                    f"/v2/transferencias/?limite=4&cursor={cursor}",
+                    **auth_headers(self.admin),
+                )
+            self.assertEqual(response.status_code, 200)
+            paginas.append(response.json()["transferencias"])
+            cursor = response.json()["siguiente"]
+
+        self.assertEqual([len(pagina) for pagina in paginas], [4, 2])
+        ids = [t["id"] for pagina in paginas for t in pagina]
+        esperados = Transferencia.objects.order_by("-created_at", "-id")
+        self.assertEqual(ids, list(esperados.values_list("id", flat=True)))
+        self.assertEqual(
+            paginas[0][0]["productos"], [{"descripcion": "Tenis", "total_transfers": 1}]
+        )
+
+    def test_revertir(self):
+        self.transferir([{"producto": self.blusa.pk, "cantidad": 3}])
+        transferencia = Transferencia.objects.get()
+        movida = transferencia.productos.first()
+        Producto.objects.filter(pk=movida.pk).update(area_venta=self.origen)
+
+        response = self.client.delete(
+            f"/v2/transferencias/{transferencia.pk}/", **auth_headers(self.admin)
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Producto.objects.filter(area_venta=self.destino).count(), 2)
+
+        Producto.objects.filter(pk=movida.pk).update(area_venta=self.destino)
+        response = self.client.delete(
+            f"/v2/transferencias/{transferencia.pk}/", **auth_headers(self.admin)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Transferencia.objects.exists())
+        self.assertFalse(Producto.objects.filter(area_venta=self.destino).exists())
+
+
+class RevertirTransferenciaConcurrenciaTest(TransactionTestCase):
+    def setUp(self):
+        self.admin = crear_admin()
+        self.origen, self.destino = crear_areas("Salón", "Otra")
+        info = crear_info()
+        self.productos = Producto.objects.bulk_create(
+            [Producto(info=info, area_venta=self.destino) for _ in range(3)]
+        )
+        self.transferencia = Transferencia.objects.create(
+            de=self.origen, para=self.destino, usuario=self.admin
+        )
+        self.transferencia.productos.set(self.productos)
+
+    def vender(self, bloqueado, errores):
+        try:
+            with transaction.atomic():
+                venta = Ventas.objects.create(
+                    area_venta=self.destino, metodo_pago=METODO_PAGO.EFECTIVO
+                )
+                Producto.objects.filter(pk=self.productos[0].pk).update(venta=venta)
+                bloqueado.set()
+                # No confirma hasta que la reversión espera el bloqueo de esta
+                # transacción (pg_locks no se congela dentro de la transacción).
+                with connection.cursor() as cursor:
+                    for _ in range(1000):
+                        cursor.execute(
+                            "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE NOT granted "
+                            "AND pg_backend_pid() = ANY(pg_blocking_pids(pid)))"
+                        )
+                        if cursor.fetchone()[0]:
+                            break
+                        sleep(0.01)
+                    else:
+                        raise AssertionError("La reversión no esperó el bloqueo.")
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connection.close()
+
+    def test_venta_durante_la_reversion(self):
+        bloqueado, errores = threading.Event(), []
+        hilo = threading.Thread(target=self.vender, args=(bloqueado, errores))
+        hilo.start()
+        bloqueado.wait(timeout=10)
+
+        response = self.client.delete(
+            f"/v2/transferencias/{self.transferencia.pk}/", **auth_headers(self.admin)
+        )
+        hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Producto.objects.filter(area_venta=self.destino).count(), 3)
+        self.assertTrue(Transferencia.objects.filter(pk=self.transferencia.pk).exists())
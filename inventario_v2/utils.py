@@ -1,3 +1,4 @@
+import base64
 import calendar
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -9,6 +10,7 @@ from django.db.models.functions import Coalesce, Round
 from django.http import Http404
 from django.core.exceptions import ValidationError
 from django.db.models import QuerySet
+from ninja.errors import HttpError
 
 
 days_names = {
@@ -127,3 +129,45 @@ def obtener_dias_semana_rango(desde, hasta):
 #         raise ValidationError("Ha superado el límite de transferencias diarias")
 
 #     return tarjeta
+
+
+def describir_errores(errores):
+    """Mensaje de error con los ids de cada problema, a partir del resultado de
+    ProductoQuerySet.bloquear_y_comprobar."""
+    return ". ".join(
+        f"{mensaje}: {', '.join(map(str, ids))}" for mensaje, ids in errores.items()
+    )
+
+
+LIMITE_MAXIMO = 200
+
+
+def codificar_cursor(fila):
+    valor = f"{fila.created_at.isoformat()}|{fila.pk}"
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        created_at, pk = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        )
+        return datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        raise HttpError(400, "Cursor inválido")
+
+
+def paginar(queryset, cursor, limite):
+    """Devuelve (página, cursor de la siguiente o None) de un
+    PaginadoPorCursorQuerySet, con como mucho LIMITE_MAXIMO filas."""
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    if cursor:
+        queryset = queryset.antes_de(*decodificar_cursor(cursor))
+    else:
+        queryset = queryset.recientes()
+
+    pagina = list(queryset[: limite + 1])
+    if len(pagina) <= limite:
+        return pagina, None
+    pagina = pagina[:limite]
+    return pagina, codificar_cursor(pagina[-1])
@@ -3,8 +3,10 @@ from pathlib import Path
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
+import logging
 from os import getenv, path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -63,6 +65,9 @@ CORS_ORIGIN_ALLOW_ALL = False
 
 CORS_ORIGIN_WHITELIST = ("https://panel-administracion.vercel.app",)
 
+# Para que el frontend pueda reenviarlos en If-None-Match / If-Modified-Since.
+CORS_EXPOSE_HEADERS = ["ETag", "Last-Modified"]
+
 ROOT_URLCONF = "project_inventario.urls"
 
 TEMPLATES = [
@@ -84,6 +89,24 @@ TEMPLATES = [
 WSGI_APPLICATION = "project_inventario.wsgi.application"
 
 
+def env_bool(nombre, default=False):
+    valor = getenv(nombre)
+    if not valor:
+        return default
+    return valor.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Conexiones a la base de datos
+# https://docs.djangoproject.com/en/5.0/ref/databases/#persistent-connections
+#
+# En Vercel (VERCEL=1) cada instancia atiende una petición a la vez y puede
+# quedar congelada entre peticiones, así que se reutiliza una sola conexión
+# por poco tiempo y se comprueba antes de usarla. DB_CONN_MAX_AGE="none"
+# mantiene la conexión indefinidamente y "0" la cierra tras cada petición.
+SERVERLESS = env_bool("VERCEL")
+
+DB_CONN_MAX_AGE = getenv("DB_CONN_MAX_AGE") or ("60" if SERVERLESS else "600")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql_psycopg2",
@@ -92,8 +115,75 @@ DATABASES = {
         "PASSWORD": getenv("PGPASSWORD"),
         "HOST": getenv("PGHOST"),
         "PORT": getenv("PGPORT", 5432),
+        "CONN_MAX_AGE": (
+            None if DB_CONN_MAX_AGE.lower() == "none" else int(DB_CONN_MAX_AGE)
+        ),
+        "CONN_HEALTH_CHECKS": env_bool("DB_CONN_HEALTH_CHECKS", True),
+        # Las exportaciones leen con cursores del servidor, que no sobreviven
+        # a un pooler en modo transacción.
+        "DISABLE_SERVER_SIDE_CURSORS": env_bool(
+            "DB_DISABLE_SERVER_SIDE_CURSORS", False
+        ),
+    }
+}
+
+# Caché de respuestas: memoria local por defecto; "file" necesita un
+# directorio en CACHE_LOCATION y "redis" una URL redis:// (y el paquete redis).
+# Las versiones que invalidan las respuestas están en la base de datos, así que
+# una caché por instancia nunca sirve datos viejos; pero en Vercel cada
+# instancia empieza vacía y dura poco, y sin "redis" casi todo serán fallos.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "dummy": "django.core.cache.backends.dummy.DummyCache",
+}
+CACHE_BACKEND = getenv("CACHE_BACKEND") or "locmem"
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND debe ser uno de: {', '.join(CACHE_BACKENDS)}."
+    )
+if CACHE_BACKEND in ("file", "redis") and not getenv("CACHE_LOCATION"):
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND={CACHE_BACKEND} requiere CACHE_LOCATION."
+    )
+if SERVERLESS and CACHE_BACKEND != "redis":
+    logging.getLogger(__name__).warning(
+        "CACHE_BACKEND=%s en Vercel: cada instancia tiene su propia caché y "
+        "las métricas de /v2/cache/metricas/ son por instancia. Configure "
+        "CACHE_BACKEND=redis y CACHE_LOCATION=redis://... para compartirla.",
+        CACHE_BACKEND,
+    )
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": getenv("CACHE_LOCATION") or "",
     }
 }
+if CACHE_BACKEND in ("locmem", "file"):
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(getenv("CACHE_MAX_ENTRIES") or 1000)
+    }
+
+# Segundos que vive una respuesta en caché aunque no se haya invalidado. Solo
+# libera espacio: las versiones de la base de datos ya invalidan cualquier
+# escritura, también las hechas fuera de Django.
+CACHE_RESPUESTAS_TIMEOUT = int(getenv("CACHE_RESPUESTAS_TIMEOUT") or 300)
+
+# Destino de las imágenes de productos (inventario.imagenes.UploaderLocal para
+# desarrollo sin Cloudinary). En Vercel los hilos se congelan al responder, así
+# que por defecto allí no hay segundo plano y las pendientes las procesa el cron
+# de vercel.json; en otros despliegues, `manage.py procesar_imagenes` programado
+# reintenta las que fallaron.
+IMAGENES_UPLOADER = (
+    getenv("IMAGENES_UPLOADER") or "inventario.imagenes.CloudinaryUploader"
+)
+IMAGENES_EN_SEGUNDO_PLANO = env_bool("IMAGENES_EN_SEGUNDO_PLANO", not SERVERLESS)
+
+# Token que Vercel envía a las tareas programadas (Authorization: Bearer ...).
+# Sin él, los endpoints de /v2/tareas/ rechazan todas las peticiones.
+CRON_SECRET = getenv("CRON_SECRET") or ""
 
 
 AUTH_PASSWORD_VALIDATORS = [